@@ -0,0 +1,122 @@
+"""
+Benchmark Parsers - BeautifulSoup vs lxml on Saved Transfermarkt Pages
+======================================================================
+
+Parses the same saved HTML with both backends of transfermarkt_parsers,
+reports time per page type and checks that both return identical records.
+
+Pages come from a directory of saved .html files (the page type is taken
+from the file name: kader/squad, wettbewerb/league, schnellsuche/search,
+leistungsdaten/performance) or straight from the scrapers' HTTP cache. By
+default the small anonymized pages in tests/fixtures/transfermarkt are used
+(also checked by tests/test_transfermarkt_parsers.py). Exits with 1 when the
+backends disagree on any page.
+
+Usage:
+    python scripts/benchmark_parsers.py
+    python scripts/benchmark_parsers.py --fixtures path/to/saved_pages --repeat 10
+    python scripts/benchmark_parsers.py --from-cache --repeat 3
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append('scripts')
+import transfermarkt_parsers as tp
+from http_client import CACHE_PATH
+
+FIXTURES_DIR = str(Path(__file__).resolve().parent.parent / 'tests' / 'fixtures' / 'transfermarkt')
+
+# URL / file-name fragment -> (page type, extractor)
+PAGE_TYPES = [
+    (('kader', 'squad'), 'squad', tp.squad_rows),
+    (('wettbewerb', 'league'), 'league', tp.league_teams),
+    (('schnellsuche', 'search'), 'search', tp.search_club),
+    (('leistungsdaten', 'performance'), 'performance', tp.performance_rows),
+]
+
+
+def page_type(name):
+    name = name.lower()
+    for fragments, kind, extractor in PAGE_TYPES:
+        if any(fragment in name for fragment in fragments):
+            return kind, extractor
+    return None, None
+
+
+def pages_from_fixtures(fixtures_dir):
+    for path in sorted(Path(fixtures_dir).glob('*.htm*')):
+        yield path.name, path.read_bytes()
+
+
+def pages_from_cache(cache_path=CACHE_PATH):
+    import requests_cache
+    session = requests_cache.CachedSession(cache_path, backend='sqlite')
+    for response in session.cache.responses.values():
+        if response.status_code == 200 and 'html' in response.headers.get('Content-Type', 'html'):
+            yield response.url, response.content
+
+
+def run(pages, repeat=1):
+    results = {}
+    for name, content in pages:
+        kind, extractor = page_type(name)
+        if kind is None:
+            continue
+        stats = results.setdefault(kind, {'pages': 0, 'bytes': 0, 'bs4': 0.0, 'lxml': 0.0,
+                                          'records': 0, 'mismatches': []})
+        outputs = {}
+        for parser in tp.PARSERS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs[parser] = extractor(content, parser=parser)
+            stats[parser] += (time.perf_counter() - start) / repeat
+        stats['pages'] += 1
+        stats['bytes'] += len(content)
+        records = outputs['bs4']
+        stats['records'] += len(records) if isinstance(records, list) else int(records is not None)
+        if outputs['bs4'] != outputs['lxml']:
+            stats['mismatches'].append(name)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare BeautifulSoup and lxml parsing of Transfermarkt pages')
+    parser.add_argument('--fixtures', type=str, default=FIXTURES_DIR,
+                        help='Directory with saved .html pages (default: the test fixtures)')
+    parser.add_argument('--from-cache', action='store_true',
+                        help='Use pages stored in the scrapers HTTP cache instead of fixtures')
+    parser.add_argument('--repeat', type=int, default=1, help='Parses per page and backend')
+    args = parser.parse_args()
+
+    if tp.etree is None:
+        print("❌ lxml is not installed - nothing to compare")
+        return 1
+
+    pages = pages_from_cache() if args.from_cache else pages_from_fixtures(args.fixtures)
+    results = run(pages, repeat=args.repeat)
+    if not results:
+        print("❌ No pages found")
+        return 1
+
+    print(f"\n{'='*78}")
+    print(f"{'page type':<12} {'pages':>6} {'MB':>7} {'records':>8} {'bs4 (s)':>9} {'lxml (s)':>9} {'speedup':>8} {'diff':>5}")
+    print(f"{'='*78}")
+    for kind, s in results.items():
+        speedup = s['bs4'] / s['lxml'] if s['lxml'] else float('nan')
+        print(f"{kind:<12} {s['pages']:>6} {s['bytes']/1e6:>7.2f} {s['records']:>8} "
+              f"{s['bs4']:>9.3f} {s['lxml']:>9.3f} {speedup:>7.1f}x {len(s['mismatches']):>5}")
+
+    for kind, s in results.items():
+        for name in s['mismatches'][:5]:
+            print(f"⚠️  {kind}: backends disagree on {name}")
+    if any(s['mismatches'] for s in results.values()):
+        return 1
+    print("\n✅ Both parsers returned identical records for every page")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
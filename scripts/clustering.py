@@ -0,0 +1,210 @@
+"""
+Clustering - KMeans model selection that scales to the full player history
+==========================================================================
+
+The notebook's grid search fits KMeans(n_init=10) for k = 2..15 on every
+player row and computes the exact silhouette (O(n^2) distances) at each k.
+select_k does the same search with:
+
+- method='minibatch': MiniBatchKMeans for the candidate fits (the final
+  model is still fitted by fit_clusters, full KMeans by default)
+- silhouette on a stratified sample (sample_size rows, spread across the
+  k clusters in proportion to their size, so small clusters are represented);
+  sample_size=None keeps the exact silhouette
+- the k values evaluated in parallel processes (n_jobs)
+- a JSON cache of finished k values keyed on the data and the search
+  parameters, written after every k, so an interrupted search resumes
+
+The chosen k is then fitted exactly like before (KMeans, random_state=42,
+n_init=10), so players_clustered.csv gets the same labels whenever the
+search picks the same k.
+
+Usage:
+    from clustering import fit_clusters, select_k
+    optimal_k, scores = select_k(X_scaled, range(2, 16), method='minibatch', n_jobs=4,
+                                 cache_path='datalake/processed/kmeans_search.json')
+    labels, model = fit_clusters(X_scaled, optimal_k)
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+
+CACHE_VERSION = 1
+
+RANDOM_STATE = 42
+N_INIT = 10
+SILHOUETTE_SAMPLE = 10_000
+MINIBATCH_SIZE = 4_096
+METHODS = ('kmeans', 'minibatch')
+
+# Matrix shared by the worker processes (set once per worker, not per task)
+_WORKER_X = None
+
+
+def make_model(k: int, method: str = 'kmeans', random_state: int = RANDOM_STATE, n_init: int = N_INIT):
+    if method == 'kmeans':
+        return KMeans(n_clusters=k, random_state=random_state, n_init=n_init)
+    if method == 'minibatch':
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=n_init,
+                               batch_size=MINIBATCH_SIZE)
+    raise ValueError(f'Unknown method {method!r} (expected one of {", ".join(METHODS)})')
+
+
+def stratified_sample(labels: np.ndarray, size: int, random_state: int = RANDOM_STATE) -> np.ndarray:
+    """
+    Row indices of a sample spread across labels in proportion to their size.
+
+    Every label keeps at least 2 rows (when it has them), which silhouette
+    needs to score a cluster. Returns all rows when size >= len(labels).
+    """
+    labels = np.asarray(labels)
+    if size is None or size >= len(labels):
+        return np.arange(len(labels))
+    rng = np.random.default_rng(random_state)
+    uniques, codes, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    quota = np.maximum(np.minimum(counts, 2), np.floor(counts * size / len(labels)).astype(int))
+    order = np.argsort(codes, kind='stable')
+    bounds = np.r_[0, np.cumsum(counts)]
+    parts = [rng.choice(order[bounds[i]:bounds[i + 1]], size=quota[i], replace=False)
+             for i in range(len(uniques))]
+    return np.sort(np.concatenate(parts))
+
+
+def evaluate_k(X: np.ndarray, k: int, method: str = 'kmeans', sample_size: int = SILHOUETTE_SAMPLE,
+               random_state: int = RANDOM_STATE, n_init: int = N_INIT) -> dict:
+    """Fits one candidate k; returns its silhouette, inertia and timing."""
+    start = time.perf_counter()
+    labels = make_model(k, method, random_state, n_init).fit(X)
+    inertia = float(labels.inertia_)
+    labels = labels.labels_
+    sample = stratified_sample(labels, sample_size, random_state)
+    silhouette = float(silhouette_score(X[sample], labels[sample]))
+    return {
+        'k': int(k),
+        'silhouette': silhouette,
+        'inertia': inertia,
+        'sampled_rows': int(len(sample)),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def _init_worker(X: np.ndarray, threads: int) -> None:
+    global _WORKER_X
+    _WORKER_X = X
+    # KMeans/silhouette use every core through OpenMP/BLAS; split them between workers
+    threadpool_limits(threads)
+
+
+def _evaluate_task(args: tuple) -> dict:
+    k, method, sample_size, random_state, n_init = args
+    return evaluate_k(_WORKER_X, k, method, sample_size, random_state, n_init)
+
+
+def search_key(X: np.ndarray, method: str, sample_size, random_state: int, n_init: int) -> dict:
+    """Identifies a search: the data (hash of X) and every parameter that changes a result."""
+    X = np.ascontiguousarray(X)
+    digest = hashlib.sha1(str((X.dtype, X.shape)).encode())
+    digest.update(X.tobytes())
+    return {
+        'version': CACHE_VERSION,
+        'data': digest.hexdigest(),
+        'method': method,
+        'sample_size': sample_size,
+        'random_state': random_state,
+        'n_init': n_init,
+    }
+
+
+def _load_cache(path: str, key: dict) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    if cache.get('key') != key:
+        return {}
+    return {int(k): result for k, result in cache.get('results', {}).items()}
+
+
+def _save_cache(path: str, key: dict, results: dict) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'key': key, 'results': {str(k): results[k] for k in sorted(results)}}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _report(result: dict, cached: bool = False) -> None:
+    source = 'cache' if cached else f"{result['seconds']:.1f}s"
+    print(f"  n_clusters={result['k']:2d} | Silhouette: {result['silhouette']:.4f} | "
+          f"Inertia: {result['inertia']:.2f} ({source})")
+
+
+def select_k(X, k_values=range(2, 16), method: str = 'kmeans', sample_size: int = SILHOUETTE_SAMPLE,
+             n_jobs: int = 1, cache_path: str = None, random_state: int = RANDOM_STATE,
+             n_init: int = N_INIT, verbose: bool = True) -> tuple:
+    """
+    Grid search over k by silhouette.
+
+    Args:
+        X: (rows x features) standardized matrix, e.g. X_scaled
+        k_values: Candidate numbers of clusters
+        method: 'kmeans' (as the notebook) or 'minibatch' (MiniBatchKMeans)
+        sample_size: Rows in the stratified silhouette sample (None = all rows)
+        n_jobs: Processes evaluating k values in parallel
+        cache_path: Optional JSON with finished k values; reused only for the
+            same data and parameters, and updated after every k
+        random_state, n_init: Passed to the KMeans models
+
+    Returns:
+        (optimal_k, scores) with scores a DataFrame indexed by k (silhouette,
+        inertia, sampled_rows, seconds)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    k_values = [int(k) for k in k_values]
+    key = search_key(X, method, sample_size, random_state, n_init) if cache_path else None
+    results = {k: r for k, r in _load_cache(cache_path, key).items() if k in k_values}
+    if verbose:
+        for k in sorted(results):
+            _report(results[k], cached=True)
+
+    todo = [k for k in k_values if k not in results]
+    tasks = [(k, method, sample_size, random_state, n_init) for k in todo]
+
+    def finish(result):
+        results[result['k']] = result
+        if cache_path:
+            _save_cache(cache_path, key, results)
+        if verbose:
+            _report(result)
+
+    if n_jobs and n_jobs > 1 and len(tasks) > 1:
+        workers = min(n_jobs, len(tasks))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, threads)) as pool:
+            for future in as_completed([pool.submit(_evaluate_task, task) for task in tasks]):
+                finish(future.result())
+    else:
+        for k, *params in tasks:
+            finish(evaluate_k(X, k, *params))
+
+    scores = pd.DataFrame([results[k] for k in k_values]).set_index('k')
+    optimal_k = int(scores['silhouette'].idxmax())
+    return optimal_k, scores
+
+
+def fit_clusters(X, k: int, method: str = 'kmeans', random_state: int = RANDOM_STATE,
+                 n_init: int = N_INIT) -> tuple:
+    """Final model for the chosen k; returns (labels, model)."""
+    model = make_model(k, method, random_state, n_init)
+    labels = model.fit_predict(X)
+    return labels, model
@@ -0,0 +1,518 @@
+"""
+Datalake IO - Shared Loaders for the Processed Layer
+====================================================
+
+Every processed table is written twice: the CSV that Power BI imports and a
+typed, zstd-compressed Parquet copy next to it. Loaders read the Parquet copy
+when it is at least as fresh as the CSV, pulling only the requested columns
+and, when filters are given, only the row groups whose statistics can match.
+Without pyarrow (or without a Parquet copy) they fall back to the CSV.
+
+Players and teams are also written as a Hive-style partitioned dataset
+(<table>/league=<league>/season=<code>/part-0.parquet). Filtered loads read
+it so that only the matching partition directories are opened: one league
+and a couple of seasons touch a few files out of hundreds.
+
+Usage:
+    from datalake_io import load_table
+    df = load_table('players', columns=['player', 'team', 'season'])
+    df = load_table('players', filters=[('league', '==', 'ENG-Premier League'),
+                                        ('season', 'in', ['2223', '2324'])])
+"""
+
+import json
+import os
+import shutil
+import pandas as pd
+
+from schema import apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - Parquet is optional, CSV always works
+    pa = None
+    ds = None
+    pq = None
+
+
+PROCESSED_DIR = os.path.join('datalake', 'processed')
+
+# Logical table name -> path without extension
+TABLES = {
+    'players': os.path.join(PROCESSED_DIR, 'players_complete_1995_2025'),
+    'teams': os.path.join(PROCESSED_DIR, 'teams_complete_1995_2025'),
+    'squads': os.path.join(PROCESSED_DIR, 'squads_complete'),
+    'matches': os.path.join(PROCESSED_DIR, 'matches'),
+}
+
+# Player clusters written by scripts/clusterization (read by the PCA stage and vector_index)
+PLAYERS_CLUSTERED_PATH = os.path.join(PROCESSED_DIR, 'players_clustered.csv')
+
+# Columns that must stay strings (season codes keep leading zeros: '0001', '9596')
+STRING_COLUMNS = ['season']
+
+# Sorting by these columns keeps row-group statistics tight, so filters on
+# league/season skip most of the file (chronological: '9596' before '0001')
+SORT_COLUMNS = ['league', 'season_start_year', 'season']
+
+ROW_GROUP_SIZE = 16_384
+
+# Hive partition keys of the partitioned copy (always strings: '0001', '9596')
+PARTITION_COLUMNS = ['league', 'season']
+PARTITIONED_TABLES = ('players', 'teams')
+DATASET_MARKER = '_table.json'
+
+
+def table_paths(table: str) -> tuple:
+    """Returns (csv_path, parquet_path) for a logical table name or base path."""
+    base = TABLES.get(table, table)
+    if base.endswith('.csv') or base.endswith('.parquet'):
+        base = os.path.splitext(base)[0]
+    return f'{base}.csv', f'{base}.parquet'
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def _prepare_for_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalizes object columns so pyarrow infers one type per column."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> str:
+    """Writes a typed, compressed Parquet copy of a DataFrame (row order preserved)."""
+    if not parquet_available():
+        print(f'⚠️  pyarrow not installed - skipping Parquet copy: {path}')
+        return None
+
+    table = pa.Table.from_pandas(_prepare_for_parquet(df), preserve_index=False)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    pq.write_table(table, tmp_path, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_table(df: pd.DataFrame, table: str, sort_by=SORT_COLUMNS, partition_by=None) -> tuple:
+    """
+    Writes the CSV and the Parquet copy of a processed table.
+
+    Both files share the same row order, so row offsets are valid in either.
+    Tables with a declared schema (schema.py) are written with its compact
+    numeric types. With partition_by (e.g. PARTITION_COLUMNS) the Hive-partitioned copy is
+    written as well.
+    """
+    csv_path, parquet_path = table_paths(table)
+    df = apply_schema(df, table, categories=False)
+    sort_cols = [c for c in (sort_by or []) if c in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind='stable').reset_index(drop=True)
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    df.to_csv(csv_path, index=False)
+    write_parquet(df, parquet_path)
+    if partition_by:
+        write_partitioned(df, table, partition_by)
+    return csv_path, parquet_path
+
+
+class TableWriter:
+    """
+    Incremental writer for a processed table.
+
+    Batches are appended to the CSV and to the Parquet copy as they arrive, so
+    a table larger than memory can be written chunk by chunk. The column types
+    are fixed up front (dtypes), keeping the Parquet schema identical across
+    batches. Both files are written to temporary paths and replaced on close;
+    on error the temporaries are removed and the old table is left untouched.
+    With partition_by each batch also goes to the Hive-partitioned copy, so
+    batches should hold whole partitions (one file per batch and partition).
+
+    Usage:
+        with TableWriter('players', dtypes, partition_by=PARTITION_COLUMNS) as writer:
+            for batch in batches:
+                writer.write(batch)
+    """
+
+    def __init__(self, table: str, dtypes: dict, row_group_size: int = ROW_GROUP_SIZE,
+                 partition_by=None):
+        self.csv_path, self.parquet_path = table_paths(table)
+        self.dtypes = dict(dtypes)
+        self.columns = list(self.dtypes)
+        # String columns are left as read (astype(str) would turn NaN into 'nan' on pandas 2)
+        self._casts = {c: t for c, t in self.dtypes.items() if t not in (str, 'str', 'object', object)}
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._buffer = []
+        self._buffered = 0
+        self._parquet = None
+        self._schema = None
+        self._partitioned = None
+        if parquet_available():
+            empty = pd.DataFrame({c: pd.Series(dtype=t) for c, t in self.dtypes.items()})
+            self._schema = pa.Schema.from_pandas(_prepare_for_parquet(empty), preserve_index=False)
+            if partition_by:
+                self._partitioned = PartitionedWriter(table, self.columns, partition_by)
+        else:
+            print(f'⚠️  pyarrow not installed - skipping Parquet copy: {self.parquet_path}')
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.csv_path) or '.', exist_ok=True)
+        self._csv_tmp = f'{self.csv_path}.tmp'
+        self._parquet_tmp = f'{self.parquet_path}.tmp'
+        self._csv = open(self._csv_tmp, 'w', encoding='utf-8', newline='')
+        if self._schema is not None:
+            self._parquet = pq.ParquetWriter(self._parquet_tmp, self._schema, compression='zstd')
+        if self._partitioned is not None:
+            self._partitioned.__enter__()
+        return self
+
+    def write(self, df: pd.DataFrame) -> None:
+        df = df.reindex(columns=self.columns).astype(self._casts)
+        df.to_csv(self._csv, index=False, header=self.rows == 0)
+        self.rows += len(df)
+        if self._parquet is not None:
+            self._buffer.append(df)
+            self._buffered += len(df)
+            if self._buffered >= self.row_group_size:
+                self._flush()
+        if self._partitioned is not None:
+            self._partitioned.write(df)
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        batch = pd.concat(self._buffer, ignore_index=True) if len(self._buffer) > 1 else self._buffer[0]
+        table = pa.Table.from_pandas(_prepare_for_parquet(batch), schema=self._schema, preserve_index=False)
+        self._parquet.write_table(table, row_group_size=self.row_group_size)
+        self._buffer, self._buffered = [], 0
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                if self.rows == 0:
+                    # Header only, like DataFrame.to_csv on an empty frame
+                    pd.DataFrame(columns=self.columns).to_csv(self._csv, index=False)
+                if self._parquet is not None:
+                    self._flush()
+        finally:
+            self._csv.close()
+            if self._parquet is not None:
+                self._parquet.close()
+        if exc_type is not None:
+            for path in (self._csv_tmp, self._parquet_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+            if self._partitioned is not None:
+                self._partitioned.__exit__(exc_type, exc, tb)
+            return False
+        # CSV first so the Parquet copies end up at least as fresh
+        os.replace(self._csv_tmp, self.csv_path)
+        if self._parquet is not None:
+            os.replace(self._parquet_tmp, self.parquet_path)
+        if self._partitioned is not None:
+            self._partitioned.__exit__(None, None, None)
+        return False
+
+
+def dataset_path(table: str) -> str:
+    """Directory of the partitioned copy of a table (the table's base path)."""
+    return os.path.splitext(table_paths(table)[0])[0]
+
+
+def _partitioning(partition_by):
+    schema = pa.schema([(col, pa.string()) for col in partition_by])
+    return ds.partitioning(schema, flavor='hive')
+
+
+class PartitionedWriter:
+    """
+    Writes a table as a Hive-partitioned Parquet dataset, batch by batch.
+
+    Files go to a temporary directory that replaces the old dataset on close,
+    followed by a marker (_table.json) with the column order and row count -
+    readers only trust a dataset whose marker is newer than the CSV. Partition
+    values are URI-encoded in directory names; missing values go to the
+    __HIVE_DEFAULT_PARTITION__ directory and read back as missing.
+    """
+
+    def __init__(self, table: str, columns: list, partition_by=PARTITION_COLUMNS):
+        self.path = dataset_path(table)
+        self.columns = list(columns)
+        self.partition_by = [c for c in partition_by if c in self.columns]
+        self.rows = 0
+        self._batches = 0
+
+    def __enter__(self):
+        self._tmp = f'{self.path}.tmp'
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        return self
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(_prepare_for_parquet(df), preserve_index=False)
+        ds.write_dataset(
+            table, self._tmp, format='parquet',
+            partitioning=_partitioning(self.partition_by),
+            basename_template=f'part-{self._batches}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+            max_rows_per_group=ROW_GROUP_SIZE,
+        )
+        self._batches += 1
+        self.rows += len(df)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            return False
+        old = f'{self.path}.old'
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old)
+        os.replace(self._tmp, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+        with open(os.path.join(self.path, DATASET_MARKER), 'w', encoding='utf-8') as f:
+            json.dump({'columns': self.columns, 'partition_by': self.partition_by,
+                       'rows': self.rows}, f, ensure_ascii=False)
+        return False
+
+
+def write_partitioned(df: pd.DataFrame, table: str, partition_by=PARTITION_COLUMNS) -> str:
+    """Writes the Hive-partitioned copy of a table (league=/season= directories)."""
+    if not parquet_available():
+        print(f'⚠️  pyarrow not installed - skipping partitioned copy: {dataset_path(table)}')
+        return None
+    with PartitionedWriter(table, df.columns, partition_by) as writer:
+        writer.write(df)
+    return writer.path
+
+
+def _dataset_marker(table: str) -> str:
+    return os.path.join(dataset_path(table), DATASET_MARKER)
+
+
+def _dataset_is_fresh(table: str) -> bool:
+    marker = _dataset_marker(table)
+    if not parquet_available() or not os.path.exists(marker):
+        return False
+    csv_path = table_paths(table)[0]
+    return not os.path.exists(csv_path) or os.path.getmtime(marker) >= os.path.getmtime(csv_path)
+
+
+def _open_dataset(table: str):
+    with open(_dataset_marker(table), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    dataset = ds.dataset(dataset_path(table), format='parquet',
+                         partitioning=_partitioning(meta['partition_by']),
+                         exclude_invalid_files=False, ignore_prefixes=['.', '_'])
+    return dataset, meta
+
+
+def partition_files(table: str, filters=None) -> list:
+    """Parquet files a filtered read of the partitioned copy would open."""
+    dataset, _ = _open_dataset(table)
+    expression = pq.filters_to_expression(filters) if filters else None
+    return [fragment.path for fragment in dataset.get_fragments(filter=expression)]
+
+
+def load_partitioned(table: str, columns=None, filters=None) -> pd.DataFrame:
+    """
+    Reads the partitioned copy, opening only partitions that can match.
+
+    Predicates on partition keys (league, season) prune whole directories;
+    predicates on other columns still use row-group statistics. Rows come
+    back grouped by partition.
+    """
+    dataset, meta = _open_dataset(table)
+    expression = pq.filters_to_expression(filters) if filters else None
+    read_cols = list(columns) if columns is not None else meta['columns']
+    return apply_schema(dataset.to_table(columns=read_cols, filter=expression).to_pandas(), table)
+
+
+def _parquet_is_fresh(csv_path: str, parquet_path: str) -> bool:
+    if not parquet_available() or not os.path.exists(parquet_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def _apply_filters(df: pd.DataFrame, filters) -> pd.DataFrame:
+    """Applies pyarrow-style filters [(col, op, value), ...] to a DataFrame."""
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        series = df[col]
+        if op in ('==', '='):
+            mask &= series == value
+        elif op == '!=':
+            mask &= series != value
+        elif op == 'in':
+            mask &= series.isin(list(value))
+        elif op == 'not in':
+            mask &= ~series.isin(list(value))
+        elif op == '<':
+            mask &= series < value
+        elif op == '<=':
+            mask &= series <= value
+        elif op == '>':
+            mask &= series > value
+        elif op == '>=':
+            mask &= series >= value
+        else:
+            raise ValueError(f'Unsupported filter operator: {op}')
+    return df[mask]
+
+
+def load_table(table: str, columns=None, filters=None) -> pd.DataFrame:
+    """
+    Loads a processed table reading only what is needed.
+
+    Args:
+        table: Logical name from TABLES ('players', 'teams', 'squads') or a base path
+        columns: Columns to read (None = all)
+        filters: pyarrow-style predicates, e.g. [('season', 'in', ['2223', '2324'])]
+
+    Returns:
+        DataFrame with the requested columns and rows, in the table's compact
+        dtypes (schema.py) when it declares one
+    """
+    csv_path, parquet_path = table_paths(table)
+    columns = list(columns) if columns is not None else None
+
+    if filters and _dataset_is_fresh(table):
+        return load_partitioned(table, columns=columns, filters=filters)
+
+    if _parquet_is_fresh(csv_path, parquet_path):
+        read_cols = columns
+        if columns is not None and filters:
+            read_cols = list(dict.fromkeys(columns + [f[0] for f in filters]))
+        df = pq.read_table(parquet_path, columns=read_cols, filters=filters).to_pandas()
+        return apply_schema(df[columns] if columns is not None else df, table)
+
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f'File not found: {csv_path}')
+
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys(columns + [f[0] for f in (filters or [])]))
+    df = pd.read_csv(csv_path, usecols=usecols, low_memory=False,
+                     dtype={c: str for c in STRING_COLUMNS})
+    if filters:
+        df = _apply_filters(df, filters)
+    return apply_schema(df[columns] if columns is not None else df, table)
+
+
+def source_path(table: str) -> str:
+    """Returns the file load_table would read for a table (Parquet or CSV)."""
+    csv_path, parquet_path = table_paths(table)
+    return parquet_path if _parquet_is_fresh(csv_path, parquet_path) else csv_path
+
+
+def read_rows(table: str, offsets, columns=None) -> pd.DataFrame:
+    """
+    Reads only the rows at the given 0-based offsets.
+
+    With Parquet only the row groups containing the offsets are decoded; with
+    CSV the other lines are skipped while streaming, so the full table is never
+    held in memory.
+    """
+    offsets = sorted(set(int(o) for o in offsets))
+    csv_path, parquet_path = table_paths(table)
+
+    if _parquet_is_fresh(csv_path, parquet_path):
+        pf = pq.ParquetFile(parquet_path)
+        starts, groups, position = [], [], 0
+        for i in range(pf.metadata.num_row_groups):
+            n = pf.metadata.row_group(i).num_rows
+            if any(position <= o < position + n for o in offsets):
+                groups.append(i)
+                starts.append(position)
+            position += n
+        if not groups:
+            empty = pf.schema_arrow.empty_table().to_pandas()
+            return apply_schema(empty[columns] if columns is not None else empty, table)
+        table_ = pf.read_row_groups(groups, columns=columns)
+        # Map global offsets to positions inside the concatenated row groups
+        local, base = [], 0
+        for group, start in zip(groups, starts):
+            n = pf.metadata.row_group(group).num_rows
+            local.extend(o - start + base for o in offsets if start <= o < start + n)
+            base += n
+        return apply_schema(table_.take(local).to_pandas(), table)
+
+    wanted = set(offsets)
+    df = pd.read_csv(csv_path, usecols=columns, low_memory=False,
+                     dtype={c: str for c in STRING_COLUMNS},
+                     skiprows=lambda i: i > 0 and (i - 1) not in wanted)
+    return apply_schema(df, table)
+
+
+def table_columns(table: str) -> list:
+    """Column names of a processed table, read from metadata/header only."""
+    if _dataset_is_fresh(table):
+        return list(_open_dataset(table)[1]['columns'])
+    csv_path, parquet_path = table_paths(table)
+    if _parquet_is_fresh(csv_path, parquet_path):
+        return list(pq.ParquetFile(parquet_path).schema_arrow.names)
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f'File not found: {csv_path}')
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+
+def iter_table(table: str, columns=None, chunk_size: int = ROW_GROUP_SIZE):
+    """
+    Yields a processed table in chunks of about chunk_size rows.
+
+    Parquet is read batch by batch (only the requested columns); CSV through
+    pandas' chunked reader. Chunks come in the table's compact dtypes.
+    """
+    csv_path, parquet_path = table_paths(table)
+    columns = list(columns) if columns is not None else None
+
+    if _parquet_is_fresh(csv_path, parquet_path):
+        pf = pq.ParquetFile(parquet_path)
+        for batch in pf.iter_batches(batch_size=chunk_size, columns=columns):
+            yield apply_schema(batch.to_pandas(), table)
+        return
+
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f'File not found: {csv_path}')
+    for chunk in pd.read_csv(csv_path, usecols=columns, low_memory=False, chunksize=chunk_size,
+                             dtype={c: str for c in STRING_COLUMNS}):
+        yield apply_schema(chunk[columns] if columns is not None else chunk, table)
+
+
+def iter_partitions(table: str, columns=None, chunk_size: int = ROW_GROUP_SIZE):
+    """
+    Yields (partition, chunk) over a processed table.
+
+    With a fresh partitioned copy every chunk is one partition file, and
+    partition is its keys ({'league': ..., 'season': ...}; missing values
+    come back as None). Otherwise the table is read with iter_table and
+    partition is None.
+    """
+    columns = list(columns) if columns is not None else None
+    if not _dataset_is_fresh(table):
+        for chunk in iter_table(table, columns, chunk_size):
+            yield None, chunk
+        return
+
+    dataset, meta = _open_dataset(table)
+    read_cols = columns if columns is not None else meta['columns']
+    partition_by = meta['partition_by']
+    file_cols = [c for c in read_cols if c not in partition_by]
+    for fragment in dataset.get_fragments():
+        keys = ds.get_partition_keys(fragment.partition_expression)
+        partition = {col: keys.get(col) for col in partition_by}
+        df = fragment.to_table(columns=file_cols).to_pandas()
+        for col in partition_by:
+            if col in read_cols:
+                df[col] = partition[col]
+        yield partition, apply_schema(df[read_cols], table)
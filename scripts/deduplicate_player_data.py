@@ -2,91 +2,189 @@
 Remove duplicate rows from enriched player datasets.
 
 This script:
-1. Identifies duplicate season+team+league rows
-2. Keeps only the first occurrence
-3. Saves deduplicated CSV
+1. Identifies duplicate season+league+stats rows
+2. Drops the rows whose team column holds a league name instead of a club
+3. Saves deduplicated CSV (written to a temp file and renamed into place)
+
+With --all every *_enriched.csv in datalake/processed/enriched/ is cleaned in
+one run, one file per worker process. Files without duplicates are left
+untouched.
 
 Usage:
     python scripts/deduplicate_player_data.py player_name
-    
+    python scripts/deduplicate_player_data.py --all [--workers 4]
+
 Example:
     python scripts/deduplicate_player_data.py "Cristiano Ronaldo"
 """
 
+import argparse
+import glob
+import os
+import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-import os
+
+ENRICHED_DIR = 'datalake/processed/enriched'
+ENRICHED_SUFFIX = '_enriched.csv'
+
+# Rows with the same season, league and stats are one season listed twice
+DUPLICATE_SUBSET = ['season', 'league', 'Performance_Gls', 'Playing_Time_MP']
+
+# League names that show up in the team column of the duplicated rows
+LEAGUE_KEYWORDS = ['Premier League', 'LaLiga', 'Liga', 'Serie A', 'Bundesliga', 'Ligue 1']
+
+# One compiled alternation instead of a keyword loop per row
+LEAGUE_PATTERN = re.compile('|'.join(re.escape(keyword) for keyword in LEAGUE_KEYWORDS))
+
+
+def enriched_path(player_name):
+    safe_name = player_name.lower().replace(' ', '_').replace('á', 'a').replace('é', 'e')
+    return os.path.join(ENRICHED_DIR, f'{safe_name}{ENRICHED_SUFFIX}')
+
+
+def is_league_name(teams):
+    """Boolean mask of team values that contain a league name (missing -> False)."""
+    codes, uniques = pd.factorize(pd.Series(teams))
+    if not len(uniques):
+        return np.zeros(len(codes), dtype=bool)
+    # Each distinct team is matched once; rows take the result of their team
+    unique_mask = np.fromiter((LEAGUE_PATTERN.search(str(team)) is not None for team in uniques),
+                              dtype=bool, count=len(uniques))
+    return np.where(codes >= 0, unique_mask[codes], False)
+
+
+def deduplicate_frame(df):
+    """
+    Returns (cleaned df, stats).
+
+    When rows repeat on DUPLICATE_SUBSET, rows whose team is a league name are
+    dropped; without duplicates df is returned as is.
+    """
+    dup_mask = df.duplicated(subset=DUPLICATE_SUBSET, keep=False)
+    stats = {
+        'rows': len(df),
+        'duplicates': int(dup_mask.sum()),
+        'league_rows': 0,
+        'goals': float(df['Performance_Gls'].sum()),
+    }
+    if not stats['duplicates']:
+        return df, {**stats, 'removed': 0, 'new_goals': stats['goals']}
+
+    league_mask = is_league_name(df['team'])
+    df_clean = df[~league_mask]
+    stats['league_rows'] = int(league_mask.sum())
+    stats['removed'] = len(df) - len(df_clean)
+    stats['new_goals'] = float(df_clean['Performance_Gls'].sum())
+    return df_clean, stats
+
+
+def write_csv_atomic(df, path):
+    tmp_path = f'{path}.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def deduplicate_file(path):
+    """Deduplicates one enriched CSV in place (rewritten only if rows were removed)."""
+    start = time.perf_counter()
+    try:
+        df = pd.read_csv(path, dtype={'season': str})
+        df_clean, stats = deduplicate_frame(df)
+        if stats['removed']:
+            write_csv_atomic(df_clean, path)
+        status = 'cleaned' if stats['removed'] else 'clean'
+        return {'path': path, 'status': status, **stats, 'seconds': time.perf_counter() - start}
+    except Exception as e:
+        return {'path': path, 'status': 'error', 'error': str(e), 'seconds': time.perf_counter() - start}
+
+
+def deduplicate_all(directory=ENRICHED_DIR, workers=None):
+    """Deduplicates every *_enriched.csv of directory, files in parallel processes."""
+    paths = sorted(glob.glob(os.path.join(directory, f'*{ENRICHED_SUFFIX}')))
+    if not paths:
+        print(f'❌ No *{ENRICHED_SUFFIX} files in {directory}')
+        return []
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    print(f'\n🧹 Deduplicating {len(paths)} files ({workers} workers)...')
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(deduplicate_file, paths))
+    else:
+        results = [deduplicate_file(path) for path in paths]
+
+    for r in results:
+        name = os.path.basename(r['path'])
+        if r['status'] == 'error':
+            print(f'   ❌ {name}: {r["error"]}')
+        elif r['status'] == 'cleaned':
+            print(f'   ✅ {name}: {r["rows"]} → {r["rows"] - r["removed"]} rows (-{r["removed"]}), '
+                  f'goals {r["goals"]:.0f} → {r["new_goals"]:.0f}')
+        else:
+            print(f'   ✓ {name}: no duplicates ({r["rows"]} rows)')
+
+    cleaned = sum(r['status'] == 'cleaned' for r in results)
+    failed = sum(r['status'] == 'error' for r in results)
+    removed = sum(r.get('removed', 0) for r in results)
+    print(f'\n📊 Summary: {cleaned} cleaned, {len(results) - cleaned - failed} already clean, '
+          f'{failed} failed; {removed} rows removed ({time.perf_counter() - start:.2f}s)\n')
+    return results
+
 
 def deduplicate_player_data(player_name):
     """Remove duplicate rows from player enriched CSV."""
-    
-    safe_name = player_name.lower().replace(' ', '_').replace('á', 'a').replace('é', 'e')
-    file_path = f'datalake/processed/enriched/{safe_name}_enriched.csv'
-    
+
+    file_path = enriched_path(player_name)
+
     if not os.path.exists(file_path):
         print(f'❌ File not found: {file_path}')
         return
-    
+
     print(f'\n🔍 Loading {file_path}...')
     df = pd.read_csv(file_path, dtype={'season': str})
-    
+
     original_count = len(df)
     original_goals = df['Performance_Gls'].sum()
-    
+
     print(f'   Original rows: {original_count}')
     print(f'   Original goals total: {original_goals}')
-    
-    # Check for duplicates
-    print(f'\n🔍 Checking for duplicates...')
-    
-    # Method 1: Check duplicates by season+league (same season, same league, same stats)
+
+    # Check for duplicates by season+league (same season, same league, same stats)
     # This catches rows where team="Premier League" vs team="Manchester Utd" for same season
-    dup_mask = df.duplicated(subset=['season', 'league', 'Performance_Gls', 'Playing_Time_MP'], keep=False)
-    duplicates = df[dup_mask].sort_values(['season', 'league'])
-    
-    if len(duplicates) > 0:
+    print(f'\n🔍 Checking for duplicates...')
+    df_clean, stats = deduplicate_frame(df)
+
+    if stats['duplicates']:
+        duplicates = df[df.duplicated(subset=DUPLICATE_SUBSET, keep=False)].sort_values(['season', 'league'])
         print(f'   ⚠️ Found {len(duplicates)} rows with duplicate season+league+stats')
         print(f'\n   Sample duplicates (same season, same league, same stats):')
         print(duplicates[['season', 'team', 'league', 'Performance_Gls', 'Playing_Time_MP']].head(20))
     else:
         print(f'   ✅ No duplicates found')
         return
-    
-    # Remove duplicates - keep rows where team is NOT the league name
-    # Logic: keep rows where team column doesn't match a known league name
-    print(f'\n🧹 Removing duplicates...')
-    
-    # Identify league-named rows to remove
-    league_keywords = ['Premier League', 'LaLiga', 'Liga', 'Serie A', 'Bundesliga', 'Ligue 1']
-    
-    def is_league_team_name(team):
-        """Check if team column contains a league name instead of actual team."""
-        if pd.isna(team):
-            return False
-        team_str = str(team)
-        return any(keyword in team_str for keyword in league_keywords)
-    
-    # Mark rows to remove
-    df['is_league_name'] = df['team'].apply(is_league_team_name)
-    
-    print(f'   Found {df["is_league_name"].sum()} rows with league names in team column')
-    
+
     # Keep only rows where team is NOT a league name
-    df_clean = df[~df['is_league_name']].copy()
-    df_clean = df_clean.drop(columns=['is_league_name'])
-    
+    print(f'\n🧹 Removing duplicates...')
+    print(f'   Found {stats["league_rows"]} rows with league names in team column')
+
     new_count = len(df_clean)
     new_goals = df_clean['Performance_Gls'].sum()
     removed = original_count - new_count
-    
+
     print(f'   ✅ Removed {removed} duplicate rows')
     print(f'   New row count: {new_count}')
     print(f'   New goals total: {new_goals}')
     print(f'   Goals difference: {original_goals - new_goals}')
-    
+
     # Save cleaned file
-    df_clean.to_csv(file_path, index=False)
-    
+    write_csv_atomic(df_clean, file_path)
+
     print(f'\n✅ Saved cleaned data: {file_path}')
     print(f'\n📊 Summary:')
     print(f'   Rows: {original_count} → {new_count} (-{removed})')
@@ -95,13 +193,21 @@ def deduplicate_player_data(player_name):
 
 
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description='Remove duplicate rows from enriched player datasets')
+    parser.add_argument('player_name', nargs='?', help='Player whose enriched CSV is cleaned')
+    parser.add_argument('--all', action='store_true', help=f'Clean every *{ENRICHED_SUFFIX} in {ENRICHED_DIR}')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel processes for --all (default: CPUs)')
+    args = parser.parse_args()
+
+    if args.all:
+        results = deduplicate_all(workers=args.workers)
+        sys.exit(1 if not results or any(r['status'] == 'error' for r in results) else 0)
+    if not args.player_name:
         print(__doc__)
         print('\nExample: python scripts/deduplicate_player_data.py "Cristiano Ronaldo"')
         sys.exit(1)
-    
-    player_name = sys.argv[1]
-    deduplicate_player_data(player_name)
+
+    deduplicate_player_data(args.player_name)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,230 @@
+"""
+Dimensions - Stable integer ids for players and teams
+=====================================================
+
+The processed tables name players and teams by display name, and the FBref
+and Transfermarkt sources spell them differently ('Manchester Utd' /
+'Manchester United', 'Paris S-G' / 'PSG', 'Kaká' / 'Kaka'). A Dimension maps
+every known spelling (alias) of an entity to one integer id and is persisted
+as a small CSV next to the processed tables:
+
+    datalake/processed/dim_players.csv    player_id, alias_key, alias, name, source
+    datalake/processed/dim_teams.csv      team_id, alias_key, alias, name, source
+
+alias_key is the accent-folded, lowercased alias (player_index.fold_name), so
+case, accents and spacing never split an entity. Ids are assigned once, in
+order of first appearance, and never change: rerunning the merge or adding a
+season keeps every existing id and only appends new ones. A new spelling is
+mapped to an existing entity with add_alias (or by adding a row with the same
+id to the CSV); TEAM_ALIASES seeds the Transfermarkt spellings of the squads
+database. Players are identified by name alone, so namesakes share an id, as
+they did with name matching.
+
+The merge stage writes player_id/team_id into the players and teams tables,
+consolidate_squads into the squads database; joins between them then compare
+int64 columns instead of case-folding strings.
+
+Usage:
+    from dimensions import load_dimension
+    teams = load_dimension('team')
+    df['team_id'] = teams.ids(df['team'], assign=True, source='fbref')
+    teams.save()
+
+    python scripts/dimensions.py team "PSG"     # resolve a name
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from player_index import fold_name
+
+DIMENSIONS_DIR = os.path.join('datalake', 'processed')
+DIMENSION_FILES = {'player': 'dim_players.csv', 'team': 'dim_teams.csv'}
+ID_COLUMNS = {'player': 'player_id', 'team': 'team_id'}
+
+# Id of a missing name (or, without assign, of a name not in the dimension)
+MISSING_ID = -1
+
+# Transfermarkt / common spellings -> FBref team name
+TEAM_ALIASES = {
+    'AC Milan': 'Milan',
+    'Inter Milan': 'Inter',
+    'SSC Napoli': 'Napoli',
+    'Borussia Dortmund': 'Dortmund',
+    'Bayer 04 Leverkusen': 'Leverkusen',
+    'Bayer Leverkusen': 'Leverkusen',
+    'Bayern München': 'Bayern Munich',
+    'Borussia Mönchengladbach': 'Gladbach',
+    'Eintracht Frankfurt': 'Eint Frankfurt',
+    '1.FC Köln': 'Köln',
+    'Manchester United': 'Manchester Utd',
+    'Newcastle United': 'Newcastle Utd',
+    'Sheffield United': 'Sheffield Utd',
+    'Sheffield Wednesday': 'Sheffield Weds',
+    'Tottenham Hotspur': 'Tottenham',
+    'West Ham United': 'West Ham',
+    'West Bromwich Albion': 'West Brom',
+    'Wolverhampton Wanderers': 'Wolves',
+    'Brighton & Hove Albion': 'Brighton',
+    'Nottingham Forest': "Nott'ham Forest",
+    'Atlético de Madrid': 'Atlético Madrid',
+    'Athletic Bilbao': 'Athletic Club',
+    'Real Betis': 'Betis',
+    'PSG': 'Paris S-G',
+    'Paris Saint-Germain': 'Paris S-G',
+    'Olympique Marseille': 'Marseille',
+    'AS Monaco': 'Monaco',
+}
+SEED_ALIASES = {'team': TEAM_ALIASES, 'player': {}}
+
+
+def dimension_path(entity: str) -> str:
+    return os.path.join(DIMENSIONS_DIR, DIMENSION_FILES[entity])
+
+
+class Dimension:
+    """Alias -> id mapping of one entity ('player' or 'team')."""
+
+    def __init__(self, entity: str, path: str = None):
+        if entity not in DIMENSION_FILES:
+            raise ValueError(f'Unknown entity {entity!r} (expected one of {", ".join(DIMENSION_FILES)})')
+        self.entity = entity
+        self.id_column = ID_COLUMNS[entity]
+        self.path = path or dimension_path(entity)
+        self._ids = {}       # alias_key -> id
+        self._names = {}     # id -> canonical name
+        self._rows = []      # (id, alias_key, alias, name, source), in assignment order
+        self._next_id = 1
+        self.changed = False
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    # ------------------------------------------------------------------
+    # Lookup / assignment
+    # ------------------------------------------------------------------
+
+    def _register(self, entity_id: int, key: str, alias, name, source: str) -> None:
+        self._ids[key] = entity_id
+        self._names.setdefault(entity_id, name)
+        self._rows.append((entity_id, key, alias, self._names[entity_id], source))
+        self._next_id = max(self._next_id, entity_id + 1)
+        self.changed = True
+
+    def id(self, name, assign: bool = False, source: str = '') -> int:
+        """Id of one name (MISSING_ID when unknown and not assigned)."""
+        key = fold_name(name)
+        if not key:
+            return MISSING_ID
+        if key in self._ids:
+            return self._ids[key]
+        if not assign:
+            return MISSING_ID
+        entity_id = self._next_id
+        self._register(entity_id, key, str(name), str(name), source)
+        return entity_id
+
+    def ids(self, names, assign: bool = False, source: str = '') -> np.ndarray:
+        """
+        int64 ids of a column of names (MISSING_ID for missing/unknown names).
+
+        Each distinct spelling is folded once; with assign, unknown names get new
+        ids in order of first appearance.
+        """
+        codes, uniques = pd.factorize(pd.Series(names))
+        if not len(uniques):
+            return np.full(len(codes), MISSING_ID, dtype=np.int64)
+        unique_ids = np.fromiter((self.id(name, assign, source) for name in uniques),
+                                 dtype=np.int64, count=len(uniques))
+        return np.where(codes >= 0, unique_ids[codes], MISSING_ID)
+
+    def add_alias(self, alias, name, source: str = 'alias') -> int:
+        """Maps alias to the entity of name (assigned first if new); existing aliases keep their id."""
+        key = fold_name(alias)
+        entity_id = self.id(name, assign=True, source=source)
+        if key and key not in self._ids:
+            self._register(entity_id, key, str(alias), None, source)
+        return self._ids.get(key, entity_id)
+
+    def name(self, entity_id: int):
+        """Canonical (first registered) name of an id."""
+        return self._names.get(int(entity_id))
+
+    def names(self, ids) -> pd.Series:
+        return pd.Series(ids).map(self._names)
+
+    # ------------------------------------------------------------------
+    # Persist
+    # ------------------------------------------------------------------
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self._rows, columns=[self.id_column, 'alias_key', 'alias', 'name', 'source'])
+
+    def save(self) -> str:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        self.to_frame().to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+        return self.path
+
+    @classmethod
+    def load(cls, entity: str, path: str = None, seed: bool = True) -> 'Dimension':
+        """Persisted dimension (empty if the file does not exist yet), plus the seed aliases."""
+        dimension = cls(entity, path)
+        if os.path.exists(dimension.path):
+            frame = pd.read_csv(dimension.path, dtype={'alias_key': str, 'alias': str, 'name': str,
+                                                       'source': str}, keep_default_na=False)
+            for entity_id, key, alias, name, source in frame.itertuples(index=False):
+                # Hand-added rows may leave alias_key empty
+                key = key or fold_name(alias)
+                if key and key not in dimension._ids:
+                    dimension._register(int(entity_id), key, alias, name or alias, source)
+            dimension.changed = False
+        if seed:
+            for alias, name in SEED_ALIASES[entity].items():
+                dimension.add_alias(alias, name, source='seed')
+        return dimension
+
+
+def load_dimension(entity: str, path: str = None) -> Dimension:
+    return Dimension.load(entity, path)
+
+
+def add_ids(df: pd.DataFrame, dimensions: dict, source: str = '', columns: dict = None) -> pd.DataFrame:
+    """
+    df with an id column per dimension (assigning new ids).
+
+    columns maps entity -> name column (default: 'player' and 'team'); entities
+    whose column is missing from df are skipped.
+    """
+    columns = columns or {'player': 'player', 'team': 'team'}
+    df = df.copy(deep=False)
+    for entity, dimension in dimensions.items():
+        column = columns.get(entity)
+        if column in df.columns:
+            df[dimension.id_column] = dimension.ids(df[column], assign=True, source=source)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve names through the player/team dimensions')
+    parser.add_argument('entity', choices=sorted(DIMENSION_FILES))
+    parser.add_argument('names', nargs='*', help='Names to resolve (none: summary)')
+    args = parser.parse_args()
+
+    dimension = load_dimension(args.entity)
+    print(f"📇 {dimension.path}: {len(dimension):,} {args.entity}s, {len(dimension.to_frame()):,} aliases")
+    for name in args.names:
+        entity_id = dimension.id(name)
+        if entity_id == MISSING_ID:
+            print(f"   '{name}': not found")
+        else:
+            print(f"   '{name}': {dimension.id_column}={entity_id} ({dimension.name(entity_id)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ Uso:
     python scripts/enrich_player.py "Cristiano Ronaldo"
     python scripts/enrich_player.py "Kaká"
     python scripts/enrich_player.py "Lionel Messi"
+    python scripts/enrich_player.py --batch watchlist.txt --workers 8
 
 Este script:
 1. Busca o jogador no dataset principal (FBref)
@@ -20,14 +21,24 @@ Autor: Datalake Project
 Data: 2025
 """
 
+import numpy as np
 import pandas as pd
+import argparse
 import json
 import os
 import sys
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+
+from datalake_io import load_table, read_rows, table_paths
+from dimensions import MISSING_ID, load_dimension
+from http_client import RateLimitedSession
+from player_index import find_offsets, load_name_index
+from season_codes import label_periods
+from transfermarkt_parsers import performance_rows
 
 
 # =============================================================================
@@ -56,32 +67,67 @@ INTERNATIONAL_COMPETITIONS = [
     'Gold Cup', 'Friendlies', 'WC Qualif'
 ]
 
+# Uma única alternação compilada (case-insensitive) no lugar do loop por competição
+INTERNATIONAL_PATTERN = re.compile(
+    '|'.join(re.escape(comp) for comp in INTERNATIONAL_COMPETITIONS), re.IGNORECASE
+)
+
+# (competition_type, is_domestic_league, is_primary_domestic)
+UNKNOWN_COMPETITION = ('Unknown', False, False)
+INTERNATIONAL_COMPETITION = ('International Competition', False, False)
+DOMESTIC_LEAGUE = ('Domestic League', True, True)  # Assumir principal se não for internacional
+
+# Intervalo mínimo entre requisições ao Transfermarkt no modo batch (segundos)
+TRANSFERMARKT_MIN_INTERVAL = 2.0
+
 
 # =============================================================================
 # FUNÇÕES PRINCIPAIS
 # =============================================================================
 
-def load_players_database():
-    """Carrega a base de dados de jogadores."""
+def load_players_database(columns=None):
+    """Carrega a base de dados de jogadores (Parquet quando disponível)."""
     path = PATHS['players_db']
-    if not os.path.exists(path):
+    if not any(os.path.exists(p) for p in table_paths(path)):
         raise FileNotFoundError(f"Arquivo não encontrado: {path}")
     
-    df = pd.read_csv(path, low_memory=False)
+    df = load_table(path, columns=columns)
     print(f"📊 Base de dados carregada: {len(df):,} registros")
     return df
 
 
-def search_player(df: pd.DataFrame, player_name: str) -> pd.DataFrame:
-    """Busca jogador na base de dados."""
-    # Busca exata primeiro
-    mask = df['player'].str.lower() == player_name.lower()
-    result = df[mask].copy()
-    
-    if len(result) == 0:
-        # Busca parcial
-        mask = df['player'].str.lower().str.contains(player_name.lower(), na=False)
-        result = df[mask].copy()
+def search_player(df: pd.DataFrame, player_name: str, index: dict = None) -> pd.DataFrame:
+    """
+    Busca jogador na base de dados.
+    
+    Com `index` (ver player_index.py) não há varredura da tabela: os offsets
+    vêm do índice e só essas linhas são lidas - de `df`, se fornecido, ou
+    direto do disco (df=None). Sem índice, se `df` tem player_id (dimensions.py)
+    o nome - ou um apelido, como a grafia do Transfermarkt - vira um id e a
+    busca exata é uma comparação de inteiros.
+    """
+    if index is not None:
+        offsets = find_offsets(index, player_name)
+        if df is not None:
+            result = df.iloc[offsets].copy()
+        else:
+            result = read_rows(PATHS['players_db'], offsets)
+    else:
+        result = df.iloc[0:0]
+        if 'player_id' in df.columns:
+            player_id = load_dimension('player').id(player_name)
+            if player_id != MISSING_ID:
+                result = df[df['player_id'].to_numpy() == player_id].copy()
+        
+        if len(result) == 0:
+            # Busca exata
+            mask = df['player'].str.lower() == player_name.lower()
+            result = df[mask].copy()
+        
+        if len(result) == 0:
+            # Busca parcial
+            mask = df['player'].str.lower().str.contains(player_name.lower(), na=False)
+            result = df[mask].copy()
     
     if len(result) == 0:
         raise ValueError(f"Jogador não encontrado: {player_name}")
@@ -93,7 +139,7 @@ def search_player(df: pd.DataFrame, player_name: str) -> pd.DataFrame:
         for p in unique_players:
             print(f"   - {p}")
         # Usar o primeiro que tem mais registros
-        player_counts = result.groupby('player').size()
+        player_counts = result.groupby('player', observed=True).size()
         best_match = player_counts.idxmax()
         result = result[result['player'] == best_match]
         print(f"   → Selecionado: {best_match}")
@@ -102,45 +148,57 @@ def search_player(df: pd.DataFrame, player_name: str) -> pd.DataFrame:
     return result
 
 
+@lru_cache(maxsize=None)
+def _classify_league(league_str: str) -> tuple:
+    """Classifica um nome de liga distinto (memoizado: há só algumas centenas)."""
+    if INTERNATIONAL_PATTERN.search(league_str):
+        return INTERNATIONAL_COMPETITION
+    # Se não é internacional, é liga doméstica
+    return DOMESTIC_LEAGUE
+
+
 def classify_competition(league: str) -> dict:
     """Classifica uma competição."""
     if pd.isna(league):
-        return {
-            'competition_type': 'Unknown',
-            'is_domestic_league': False,
-            'is_primary_domestic': False
-        }
-    
-    league_str = str(league).upper()
+        values = UNKNOWN_COMPETITION
+    else:
+        values = _classify_league(str(league))
+    return dict(zip(('competition_type', 'is_domestic_league', 'is_primary_domestic'), values))
+
+
+def classify_competitions(leagues: pd.Series) -> pd.DataFrame:
+    """
+    Classifica uma coluna inteira de ligas de uma vez.
     
-    # Verifica se é competição internacional
-    for intl in INTERNATIONAL_COMPETITIONS:
-        if intl.upper() in league_str:
-            return {
-                'competition_type': 'International Competition',
-                'is_domestic_league': False,
-                'is_primary_domestic': False
-            }
+    Cada liga distinta é classificada uma única vez (factorize) e o resultado é
+    espalhado para as linhas com take - serve tanto para o recorte de um
+    jogador quanto para a tabela completa de jogadores.
+    """
+    codes, uniques = pd.factorize(leagues)
+    # Última posição = linhas sem liga (código -1)
+    lookup = [_classify_league(str(league)) for league in uniques] + [UNKNOWN_COMPETITION]
+    types, domestic, primary = (np.asarray(col) for col in zip(*lookup))
+    codes = np.where(codes < 0, len(lookup) - 1, codes)
     
-    # Se não é internacional, é liga doméstica
-    return {
-        'competition_type': 'Domestic League',
-        'is_domestic_league': True,
-        'is_primary_domestic': True  # Assumir principal se não for internacional
-    }
+    return pd.DataFrame({
+        'competition_type': types[codes],
+        'is_domestic_league': domestic[codes].astype(bool),
+        'is_primary_domestic': primary[codes].astype(bool),
+    }, index=leagues.index)
 
 
 def add_competition_classification(df: pd.DataFrame) -> pd.DataFrame:
     """Adiciona classificação de competições ao DataFrame."""
-    classifications = df['league'].apply(classify_competition)
+    classifications = classify_competitions(df['league'])
     
-    df['competition_type'] = classifications.apply(lambda x: x['competition_type'])
-    df['is_domestic_league'] = classifications.apply(lambda x: x['is_domestic_league'])
-    df['is_primary_domestic'] = classifications.apply(lambda x: x['is_primary_domestic'])
+    df['competition_type'] = classifications['competition_type']
+    df['is_domestic_league'] = classifications['is_domestic_league']
+    df['is_primary_domestic'] = classifications['is_primary_domestic']
     
     # Contar competições por temporada
-    season_counts = df.groupby('season_period').size()
-    df['competitions_in_season'] = df['season_period'].map(season_counts)
+    season_counts = df.groupby('season_period', observed=True).size()
+    # season_period é categórica: o map devolveria as contagens como float (2.0)
+    df['competitions_in_season'] = df['season_period'].map(season_counts).astype('Int64')
     
     return df
 
@@ -183,71 +241,25 @@ def add_metadata_columns(df: pd.DataFrame, metadata: dict) -> pd.DataFrame:
     return df
 
 
-def fetch_transfermarkt_data(player_id: int, player_name: str) -> pd.DataFrame:
+def fetch_transfermarkt_data(player_id: int, player_name: str, client: RateLimitedSession = None) -> pd.DataFrame:
     """Busca dados do Transfermarkt para ligas não cobertas pelo FBref."""
     url_name = player_name.lower().replace('á', 'a').replace('é', 'e').replace(' ', '-')
     url = f"https://www.transfermarkt.com.br/{url_name}/leistungsdatendetails/spieler/{player_id}"
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-    }
+    client = client or RateLimitedSession(rate=1 / TRANSFERMARKT_MIN_INTERVAL)
     
     print(f"🌐 Buscando Transfermarkt: {url}")
     
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = client.get(url, timeout=15)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        tables = soup.find_all('table', {'class': 'items'})
+        seasons_data = performance_rows(response.content)
         
-        if not tables:
+        if seasons_data is None:
             print("   ❌ Tabela não encontrada")
             return pd.DataFrame()
         
-        seasons_data = []
-        rows = tables[0].find_all('tr', {'class': ['odd', 'even']})
-        
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) < 5:
-                continue
-            
-            try:
-                season_text = cells[0].get_text(strip=True)
-                comp_cell = cells[1]
-                comp_img = comp_cell.find('img')
-                league = comp_img.get('title', '') if comp_img else comp_cell.get_text(strip=True)
-                team = cells[2].get_text(strip=True)
-                
-                if not team or team.lower() in ['club', 'total', '']:
-                    continue
-                
-                apps = cells[4].get_text(strip=True) if len(cells) > 4 else '0'
-                goals = cells[5].get_text(strip=True) if len(cells) > 5 else '0'
-                assists = cells[6].get_text(strip=True) if len(cells) > 6 else '0'
-                
-                apps = int(apps) if apps and apps != '-' else 0
-                goals = int(goals) if goals and goals != '-' else 0
-                assists = int(assists) if assists and assists != '-' else 0
-                
-                if 'total' in season_text.lower():
-                    continue
-                
-                seasons_data.append({
-                    'season_raw': season_text,
-                    'team': team,
-                    'league_raw': league,
-                    'appearances': apps,
-                    'goals': goals,
-                    'assists': assists
-                })
-                
-            except Exception:
-                continue
-        
         if seasons_data:
             print(f"   ✅ Encontradas {len(seasons_data)} temporadas no Transfermarkt")
             return pd.DataFrame(seasons_data)
@@ -288,32 +300,13 @@ def filter_missing_leagues(tm_df: pd.DataFrame) -> pd.DataFrame:
     return filtered
 
 
-def convert_season_format(season_raw: str) -> str:
-    """Converte formato de temporada (ex: '23/24' -> '2023-2024')."""
-    # Formato: YY/YY
-    match = re.search(r'(\d{2})/(\d{2})', season_raw)
-    if match:
-        y1, y2 = int(match.group(1)), int(match.group(2))
-        century1 = 2000 if y1 < 50 else 1900
-        century2 = 2000 if y2 < 50 else 1900
-        return f"{century1 + y1}-{century2 + y2}"
-    
-    # Formato: YYYY
-    match = re.search(r'(\d{4})', season_raw)
-    if match:
-        year = int(match.group(1))
-        return f"{year}-{year+1}"
-    
-    return season_raw
-
-
 def merge_transfermarkt_data(df: pd.DataFrame, tm_df: pd.DataFrame, player_name: str, metadata: dict) -> pd.DataFrame:
     """Mescla dados do Transfermarkt com o DataFrame principal."""
     if tm_df.empty:
         return df
     
     # Converter formato das temporadas
-    tm_df['season_period'] = tm_df['season_raw'].apply(convert_season_format)
+    tm_df['season_period'] = label_periods(tm_df['season_raw'])
     
     # Temporadas já existentes no FBref
     existing_seasons = set()
@@ -496,71 +489,220 @@ def print_summary(df: pd.DataFrame, player_name: str):
     print(f"\n📅 Período: {df['season_period'].min()} até {df['season_period'].max()}")
 
 
-def enrich_player(player_name: str) -> pd.DataFrame:
-    """Pipeline principal de enriquecimento."""
-    print("\n" + "="*60)
-    print(f"🚀 ENRIQUECENDO DADOS: {player_name}")
-    print("="*60 + "\n")
-    
-    # 1. Carregar base de dados
-    db = load_players_database()
+def transfermarkt_id(metadata: dict):
+    """Extrai o ID do Transfermarkt da URL nos metadados (ou None)."""
+    match = re.search(r'/spieler/(\d+)', metadata.get('transfermarkt_url') or '')
+    return int(match.group(1)) if match else None
+
+
+def process_player(df: pd.DataFrame, player_name: str, metadata: dict, tm_df: pd.DataFrame = None) -> tuple:
+    """
+    Etapas locais do enriquecimento (sem rede): classifica, mescla o
+    Transfermarkt, adiciona metadados, formata e salva.
     
-    # 2. Buscar jogador
-    df = search_player(db, player_name)
+    Returns:
+        (DataFrame final, caminho de saída, tempos por etapa em segundos)
+    """
+    timings = {}
     
-    # 3. Classificar competições
+    start = time.perf_counter()
     print("\n🏷️  Classificando competições...")
     df = add_competition_classification(df)
+    timings['classify'] = time.perf_counter() - start
     
-    # 4. Carregar metadados
-    print("\n📋 Carregando metadados...")
-    metadata = load_metadata(player_name)
+    start = time.perf_counter()
+    if tm_df is not None:
+        tm_filtered = filter_missing_leagues(tm_df)
+        df = merge_transfermarkt_data(df, tm_filtered, player_name, metadata)
+    timings['merge'] = time.perf_counter() - start
     
-    # 5. Buscar dados faltantes no Transfermarkt (se houver ID)
-    if metadata.get('transfermarkt_url'):
-        match = re.search(r'/spieler/(\d+)', metadata['transfermarkt_url'])
-        if match:
-            tm_id = int(match.group(1))
-            print(f"\n🔍 Buscando ligas faltantes no Transfermarkt (ID: {tm_id})...")
-            tm_df = fetch_transfermarkt_data(tm_id, player_name)
-            tm_filtered = filter_missing_leagues(tm_df)
-            df = merge_transfermarkt_data(df, tm_filtered, player_name, metadata)
-    
-    # 6. Adicionar metadados
+    start = time.perf_counter()
     print("\n📝 Adicionando metadados...")
     df = add_metadata_columns(df, metadata)
-    
-    # 7. Formatar saída
     print("\n🔧 Formatando saída...")
     df = format_output(df)
+    timings['format'] = time.perf_counter() - start
     
-    # 8. Salvar
+    start = time.perf_counter()
     output_path = save_output(df, player_name)
+    timings['save'] = time.perf_counter() - start
     print(f"\n💾 Salvo em: {output_path}")
     
-    # 9. Resumo
+    return df, output_path, timings
+
+
+def enrich_player(player_name: str) -> pd.DataFrame:
+    """Pipeline principal de enriquecimento."""
+    print("\n" + "="*60)
+    print(f"🚀 ENRIQUECENDO DADOS: {player_name}")
+    print("="*60 + "\n")
+    
+    # 1. Carregar índice de nomes (a tabela completa não é carregada)
+    index = load_name_index(PATHS['players_db'])
+    print(f"📇 Índice de nomes: {len(index['exact']):,} jogadores")
+    
+    # 2. Buscar jogador (lê só as linhas dele)
+    df = search_player(None, player_name, index=index)
+    
+    # 3. Carregar metadados
+    print("\n📋 Carregando metadados...")
+    metadata = load_metadata(player_name)
+    
+    # 4. Buscar dados faltantes no Transfermarkt (se houver ID)
+    tm_df = None
+    tm_id = transfermarkt_id(metadata)
+    if tm_id:
+        print(f"\n🔍 Buscando ligas faltantes no Transfermarkt (ID: {tm_id})...")
+        tm_df = fetch_transfermarkt_data(tm_id, player_name)
+    
+    # 5. Classificar, mesclar, formatar e salvar
+    df, _, _ = process_player(df, player_name, metadata, tm_df)
+    
+    # 6. Resumo
     print_summary(df, player_name)
     
     return df
 
 
+def _process_player_task(task: tuple) -> dict:
+    """Executa process_player num processo do pool (argumentos picklable)."""
+    player_name, df, metadata, tm_df = task
+    try:
+        df, output_path, timings = process_player(df, player_name, metadata, tm_df)
+        return {'player': player_name, 'status': 'ok', 'output': output_path,
+                'rows': len(df), 'timings': timings}
+    except Exception as e:
+        return {'player': player_name, 'status': 'error', 'error': str(e), 'timings': {}}
+
+
+def enrich_players_batch(player_names: list, workers: int = 4,
+                         min_interval: float = TRANSFERMARKT_MIN_INTERVAL) -> dict:
+    """
+    Enriquece vários jogadores numa única execução.
+    
+    A base é carregada uma vez; os downloads do Transfermarkt rodam em threads
+    sobre uma sessão com limite de taxa e cache em disco compartilhados
+    (http_client) e as etapas locais em um pool de processos.
+    Grava todos os *_enriched.csv e um resumo com tempos por etapa.
+    """
+    print("\n" + "="*60)
+    print(f"🚀 ENRIQUECIMENTO EM LOTE: {len(player_names)} jogadores ({workers} workers)")
+    print("="*60 + "\n")
+    
+    stages = {}
+    results = {name: {'player': name, 'status': 'pending', 'timings': {}} for name in player_names}
+    run_start = time.perf_counter()
+    
+    # 1. Carregar base e índice uma única vez
+    start = time.perf_counter()
+    db = load_players_database()
+    index = load_name_index(PATHS['players_db'])
+    stages['load'] = time.perf_counter() - start
+    
+    # 2. Buscar jogadores e metadados
+    start = time.perf_counter()
+    found = {}
+    for name in player_names:
+        try:
+            found[name] = (search_player(db, name, index=index), load_metadata(name))
+        except Exception as e:
+            results[name].update(status='error', error=str(e))
+    del db
+    stages['search'] = time.perf_counter() - start
+    
+    # 3. Downloads do Transfermarkt concorrentes, com limite de taxa compartilhado
+    start = time.perf_counter()
+    client = RateLimitedSession(rate=1 / min_interval, pool_size=max(workers, 4))
+    tm_data = {}
+    to_fetch = {name: transfermarkt_id(meta) for name, (_, meta) in found.items()}
+    to_fetch = {name: tm_id for name, tm_id in to_fetch.items() if tm_id}
+    if to_fetch:
+        print(f"\n🌐 Buscando {len(to_fetch)} jogadores no Transfermarkt...")
+        fetched = client.map(lambda item: fetch_transfermarkt_data(item[1], item[0], client),
+                             list(to_fetch.items()), max_workers=workers)
+        tm_data = dict(zip(to_fetch, fetched))
+    stages['fetch'] = time.perf_counter() - start
+    
+    # 4. Classificar/mesclar/formatar/salvar em paralelo
+    start = time.perf_counter()
+    tasks = [(name, df, meta, tm_data.get(name)) for name, (df, meta) in found.items()]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_process_player_task, tasks):
+            results[result['player']].update(result)
+    stages['process'] = time.perf_counter() - start
+    stages['total'] = time.perf_counter() - run_start
+    
+    summary = {
+        'run_date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'players': len(player_names),
+        'succeeded': sum(r['status'] == 'ok' for r in results.values()),
+        'failed': sum(r['status'] == 'error' for r in results.values()),
+        'workers': workers,
+        'stage_seconds': {k: round(v, 3) for k, v in stages.items()},
+        'http_cache': client.cache_stats(),
+        'results': list(results.values()),
+    }
+    
+    os.makedirs(PATHS['output_dir'], exist_ok=True)
+    summary_path = os.path.join(PATHS['output_dir'], 'batch_enrichment_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    
+    print("\n" + "="*60)
+    print(f"📊 LOTE: {summary['succeeded']} ok, {summary['failed']} com erro")
+    for stage, seconds in summary['stage_seconds'].items():
+        print(f"   ⏱️  {stage:8s} {seconds:8.2f}s")
+    for r in results.values():
+        if r['status'] == 'error':
+            print(f"   ❌ {r['player']}: {r.get('error')}")
+    client.print_cache_stats()
+    print(f"💾 Resumo: {summary_path}")
+    
+    return summary
+
+
+def read_player_list(path: str) -> list:
+    """Lê nomes de jogadores de um arquivo (um por linha; '#' comenta)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        names = [line.split('#', 1)[0].strip() for line in f]
+    return list(dict.fromkeys(n for n in names if n))
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description='Enriquecimento de dados de jogadores')
+    parser.add_argument('players', nargs='*', help='Nome(s) do(s) jogador(es)')
+    parser.add_argument('--batch', type=str, help='Arquivo com um nome de jogador por linha')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                        help='Processos/threads no modo batch')
+    parser.add_argument('--min-interval', type=float, default=TRANSFERMARKT_MIN_INTERVAL,
+                        help='Segundos entre requisições ao Transfermarkt no modo batch')
+    args = parser.parse_args()
+    
+    player_names = list(args.players)
+    if args.batch:
+        player_names += read_player_list(args.batch)
+    
+    if not player_names:
         print(__doc__)
         print("\nExemplos:")
         print('  python scripts/enrich_player.py "Cristiano Ronaldo"')
         print('  python scripts/enrich_player.py "Kaká"')
         print('  python scripts/enrich_player.py "Lionel Messi"')
+        print('  python scripts/enrich_player.py --batch watchlist.txt')
         sys.exit(1)
     
-    player_name = sys.argv[1]
-    
     try:
-        df = enrich_player(player_name)
+        if len(player_names) == 1:
+            df = enrich_player(player_names[0])
+        else:
+            summary = enrich_players_batch(player_names, workers=args.workers,
+                                           min_interval=args.min_interval)
+            if summary['failed']:
+                sys.exit(1)
         print("\n" + "="*60)
         print("✅ CONCLUÍDO! Atualize os dados no Power BI.")
         print("="*60 + "\n")
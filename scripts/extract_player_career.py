@@ -1,6 +1,7 @@
 import sys
 import os
-import pandas as pd
+
+from datalake_io import load_table
 
 OUT = os.path.join('datalake','processed')
 os.makedirs(OUT, exist_ok=True)
@@ -15,7 +16,7 @@ def extract(name_pattern, infile='datalake/processed/players_complete_1995_2025.
         outfile: Output CSV path (auto-generated if None)
         team_filter: List of teams to filter by (helps distinguish players with same name)
     """
-    df = pd.read_csv(infile, low_memory=False, dtype={'season': str})
+    df = load_table(infile)
     mask = df['player'].astype(str).str.contains(name_pattern, case=False, na=False)
     res = df[mask].copy()
     
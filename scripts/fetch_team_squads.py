@@ -9,21 +9,26 @@ Output: CSV with columns:
 - team, season, player_name, position, shirt_number, age, nationality, 
   market_value, joined_date, contract_until, league
 
+Requests go through a shared pooled session with a per-host token bucket
+(see http_client.py), so league scrapes fetch several teams concurrently at
+whatever rate the site allows instead of sleeping between requests.
+Responses are cached on disk, so reruns only download pages that can have
+changed (use --no-cache to force fresh downloads).
+
 Usage:
     python scripts/fetch_team_squads.py --team "Manchester United" --season 2023
-    python scripts/fetch_team_squads.py --league "premier-league" --season 2023
-    python scripts/fetch_team_squads.py --all-seasons  # Scrape all available data
+    python scripts/fetch_team_squads.py --league "premier-league" --seasons "2022,2023"
+    python scripts/fetch_team_squads.py --league "premier-league" --seasons "2023" --workers 6 --rate 1.0
 """
 
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import time
 import argparse
 import json
 from pathlib import Path
 from datetime import datetime
-import re
+
+from http_client import DEFAULT_RATE, RateLimitedSession
+from transfermarkt_parsers import DEFAULT_PARSER, PARSERS, league_teams, search_club, squad_rows
 
 # Constants
 BASE_URL = "https://www.transfermarkt.com"
@@ -31,6 +36,27 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 }
 
+DEFAULT_WORKERS = 4
+
+# HTML backend for all page parsing ('lxml' is much cheaper than 'bs4')
+PARSER = DEFAULT_PARSER
+
+_client = None
+
+
+def get_client():
+    """Shared rate-limited session used by every fetch in this module."""
+    global _client
+    if _client is None:
+        _client = RateLimitedSession(rate=DEFAULT_RATE, headers=HEADERS)
+    return _client
+
+
+def set_client(client):
+    """Replaces the shared session (e.g. with a different rate)."""
+    global _client
+    _client = client
+
 # League mapping (Transfermarkt URLs)
 LEAGUE_MAP = {
     'premier-league': {'id': 'GB1', 'name': 'Premier League'},
@@ -83,20 +109,14 @@ def search_team_transfermarkt(team_name):
     
     try:
         print(f"🔍 Searching for '{team_name}'...")
-        response = requests.get(search_url, params=params, headers=HEADERS, timeout=10)
+        response = get_client().get(search_url, params=params, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
         # Find first club result
-        club_box = soup.find('div', {'id': 'yw1'})
-        if club_box:
-            team_link = club_box.find('a', href=re.compile(r'/verein/'))
-            if team_link:
-                team_url = team_link['href']
-                team_id = team_url.split('/')[-1]
-                team_display_name = team_link.find('img')['alt'] if team_link.find('img') else team_name
-                print(f"✓ Found team: {team_display_name} (ID: {team_id})")
-                return {'id': team_id, 'name': team_display_name}
+        club = search_club(response.content, PARSER)
+        if club:
+            team_display_name = club['name'] or team_name
+            print(f"✓ Found team: {team_display_name} (ID: {club['id']})")
+            return {'id': club['id'], 'name': team_display_name}
         
         print(f"❌ Team '{team_name}' not found")
         
@@ -123,108 +143,10 @@ def get_team_squad(team_id, season, team_name="Unknown"):
     try:
         print(f"📥 Fetching {team_name} squad for {season}-{season+1}...")
         print(f"   URL: {squad_url}")
-        response = requests.get(squad_url, headers=HEADERS, timeout=15)
+        response = get_client().get(squad_url, timeout=15)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find squad table - try multiple selectors
-        squad_table = soup.find('table', {'class': 'items'})
-        
-        if not squad_table:
-            # Try alternative selector
-            squad_table = soup.find('div', {'id': 'yw1'})
-            if squad_table:
-                squad_table = squad_table.find('table')
-        
-        if not squad_table:
-            print(f"⚠️  No squad table found for {season}")
-            # Debug: save HTML to file
-            debug_file = Path('debug_squad.html')
-            debug_file.write_text(soup.prettify(), encoding='utf-8')
-            print(f"   💾 Saved HTML to {debug_file} for debugging")
-            return pd.DataFrame()
-        
-        players_data = []
-        tbody = squad_table.find('tbody')
-        
-        if not tbody:
-            print("⚠️  No tbody found in table")
-            return pd.DataFrame()
-        
-        rows = tbody.find_all('tr', class_=lambda x: x and ('odd' in x or 'even' in x))
-        
-        if not rows:
-            # Try without class filter
-            rows = tbody.find_all('tr')
-        
-        print(f"   Found {len(rows)} table rows")
-        
-        for idx, row in enumerate(rows):
-            try:
-                # Skip header rows
-                if row.find('th'):
-                    continue
-                
-                cells = row.find_all('td')
-                if len(cells) < 5:
-                    continue
-                
-                # Extract data from cells
-                # Cell 0: Shirt number
-                shirt_number = cells[0].text.strip() if cells[0] else ''
-                
-                # Cell 1: Player name and image
-                player_cell = cells[1]
-                player_link = player_cell.find('a', href=re.compile(r'/profil/spieler/'))
-                player_name = player_link.text.strip() if player_link else ''
-                player_url = BASE_URL + player_link['href'] if player_link else ''
-                
-                if not player_name:
-                    continue
-                
-                # Cell 2: Position
-                position = cells[2].text.strip() if len(cells) > 2 else ''
-                
-                # Cell 3: Date of birth / Age
-                age_cell = cells[3].text.strip() if len(cells) > 3 else ''
-                age_match = re.search(r'\((\d+)\)', age_cell)
-                age = age_match.group(1) if age_match else ''
-                
-                # Cell 4: Nationality
-                nat_imgs = cells[4].find_all('img') if len(cells) > 4 else []
-                nationalities = [img.get('title', '') for img in nat_imgs]
-                nationality = ', '.join(nationalities) if nationalities else ''
-                
-                # Market value - usually last or second-to-last cell
-                market_value = ''
-                for cell in reversed(cells):
-                    if '€' in cell.text or 'k' in cell.text or 'm' in cell.text:
-                        market_value = cell.text.strip()
-                        break
-                
-                players_data.append({
-                    'team': team_name,
-                    'season': f"{season}-{season+1}",
-                    'season_year': season,
-                    'player_name': player_name,
-                    'position': position,
-                    'shirt_number': shirt_number,
-                    'age': age,
-                    'nationality': nationality,
-                    'market_value': market_value,
-                    'player_url': player_url,
-                    'scraped_date': datetime.now().strftime('%Y-%m-%d')
-                })
-                
-            except Exception as e:
-                print(f"  ⚠️  Error parsing row {idx}: {e}")
-                continue
-        
-        print(f"  ✓ Extracted {len(players_data)} players")
-        time.sleep(2)  # Rate limiting
-        
-        return pd.DataFrame(players_data)
+        return parse_squad_page(response.content, season, team_name)
         
     except Exception as e:
         print(f"❌ Error fetching squad: {e}")
@@ -233,6 +155,46 @@ def get_team_squad(team_id, season, team_name="Unknown"):
         return pd.DataFrame()
 
 
+def parse_squad_page(content, season, team_name="Unknown", parser=None):
+    """
+    Parse a Transfermarkt squad (kader) page into a DataFrame
+    
+    Args:
+        content: Raw HTML (bytes or str)
+        season: Season year
+        team_name: Team name for output
+        parser: 'lxml' or 'bs4' (default: module PARSER)
+    """
+    records = squad_rows(content, parser or PARSER)
+    
+    if records is None:
+        print(f"⚠️  No squad table found for {season}")
+        # Debug: save HTML to file
+        debug_file = Path('debug_squad.html')
+        debug_file.write_bytes(content if isinstance(content, bytes) else content.encode('utf-8'))
+        print(f"   💾 Saved HTML to {debug_file} for debugging")
+        return pd.DataFrame()
+    
+    scraped_date = datetime.now().strftime('%Y-%m-%d')
+    players_data = [{
+        'team': team_name,
+        'season': f"{season}-{season+1}",
+        'season_year': season,
+        'player_name': row['player_name'],
+        'position': row['position'],
+        'shirt_number': row['shirt_number'],
+        'age': row['age'],
+        'nationality': row['nationality'],
+        'market_value': row['market_value'],
+        'player_url': BASE_URL + row['player_href'],
+        'scraped_date': scraped_date
+    } for row in records]
+    
+    print(f"  ✓ Extracted {len(players_data)} players")
+    
+    return pd.DataFrame(players_data)
+
+
 def get_league_teams(league_code, season):
     """
     Get all teams in a league for a specific season
@@ -248,28 +210,12 @@ def get_league_teams(league_code, season):
     
     try:
         print(f"🏆 Fetching teams from {league_code} ({season})...")
-        response = requests.get(league_url, headers=HEADERS, timeout=15)
+        response = get_client().get(league_url, timeout=15)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        teams = []
-        
-        # Find teams table
-        team_table = soup.find('table', {'class': 'items'})
-        if not team_table:
-            return teams
-        
-        rows = team_table.find_all('tr')
-        for row in rows:
-            team_link = row.find('a', {'class': 'vereinprofil_tooltip'})
-            if team_link:
-                team_name = team_link.text.strip()
-                team_url = team_link['href']
-                team_id = team_url.split('/')[-1]
-                teams.append({'name': team_name, 'id': team_id})
+        teams = league_teams(response.content, PARSER)
         
         print(f"  ✓ Found {len(teams)} teams")
-        time.sleep(2)
         return teams
         
     except Exception as e:
@@ -277,13 +223,17 @@ def get_league_teams(league_code, season):
         return []
 
 
-def scrape_league_squads(league_name, seasons):
+def scrape_league_squads(league_name, seasons, max_workers=DEFAULT_WORKERS):
     """
     Scrape all team squads from a league across multiple seasons
     
+    League pages and squads are fetched concurrently (bounded by max_workers);
+    pacing is left to the shared session's per-host token bucket.
+    
     Args:
         league_name: League name from LEAGUE_MAP
         seasons: List of season years
+        max_workers: Concurrent requests in flight
     
     Returns:
         DataFrame with all squads
@@ -294,30 +244,32 @@ def scrape_league_squads(league_name, seasons):
     
     league_info = LEAGUE_MAP[league_name]
     league_code = league_info['id']
-    all_squads = []
+    client = get_client()
     
-    for season in seasons:
-        print(f"\n{'='*60}")
-        print(f"📅 Season {season}-{season+1} - {league_info['name']}")
-        print(f"{'='*60}\n")
-        
-        # Get teams in league
-        teams = get_league_teams(league_code, season)
-        
+    print(f"\n{'='*60}")
+    print(f"📅 Seasons {', '.join(f'{s}-{s+1}' for s in seasons)} - {league_info['name']}")
+    print(f"{'='*60}\n")
+    
+    # Get teams in league for every season
+    season_teams = client.map(lambda season: get_league_teams(league_code, season),
+                              seasons, max_workers=max_workers)
+    
+    units = []
+    for season, teams in zip(seasons, season_teams):
         if not teams:
             print(f"⚠️  No teams found for {season}")
             continue
-        
-        # Fetch squad for each team
-        for i, team in enumerate(teams, 1):
-            print(f"[{i}/{len(teams)}] ", end="")
-            squad_df = get_team_squad(team['id'], season, team['name'])
-            
-            if not squad_df.empty:
-                squad_df['league'] = league_info['name']
-                all_squads.append(squad_df)
-            
-            time.sleep(3)  # Rate limiting between teams
+        units.extend((team, season) for team in teams)
+    
+    # Fetch squad for each (team, season)
+    squads = client.map(lambda unit: get_team_squad(unit[0]['id'], unit[1], unit[0]['name']),
+                        units, max_workers=max_workers)
+    
+    all_squads = []
+    for squad_df in squads:
+        if not squad_df.empty:
+            squad_df['league'] = league_info['name']
+            all_squads.append(squad_df)
     
     if all_squads:
         final_df = pd.concat(all_squads, ignore_index=True)
@@ -360,8 +312,16 @@ def main():
     parser.add_argument('--league', type=str, choices=list(LEAGUE_MAP.keys()), help='League to scrape')
     parser.add_argument('--seasons', type=str, help='Comma-separated seasons (e.g., "2021,2022,2023")')
     parser.add_argument('--output', type=str, default='datalake/raw/squads', help='Output directory')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent requests in flight')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Max requests per second per host')
+    parser.add_argument('--no-cache', action='store_true', help='Always hit the network (skip the HTTP cache)')
+    parser.add_argument('--parser', type=str, choices=PARSERS, default=DEFAULT_PARSER, help='HTML parser backend')
     
     args = parser.parse_args()
+    global PARSER
+    PARSER = args.parser
+    set_client(RateLimitedSession(rate=args.rate, headers=HEADERS, pool_size=max(args.workers, 4),
+                                  cache=not args.no_cache))
     
     # Create output directory
     output_dir = Path(args.output)
@@ -379,7 +339,7 @@ def main():
     # League mode
     elif args.league and args.seasons:
         seasons = [int(s.strip()) for s in args.seasons.split(',')]
-        squads_df = scrape_league_squads(args.league, seasons)
+        squads_df = scrape_league_squads(args.league, seasons, max_workers=args.workers)
         output_file = output_dir / f"{args.league}_squads_{min(seasons)}_{max(seasons)}.csv"
     
     else:
@@ -402,6 +362,8 @@ def main():
         print(f"⚽ Teams: {squads_df['team'].nunique()}")
     else:
         print("\n❌ No data scraped")
+    
+    get_client().print_cache_stats()
 
 
 if __name__ == "__main__":
@@ -10,6 +10,8 @@ Para temporadas onde age está vazio, calcula a idade baseado em:
 import pandas as pd
 from datetime import datetime
 
+from season_codes import season_start_year
+
 # Carregar dados
 df = pd.read_csv('datalake/processed/enriched/cristiano_ronaldo_enriched.csv', dtype={'season': str})
 
@@ -26,17 +28,10 @@ birth_month = 2  # Fevereiro
 
 def calculate_age(season_code):
     """Calcula idade aproximada baseado no código da temporada."""
-    if pd.isna(season_code) or len(season_code) < 4:
-        return None
-    
     # Converter código: "0203" -> 2002 (primeiro ano da temporada)
-    year_str = season_code[:2]
-    
-    # Se começa com 0, é 2000s, senão é 1900s
-    if year_str[0] == '0':
-        year = 2000 + int(year_str)
-    else:
-        year = 1900 + int(year_str)
+    year = season_start_year(season_code)
+    if year is None:
+        return None
     
     # Idade aproximada (temporada começa em agosto, ele nasce em fevereiro)
     # Então na maior parte da temporada ele já fez aniversário
@@ -1,35 +1,40 @@
 """
 Generate 2D PCA projections for cluster visualization in Power BI
 Creates scatter plot coordinates for players and teams
+
+The fitted scaler, PCA components and 0-100 bounds are saved next to the
+outputs (pca_players_model.json / pca_teams_model.json) and reused by later
+runs, so refreshing the coordinates after an ingest projects the rows with
+the saved model instead of refitting over the whole history; coordinates
+stay stable between runs. --refit fits again (--method exact, randomized or
+incremental; incremental reads the players table in chunks).
+
+Player clusters are joined on player_season_id (keys.py), one row per
+player-season on both sides; a join that would duplicate rows fails instead
+of multiplying a player's seasons.
+
+Usage:
+    python scripts/generate_pca_visualization.py                     # reuse saved models
+    python scripts/generate_pca_visualization.py --refit --method randomized
+    python scripts/generate_pca_visualization.py --refit --method incremental --chunk-size 20000
 """
 
+import argparse
+import os
 import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
 import warnings
-warnings.filterwarnings('ignore')
-
-print("🎨 Generating PCA coordinates for cluster visualization...\n")
 
-# ========================================
-# 1. LOAD DATA
-# ========================================
-players_complete = pd.read_csv('datalake/processed/players_complete_1995_2025.csv')
-players_clustered = pd.read_csv('datalake/processed/enriched/players_clustered.csv')
-squads = pd.read_csv('datalake/processed/squads_complete.csv')
-teams_complete = pd.read_csv('datalake/processed/teams_complete_1995_2025.csv')
-
-print(f"✅ Loaded {len(players_complete):,} player records")
-print(f"✅ Loaded {len(squads):,} squad records")
-print(f"✅ Loaded {len(teams_complete):,} team records\n")
+from datalake_io import PLAYERS_CLUSTERED_PATH, ROW_GROUP_SIZE, iter_table, load_table
+from keys import PLAYER_SEASON_ID, PLAYER_SEASON_KEY, add_player_season_id, keyed_merge
+from projection import METHODS, Projection, load_or_fit
+from season_codes import season_start_years
+warnings.filterwarnings('ignore')
 
-# ========================================
-# 2. PLAYER PCA (2D)
-# ========================================
-print("📊 Calculating Player PCA...")
+ENRICHED_DIR = os.path.join('datalake', 'processed', 'enriched')
+PLAYER_MODEL_PATH = os.path.join(ENRICHED_DIR, 'pca_players_model.json')
+TEAM_MODEL_PATH = os.path.join(ENRICHED_DIR, 'pca_teams_model.json')
 
-# Select available features from dataset
+# Only the columns used below are read (Parquet column pruning when available)
 player_features = [
     'Performance_Gls', 'Performance_Ast', 'Performance_G+A',
     'Expected_xG', 'Expected_npxG', 'Expected_xAG', 'Expected_npxG+xAG',
@@ -40,53 +45,6 @@ player_features = [
     'Playing_Time_MP', 'Playing_Time_Starts', 'Playing_Time_90s'
 ]
 
-# Filter and prepare data
-player_data = players_complete[['player', 'Club', 'pos', 'age'] + player_features].copy()
-player_data = player_data.dropna(subset=player_features)
-
-# Normalize
-scaler = StandardScaler()
-player_scaled = scaler.fit_transform(player_data[player_features])
-
-# PCA to 2D
-pca_player = PCA(n_components=2)
-player_pca = pca_player.fit_transform(player_scaled)
-
-# Normalize PCA values to 0-100 scale for easier interpretation
-pca_x_min_p, pca_x_max_p = player_pca[:, 0].min(), player_pca[:, 0].max()
-pca_y_min_p, pca_y_max_p = player_pca[:, 1].min(), player_pca[:, 1].max()
-
-pca_x_normalized_p = 100 * (player_pca[:, 0] - pca_x_min_p) / (pca_x_max_p - pca_x_min_p)
-pca_y_normalized_p = 100 * (player_pca[:, 1] - pca_y_min_p) / (pca_y_max_p - pca_y_min_p)
-
-# Create output dataframe
-player_viz = pd.DataFrame({
-    'player': player_data['player'].values,
-    'Club': player_data['Club'].values,
-    'pos': player_data['pos'].values,
-    'age': player_data['age'].values,
-    'pca_x': pca_x_normalized_p,
-    'pca_y': pca_y_normalized_p,
-    'goals': player_data['Performance_Gls'].values,
-    'assists': player_data['Performance_Ast'].values
-})
-
-# Merge with cluster assignments
-player_viz = player_viz.merge(
-    players_clustered[['player', 'player_cluster']], 
-    on='player', 
-    how='left'
-)
-
-print(f"✅ Player PCA: {len(player_viz):,} players")
-print(f"   Explained variance: {pca_player.explained_variance_ratio_.sum():.2%}\n")
-
-# ========================================
-# 3. TEAM PCA (2D)
-# ========================================
-print("📊 Calculating Team PCA...")
-
-# Team features - using available columns
 team_features = [
     'Performance_Gls', 'Performance_Ast', 'Performance_G+A',
     'Expected_xG', 'Expected_npxG', 'Expected_xAG',
@@ -94,93 +52,183 @@ team_features = [
     'Per_90_Minutes_Gls', 'Per_90_Minutes_xG'
 ]
 
-# Get latest season data per team
-teams_2025 = teams_complete[teams_complete['season_period'] == '2025-2026'].copy()
+# Define cluster names based on characteristics
+cluster_names = {
+    0: "Posse e Controle",
+    1: "Pressão Alta",
+    2: "Transição Rápida",
+    3: "Equilíbrio Tático"
+}
 
-print(f"   Found {len(teams_2025)} teams for 2025-2026 season")
 
-# If no 2025-2026, try latest available
-if len(teams_2025) == 0:
-    print("   No 2025-2026 data, using latest season...")
-    latest_season = teams_complete['season_period'].max()
-    teams_2025 = teams_complete[teams_complete['season_period'] == latest_season].copy()
-    print(f"   Using {latest_season}: {len(teams_2025)} teams")
+def _describe(projection, reused, path, coords):
+    if reused:
+        outside = projection.out_of_bounds(coords)
+        print(f"   Reused {path} ({projection.method}, fitted {projection.fitted_at} on {projection.rows:,} rows)")
+        if outside:
+            print(f"   ⚠️  {outside:,} row(s) outside the saved bounds (clipped to 0-100; --refit widens the axes)")
+    else:
+        print(f"   Fitted ({projection.method}) on {projection.rows:,} rows -> {path}")
+    print(f"   Explained variance: {projection.explained_variance_ratio.sum():.2%}")
 
-team_data = teams_2025[['team'] + team_features].copy()
-team_data = team_data.dropna(subset=team_features)
 
-# Normalize
-scaler_team = StandardScaler()
-team_scaled = scaler_team.fit_transform(team_data[team_features])
+# ========================================
+# 1. LOAD DATA
+# ========================================
+def load_inputs():
+    key_columns = [c for c in PLAYER_SEASON_KEY if c != 'player']
+    players_complete = load_table('players', columns=['player', 'Club', 'pos', 'age'] + key_columns + player_features)
+    # Same hash the merge stage writes, so it matches players_clustered.csv either way
+    players_complete = add_player_season_id(players_complete, overwrite=True)
+    if not os.path.exists(PLAYERS_CLUSTERED_PATH):
+        raise FileNotFoundError(f"{PLAYERS_CLUSTERED_PATH} not found - run scripts/clusterization to create it")
+    players_clustered = pd.read_csv(PLAYERS_CLUSTERED_PATH)
+    if PLAYER_SEASON_ID not in players_clustered.columns:
+        raise ValueError(f"{PLAYERS_CLUSTERED_PATH} has no {PLAYER_SEASON_ID} column - "
+                         "rerun scripts/clusterization (it writes this file) to regenerate it")
+    teams_complete = load_table('teams', columns=['team', 'season', 'season_period'] + team_features)
+    teams_complete['season_start_year'] = season_start_years(teams_complete['season'])
+
+    print(f"✅ Loaded {len(players_complete):,} player records")
+    print(f"✅ Loaded {len(teams_complete):,} team records\n")
+    return players_complete, players_clustered, teams_complete
 
-# PCA to 2D
-pca_team = PCA(n_components=2)
-team_pca = pca_team.fit_transform(team_scaled)
 
-# Normalize PCA values to 0-100 scale for easier interpretation
-pca_x_min, pca_x_max = team_pca[:, 0].min(), team_pca[:, 0].max()
-pca_y_min, pca_y_max = team_pca[:, 1].min(), team_pca[:, 1].max()
+# ========================================
+# 2. PLAYER PCA (2D)
+# ========================================
+def player_pca(players_complete, players_clustered, method='exact', refit=False, chunk_size=ROW_GROUP_SIZE):
+    print("📊 Calculating Player PCA...")
+
+    # Filter and prepare data
+    player_data = players_complete[[PLAYER_SEASON_ID, 'player', 'Club', 'pos', 'age'] + player_features].copy()
+    player_data = player_data.dropna(subset=player_features)
+
+    if method == 'incremental':
+        def fit():
+            return Projection.fit_chunks(
+                lambda: iter_table('players', columns=player_features, chunk_size=chunk_size), player_features)
+    else:
+        def fit():
+            return Projection.fit(player_data, player_features, method=method)
+    projection, reused = load_or_fit(PLAYER_MODEL_PATH, fit, player_features, refit=refit)
+
+    # Normalize PCA values to 0-100 scale (saved bounds) for easier interpretation
+    player_components = projection.transform(player_data)
+    player_xy = projection.normalize(player_components)
+
+    # Create output dataframe
+    player_viz = pd.DataFrame({
+        PLAYER_SEASON_ID: player_data[PLAYER_SEASON_ID].values,
+        'player': player_data['player'].values,
+        'Club': player_data['Club'].values,
+        'pos': player_data['pos'].values,
+        'age': player_data['age'].values,
+        'pca_x': player_xy[:, 0],
+        'pca_y': player_xy[:, 1],
+        'goals': player_data['Performance_Gls'].values,
+        'assists': player_data['Performance_Ast'].values
+    })
+
+    # Merge with cluster assignments (one row per player-season; raises on fan-out)
+    player_viz = keyed_merge(
+        player_viz,
+        players_clustered[[PLAYER_SEASON_ID, 'player_cluster']],
+        on=PLAYER_SEASON_ID,
+        how='left',
+        validate='one_to_one'
+    )
+
+    print(f"✅ Player PCA: {len(player_viz):,} players")
+    _describe(projection, reused, PLAYER_MODEL_PATH, player_components)
+    print()
+    return player_viz
 
-pca_x_normalized = 100 * (team_pca[:, 0] - pca_x_min) / (pca_x_max - pca_x_min)
-pca_y_normalized = 100 * (team_pca[:, 1] - pca_y_min) / (pca_y_max - pca_y_min)
 
-# Create output dataframe
-team_viz = pd.DataFrame({
-    'team': team_data['team'].values,
-    'pca_x': pca_x_normalized,
-    'pca_y': pca_y_normalized,
-    'avg_goals': team_data['Performance_Gls'].values,
-    'avg_xG': team_data['Expected_xG'].values,
-    'progression_total': (team_data['Progression_PrgC'].values + 
-                         team_data['Progression_PrgP'].values + 
-                         team_data['Progression_PrgR'].values)
-})
+# ========================================
+# 3. TEAM PCA (2D)
+# ========================================
+def team_pca(teams_complete, method='exact', refit=False):
+    print("📊 Calculating Team PCA...")
+
+    # Get latest season data per team
+    teams_2025 = teams_complete[teams_complete['season_start_year'] == 2025].copy()
+
+    print(f"   Found {len(teams_2025)} teams for 2025-2026 season")
+
+    # If no 2025-2026, try latest available
+    if len(teams_2025) == 0:
+        print("   No 2025-2026 data, using latest season...")
+        latest_year = teams_complete['season_start_year'].max()
+        teams_2025 = teams_complete[teams_complete['season_start_year'] == latest_year].copy()
+        print(f"   Using {latest_year}-{latest_year + 1}: {len(teams_2025)} teams")
+
+    team_data = teams_2025[['team'] + team_features].copy()
+    team_data = team_data.dropna(subset=team_features)
+
+    projection, reused = load_or_fit(
+        TEAM_MODEL_PATH, lambda: Projection.fit(team_data, team_features, method=method),
+        team_features, refit=refit)
+    team_scaled = projection.scale(team_data)
+    team_components = projection.transform(team_data)
+    team_xy = projection.normalize(team_components)
+
+    # Create output dataframe
+    team_viz = pd.DataFrame({
+        'team': team_data['team'].values,
+        'pca_x': team_xy[:, 0],
+        'pca_y': team_xy[:, 1],
+        'avg_goals': team_data['Performance_Gls'].values,
+        'avg_xG': team_data['Expected_xG'].values,
+        'progression_total': (team_data['Progression_PrgC'].values +
+                             team_data['Progression_PrgP'].values +
+                             team_data['Progression_PrgR'].values)
+    })
+
+    print(f"✅ Team PCA: {len(team_viz):,} teams")
+    _describe(projection, reused, TEAM_MODEL_PATH, team_components)
+    print(f"   PCA values normalized to 0-100 scale\n")
+    return team_viz, team_scaled
 
-print(f"✅ Team PCA: {len(team_viz):,} teams")
-print(f"   Explained variance: {pca_team.explained_variance_ratio_.sum():.2%}")
-print(f"   PCA values normalized to 0-100 scale\n")
 
 # ========================================
 # 4. CALCULATE TEAM CLUSTERS
 # ========================================
-print("🎯 Assigning team clusters...")
+def assign_team_clusters(team_viz, team_scaled):
+    print("🎯 Assigning team clusters...")
 
-from sklearn.cluster import KMeans
+    from sklearn.cluster import KMeans
 
-# Cluster teams by style
-kmeans_team = KMeans(n_clusters=4, random_state=42, n_init=10)
-team_viz['team_cluster'] = kmeans_team.fit_predict(team_scaled)
-
-# Define cluster names based on characteristics
-cluster_names = {
-    0: "Posse e Controle",
-    1: "Pressão Alta",
-    2: "Transição Rápida", 
-    3: "Equilíbrio Tático"
-}
+    # Cluster teams by style
+    kmeans_team = KMeans(n_clusters=4, random_state=42, n_init=10)
+    team_viz['team_cluster'] = kmeans_team.fit_predict(team_scaled)
+    team_viz['cluster_name'] = team_viz['team_cluster'].map(cluster_names)
 
-team_viz['cluster_name'] = team_viz['team_cluster'].map(cluster_names)
+    print(f"✅ Teams clustered into {len(cluster_names)} tactical styles\n")
+    return team_viz
 
-print(f"✅ Teams clustered into {len(cluster_names)} tactical styles\n")
 
 # ========================================
 # 5. SAVE OUTPUTS
 # ========================================
-print("💾 Saving visualization files...")
+def save_outputs(player_viz, team_viz):
+    print("💾 Saving visualization files...")
+
+    # Save player PCA
+    player_viz.to_csv(os.path.join(ENRICHED_DIR, 'players_pca_viz.csv'), index=False)
+    print(f"✅ Saved: players_pca_viz.csv ({len(player_viz):,} records)")
 
-# Save player PCA
-player_viz.to_csv('datalake/processed/enriched/players_pca_viz.csv', index=False)
-print(f"✅ Saved: players_pca_viz.csv ({len(player_viz):,} records)")
+    # Save team PCA
+    team_viz.to_csv(os.path.join(ENRICHED_DIR, 'teams_pca_viz.csv'), index=False)
+    print(f"✅ Saved: teams_pca_viz.csv ({len(team_viz):,} records)")
 
-# Save team PCA
-team_viz.to_csv('datalake/processed/enriched/teams_pca_viz.csv', index=False)
-print(f"✅ Saved: teams_pca_viz.csv ({len(team_viz):,} records)")
 
-print("\n" + "="*60)
-print("🎨 POWER BI VISUALIZATION GUIDE")
-print("="*60)
+def print_powerbi_guide():
+    print("\n" + "="*60)
+    print("🎨 POWER BI VISUALIZATION GUIDE")
+    print("="*60)
 
-print("""
+    print("""
 📊 SCATTER PLOT DE TIMES (PASSO A PASSO):
 
 1. Novo Visual → Scatter Chart
@@ -250,4 +298,27 @@ Times/jogadores distantes = perfis muito diferentes
 🔴 Equilíbrio Tático - Times balanceados
 """)
 
-print("\n✅ Arquivos prontos para importar no Power BI!")
+
+def main(method='exact', refit=False, chunk_size=ROW_GROUP_SIZE):
+    print("🎨 Generating PCA coordinates for cluster visualization...\n")
+
+    players_complete, players_clustered, teams_complete = load_inputs()
+    player_viz = player_pca(players_complete, players_clustered, method=method, refit=refit, chunk_size=chunk_size)
+    team_viz, team_scaled = team_pca(teams_complete, method=method, refit=refit)
+    team_viz = assign_team_clusters(team_viz, team_scaled)
+    save_outputs(player_viz, team_viz)
+    print_powerbi_guide()
+
+    print("\n✅ Arquivos prontos para importar no Power BI!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='2D PCA coordinates for the Power BI scatter plots')
+    parser.add_argument('--method', choices=METHODS, default='exact',
+                        help='PCA fit when (re)fitting: exact SVD, randomized SVD or incremental (chunked)')
+    parser.add_argument('--refit', action='store_true',
+                        help='Fit new models (and 0-100 bounds) instead of reusing the saved ones')
+    parser.add_argument('--chunk-size', type=int, default=ROW_GROUP_SIZE,
+                        help='Rows per chunk for --method incremental')
+    args = parser.parse_args()
+    main(method=args.method, refit=args.refit, chunk_size=args.chunk_size)
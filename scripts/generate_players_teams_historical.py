@@ -1,48 +1,184 @@
+"""
+Generate the historical FBref players/teams tables from per-(league, season)
+partitions.
+
+Each (league, season) is fetched on its own and stored as
+datalake/raw/fbref/player_season_stats/<league>/<season>.csv, recorded in a
+manifest next to the partitions. A run only fetches units that are missing,
+failed before, or belong to the live season and are older than
+--max-age-hours; the manifest is saved after every unit, so an interrupted
+run resumes where it stopped. The processed CSVs are then rebuilt from the
+partitions, together with their Parquet and Hive-partitioned
+(league=/season=) copies, when a partition changed or is newer than the last
+build recorded in the manifest (so a run that died before building is
+rebuilt on the next one).
+
+Usage:
+    python scripts/generate_players_teams_historical.py                  # 1995-2024
+    python scripts/generate_players_teams_historical.py 1995 2025 --max-age-hours 12
+    python scripts/generate_players_teams_historical.py 2023 2024 --leagues "ENG-Premier League" --force
+"""
+
+import argparse
+import json
 import os
-import sys
+import time
 import pandas as pd
-import soccerdata as sd
+
+from datalake_io import PARTITION_COLUMNS, write_table
+from season_codes import current_season_year, season_code
 
 OUT = os.path.join('datalake', 'processed')
 RAW_PLAYERS_DIR = os.path.join('datalake', 'raw', 'players')
+PARTITION_DIR = os.path.join('datalake', 'raw', 'fbref', 'player_season_stats')
+MANIFEST_PATH = os.path.join(PARTITION_DIR, '_manifest.json')
 os.makedirs(OUT, exist_ok=True)
 
+# Leagues of the historical dataset (soccerdata league IDs)
+LEAGUES = [
+    'ENG-Premier League', 'ESP-La Liga', 'GER-Bundesliga', 'ITA-Serie A', 'FRA-Ligue 1',
+    'INT-World Cup', "INT-Women's World Cup", 'INT-European Championship',
+]
+
+# The live season is refetched once its partition is older than this
+LIVE_MAX_AGE_HOURS = 24
+
+# Failed units are retried on later runs up to this many attempts (tournaments
+# do not exist in every season, so some units never succeed)
+MAX_ATTEMPTS = 3
+
 def make_season_codes(start_year: int, end_year: int):
     return [f"{str(y)[-2:]}{str(y+1)[-2:]}" for y in range(start_year, end_year+1)]
 
-def main(start_year=1995, end_year=2024):
-    seasons = make_season_codes(int(start_year), int(end_year))
-    print('Generating historical FBref dataset for seasons:', seasons[0], '->', seasons[-1])
-    print('Total seasons:', len(seasons))
-    try:
-        fb = sd.FBref(seasons=seasons)
-        df = fb.read_player_season_stats()
-        print('Fetched player-season stats via FBref(seasons=...):', df.shape)
-    except Exception as e:
-        print('FBref(seasons=...) failed:', e)
-        fb = sd.FBref()
+def flatten_col(c):
+    if isinstance(c, tuple):
+        parts = [str(x).strip() for x in c if x and str(x).strip()]
+        return '_'.join(parts) if parts else ''
+    return str(c)
+
+# ---------------------------------------------------------------------------
+# Partitions + manifest
+# ---------------------------------------------------------------------------
+
+def partition_path(league, season):
+    return os.path.join(PARTITION_DIR, league, f'{season}.csv')
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'units': {}}
+
+def save_manifest(manifest):
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    tmp_path = f'{MANIFEST_PATH}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def unit_key(league, season):
+    return f'{league}|{season}'
+
+def unit_state(manifest, league, season, live_season, max_age_hours):
+    """'fresh', 'missing', 'failed' (retry) or 'stale' (live season older than max_age_hours)."""
+    entry = manifest['units'].get(unit_key(league, season))
+    if not entry:
+        return 'missing'
+    if entry['status'] == 'error':
+        return 'failed' if entry.get('attempts', 1) < MAX_ATTEMPTS else 'fresh'
+    if entry['status'] == 'ok' and not os.path.exists(partition_path(league, season)):
+        return 'missing'
+    if season == live_season and time.time() - entry['fetched_at'] > max_age_hours * 3600:
+        return 'stale'
+    return 'fresh'
+
+def needs_build(manifest, players_out, leagues, seasons):
+    """
+    True when the output is missing, was built from other leagues, or is older
+    than a partition fetched in range (e.g. a run that died after ingesting).
+    """
+    if not os.path.exists(players_out):
+        return True
+    build = manifest.get('builds', {}).get(os.path.basename(players_out))
+    if build is None:
+        built_at = os.path.getmtime(players_out)  # outputs built before the marker existed
+    elif build.get('leagues') != sorted(leagues):
+        return True
+    else:
+        built_at = build['built_at']
+    fetched = [manifest['units'][unit_key(league, season)]['fetched_at']
+               for league in leagues for season in seasons
+               if manifest['units'].get(unit_key(league, season), {}).get('status') == 'ok']
+    return bool(fetched) and max(fetched) > built_at
+
+def record_build(players_out, leagues):
+    manifest = load_manifest()
+    manifest.setdefault('builds', {})[os.path.basename(players_out)] = {
+        'built_at': time.time(), 'leagues': sorted(leagues)}
+    save_manifest(manifest)
+
+def fetch_unit(league, season, refresh=False):
+    """Player-season stats of one (league, season) with flattened columns."""
+    import soccerdata as sd
+    fb = sd.FBref(leagues=league, seasons=season, no_cache=refresh)
+    df = fb.read_player_season_stats()
+    df.columns = [flatten_col(c) for c in df.columns]
+    return df.reset_index()
+
+def ingest(leagues, seasons, max_age_hours=LIVE_MAX_AGE_HOURS, force=False):
+    """Fetches every unit that is not fresh; returns the number of partitions written."""
+    manifest = load_manifest()
+    live_season = season_code(current_season_year())
+    units = [(league, season) for league in leagues for season in seasons]
+    todo = [(league, season, 'forced' if force else unit_state(manifest, league, season, live_season, max_age_hours))
+            for league, season in units]
+    todo = [u for u in todo if u[2] != 'fresh']
+    print(f'Units: {len(units)} total, {len(units) - len(todo)} fresh, {len(todo)} to fetch')
+
+    changed = 0
+    for i, (league, season, state) in enumerate(todo, 1):
+        print(f'[{i}/{len(todo)}] {league} {season} ({state})')
+        previous = manifest['units'].get(unit_key(league, season), {})
+        entry = {'fetched_at': time.time()}
         try:
-            df = fb.read_player_season_stats(seasons=seasons)
-            print('Fetched player-season stats via read_player_season_stats(seasons=...):', df.shape)
-        except Exception as e2:
-            print('read_player_season_stats(seasons=...) failed:', e2)
-            print('Falling back to default read_player_season_stats() for available seasons.')
-            df = fb.read_player_season_stats()
-            print('Fetched player-season stats (default):', df.shape)
-
-    # Flatten columns
-    def flatten_col(c):
-        if isinstance(c, tuple):
-            parts = [str(x).strip() for x in c if x and str(x).strip()]
-            return '_'.join(parts) if parts else ''
-        return str(c)
-
-    df_flat = df.copy()
-    df_flat.columns = [flatten_col(c) for c in df_flat.columns]
-    df_flat = df_flat.reset_index()
+            df = fetch_unit(league, season, refresh=state in ('stale', 'forced'))
+            if df.empty:
+                entry.update(status='empty', rows=0)
+            else:
+                path = partition_path(league, season)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.tmp'
+                df.to_csv(tmp_path, index=False)
+                os.replace(tmp_path, path)
+                entry.update(status='ok', rows=len(df), file=os.path.relpath(path, PARTITION_DIR))
+                changed += 1
+            print(f'   rows: {entry["rows"]}')
+        except Exception as e:
+            attempts = previous.get('attempts', 0) + 1 if previous.get('status') == 'error' else 1
+            entry.update(status='error', error=str(e)[:200], attempts=attempts)
+            print('   failed:', e)
+        manifest['units'][unit_key(league, season)] = entry
+        save_manifest(manifest)
+    return changed
+
+# ---------------------------------------------------------------------------
+# Processed tables
+# ---------------------------------------------------------------------------
+
+def read_partitions(leagues, seasons):
+    frames = []
+    for league in leagues:
+        for season in seasons:
+            path = partition_path(league, season)
+            if os.path.exists(path):
+                frames.append(pd.read_csv(path, low_memory=False, dtype={'season': str}))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True, sort=False)
 
+def build_tables(df_flat, start_year, end_year):
     players_out = os.path.join(OUT, f'players_historical_{start_year}_{end_year}.csv')
-    df_flat.to_csv(players_out, index=False)
+    write_table(df_flat, players_out, sort_by=None, partition_by=PARTITION_COLUMNS)
     print('Saved players:', players_out, 'rows:', len(df_flat))
 
     # Detect numeric columns and aggregate teams
@@ -58,7 +194,7 @@ def main(start_year=1995, end_year=2024):
     print('Numeric columns detected (sample):', numeric_cols[:20])
     agg = df_flat.groupby(['league', 'season', 'team'])[numeric_cols].sum().reset_index()
     teams_out = os.path.join(OUT, f'teams_historical_{start_year}_{end_year}.csv')
-    agg.to_csv(teams_out, index=False)
+    write_table(agg, teams_out, sort_by=None, partition_by=PARTITION_COLUMNS)
     print('Saved teams:', teams_out, 'rows:', len(agg))
 
     # Save a sample head to raw players
@@ -67,10 +203,37 @@ def main(start_year=1995, end_year=2024):
     df_flat.head(500).to_csv(os.path.join(sample_dir, 'players_sample_head.csv'), index=False)
     print('Saved sample head to', sample_dir)
 
+def main(start_year=1995, end_year=2024, leagues=None, max_age_hours=LIVE_MAX_AGE_HOURS, force=False):
+    seasons = make_season_codes(int(start_year), int(end_year))
+    leagues = leagues or LEAGUES
+    print('Generating historical FBref dataset for seasons:', seasons[0], '->', seasons[-1])
+    print('Total seasons:', len(seasons), '| leagues:', len(leagues))
+
+    changed = ingest(leagues, seasons, max_age_hours=max_age_hours, force=force)
+
+    # The build marker is recorded only after build_tables, so a run that
+    # ingested and then failed is rebuilt on the next run
+    players_out = os.path.join(OUT, f'players_historical_{start_year}_{end_year}.csv')
+    if not changed and not needs_build(load_manifest(), players_out, leagues, seasons):
+        print('No partition changed -', players_out, 'is up to date')
+        return
+
+    df_flat = read_partitions(leagues, seasons)
+    if df_flat.empty:
+        print('No partitions available - nothing to build')
+        return
+    build_tables(df_flat, start_year, end_year)
+    record_build(players_out, leagues)
+
 if __name__ == '__main__':
-    start = 1995
-    end = 2024
-    if len(sys.argv) >= 3:
-        start = int(sys.argv[1])
-        end = int(sys.argv[2])
-    main(start, end)
+    parser = argparse.ArgumentParser(description='Incremental FBref player/team season ingestion')
+    parser.add_argument('start', nargs='?', type=int, default=1995, help='First season start year')
+    parser.add_argument('end', nargs='?', type=int, default=2024, help='Last season start year')
+    parser.add_argument('--leagues', type=str, default=None,
+                        help='Comma-separated soccerdata league IDs (default: all historical leagues)')
+    parser.add_argument('--max-age-hours', type=float, default=LIVE_MAX_AGE_HOURS,
+                        help='Refetch the live season when its partition is older than this')
+    parser.add_argument('--force', action='store_true', help='Refetch every unit in range')
+    args = parser.parse_args()
+    leagues = [l.strip() for l in args.leagues.split(',')] if args.leagues else None
+    main(args.start, args.end, leagues=leagues, max_age_hours=args.max_age_hours, force=args.force)
@@ -5,12 +5,23 @@ Generate Squad Database - Batch Processing
 Script to scrape team squads from multiple leagues and seasons,
 creating a comprehensive squad composition database.
 
+Runs are resumable: a manifest in the raw directory records every completed
+(team, season) unit with the hash of its squad file, so a rerun after a crash
+skips finished units. Consolidation is incremental too - only squad files
+whose hash changed are re-read and merged into the existing database.
+
 Usage:
     python scripts/generate_squads_database.py --seasons "2021,2022,2023,2024"
     python scripts/generate_squads_database.py --leagues "premier-league,la-liga" --seasons "2023"
+    python scripts/generate_squads_database.py --seasons "2023,2024" --workers 6 --rate 1.0
+    python scripts/generate_squads_database.py --seasons "2024" --force   # re-scrape finished units
 """
 
+import hashlib
+import json
+import os
 import sys
+import threading
 import pandas as pd
 from pathlib import Path
 import time
@@ -18,6 +29,9 @@ import time
 # Import the fetch_team_squads functions
 sys.path.append('scripts')
 import fetch_team_squads as fetcher
+from datalake_io import load_table, table_paths, write_table
+from dimensions import ID_COLUMNS, add_ids, load_dimension
+from http_client import RateLimitedSession
 
 # Configuration
 LEAGUES = [
@@ -60,9 +74,76 @@ TOP_TEAMS = {
 }
 
 
-def scrape_team_squad(team_name, team_id, season, output_dir):
+MANIFEST_NAME = '_manifest.json'
+
+SORT_COLUMNS = ['league', 'team', 'season_year', 'player_name']
+
+
+def squad_filename(team_name, season):
+    return f"{team_name.lower().replace(' ', '_')}_{season}_squad.csv"
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """
+    Checkpoint file for squad scraping and consolidation.
+
+    units:        "team|season" -> {file, sha1, rows, completed}
+    consolidated: squad file -> {sha1, keys: [[team, season_year], ...]} merged into the output
+    Saved atomically after every completed unit, so a crash loses at most the
+    squads in flight.
+    """
+
+    def __init__(self, raw_dir):
+        self.path = Path(raw_dir) / MANIFEST_NAME
+        self.lock = threading.Lock()
+        self.data = {'units': {}, 'consolidated': {}}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data.update(json.load(f))
+
+    @staticmethod
+    def unit_key(team_name, season):
+        return f"{team_name}|{season}"
+
+    def is_done(self, team_name, season, output_dir):
+        """True if the unit completed and its file is still there, unchanged."""
+        entry = self.data['units'].get(self.unit_key(team_name, season))
+        if not entry:
+            return False
+        file_path = Path(output_dir) / entry['file']
+        return file_path.exists() and file_sha1(file_path) == entry['sha1']
+
+    def mark_done(self, team_name, season, file_path, rows):
+        with self.lock:
+            self.data['units'][self.unit_key(team_name, season)] = {
+                'file': Path(file_path).name,
+                'sha1': file_sha1(file_path),
+                'rows': rows,
+                'completed': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def scrape_team_squad(team_name, team_id, season, output_dir, manifest=None):
     """
     Scrape single team squad using direct function call
+    
+    The squad file is recorded in the manifest (if given) once written.
     """
     print(f"  🔄 {team_name} ({season}-{season+1})...")
     
@@ -80,10 +161,11 @@ def scrape_team_squad(team_name, team_id, season, output_dir):
         # Save individual file
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
-        filename = f"{team_name.lower().replace(' ', '_')}_{season}_squad.csv"
-        file_path = output_path / filename
+        file_path = output_path / squad_filename(team_name, season)
         
         squad_df.to_csv(file_path, index=False, encoding='utf-8')
+        if manifest is not None:
+            manifest.mark_done(team_name, season, file_path, len(squad_df))
         print(f"     ✓ Success ({len(squad_df)} players)")
         return True
         
@@ -92,48 +174,65 @@ def scrape_team_squad(team_name, team_id, season, output_dir):
         return False
 
 
-def scrape_league_top_teams(league, seasons, output_dir):
+def scrape_league_top_teams(league, seasons, output_dir, max_workers=fetcher.DEFAULT_WORKERS,
+                            manifest=None, force=False):
     """
     Scrape top teams from a league across multiple seasons
+    
+    Teams are fetched concurrently; request pacing comes from the shared
+    rate-limited session in fetch_team_squads. Units already completed in the
+    manifest are skipped unless force is set.
     """
     if league not in TOP_TEAMS:
         print(f"❌ League '{league}' not configured")
         return
     
     teams = TOP_TEAMS[league]
-    total = len(teams) * len(seasons)
-    current = 0
+    units = [(team_name, team_id, season) for season in seasons for team_name, team_id in teams]
+    total = len(units)
+    if manifest is not None and not force:
+        units = [u for u in units if not manifest.is_done(u[0], u[2], output_dir)]
     
     print(f"\n{'='*70}")
     print(f"🏆 {league.upper().replace('-', ' ')}")
     print(f"   Teams: {len(teams)} | Seasons: {len(seasons)} | Total scrapes: {total}")
+    if len(units) < total:
+        print(f"   ⏭️  {total - len(units)} already completed (manifest) - {len(units)} to scrape")
     print(f"{'='*70}\n")
     
-    for season in seasons:
-        print(f"\n📅 Season {season}-{season+1}")
-        print(f"{'─'*70}")
-        
-        for team_name, team_id in teams:
-            current += 1
-            print(f"[{current}/{total}]", end=" ")
-            success = scrape_team_squad(team_name, team_id, season, output_dir)
-            
-            if success:
-                time.sleep(3)  # Rate limiting: 3 seconds between requests
-            else:
-                time.sleep(1)
-
-
-def consolidate_squads(raw_dir, output_file):
+    results = fetcher.get_client().map(
+        lambda unit: scrape_team_squad(unit[0], unit[1], unit[2], output_dir, manifest),
+        units, max_workers=max_workers
+    )
+    
+    print(f"\n   ✓ {sum(results) + total - len(units)}/{total} squads available for {league}")
+
+
+def _league_mapping(team_dimension):
+    """team_id -> league of the configured teams (any spelling of a team maps to its id)."""
+    league_mapping = {}
+    for league, teams in TOP_TEAMS.items():
+        for team_name, _ in teams:
+            team_id = team_dimension.id(team_name, assign=True, source='transfermarkt')
+            league_mapping[team_id] = league.replace('-', ' ').title()
+    return league_mapping
+
+
+def consolidate_squads(raw_dir, output_file, manifest=None):
     """
     Consolidate all individual squad CSV files into one master database
+    
+    With a manifest only squad files whose hash changed since the last
+    consolidation are read; their (team, season) rows replace the old ones in
+    the existing database. Without one (or without an existing output) the
+    database is rebuilt from every file.
     """
     print(f"\n{'='*70}")
     print(f"📦 Consolidating squad data...")
     print(f"{'='*70}\n")
     
     raw_path = Path(raw_dir)
-    csv_files = list(raw_path.glob("*_squad.csv"))
+    csv_files = sorted(raw_path.glob("*_squad.csv"))
     
     if not csv_files:
         print("❌ No squad files found to consolidate")
@@ -141,32 +240,65 @@ def consolidate_squads(raw_dir, output_file):
     
     print(f"   Found {len(csv_files)} squad files")
     
+    output_csv, _ = table_paths(output_file)
+    previous = manifest.data['consolidated'] if manifest is not None else {}
+    incremental = bool(previous) and os.path.exists(output_csv)
+    
+    hashes = {f.name: file_sha1(f) for f in csv_files}
+    if incremental:
+        changed = [f for f in csv_files if previous.get(f.name, {}).get('sha1') != hashes[f.name]]
+        removed = [name for name in previous if name not in hashes]
+        if not changed and not removed:
+            print(f"   ✓ No squad files changed - {output_csv} is up to date")
+            return
+        print(f"   🔁 Incremental: {len(changed)} changed, {len(removed)} removed, "
+              f"{len(csv_files) - len(changed)} unchanged")
+    else:
+        changed, removed = csv_files, []
+    
     all_squads = []
-    for csv_file in csv_files:
+    consolidated = {}
+    for csv_file in changed:
         try:
             df = pd.read_csv(csv_file, encoding='utf-8')
             all_squads.append(df)
+            keys = df[['team', 'season_year']].drop_duplicates()
+            consolidated[csv_file.name] = {
+                'sha1': hashes[csv_file.name],
+                'keys': [[team, int(year)] for team, year in keys.itertuples(index=False)],
+            }
         except Exception as e:
             print(f"   ⚠️  Error reading {csv_file.name}: {e}")
     
+    if incremental:
+        existing = load_table(output_file)
+        # Rows of changed/removed files are replaced by their new contents
+        stale = [previous[name] for name in removed]
+        stale += [previous[f.name] for f in changed if f.name in previous]
+        stale += list(consolidated.values())
+        stale_keys = pd.MultiIndex.from_tuples({tuple(k) for e in stale for k in e['keys']},
+                                               names=['team', 'season_year'])
+        keep = ~pd.MultiIndex.from_frame(existing[['team', 'season_year']]).isin(stale_keys)
+        all_squads.insert(0, existing[keep])
+        consolidated = {**{k: v for k, v in previous.items() if k in hashes}, **consolidated}
+    
     if all_squads:
         final_df = pd.concat(all_squads, ignore_index=True)
         
-        # Add league information based on team
-        league_mapping = {}
-        for league, teams in TOP_TEAMS.items():
-            for team_name, _ in teams:
-                league_mapping[team_name] = league.replace('-', ' ').title()
-        
-        final_df['league'] = final_df['team'].map(league_mapping)
-        
-        # Sort by league, team, season
-        final_df = final_df.sort_values(['league', 'team', 'season_year', 'player_name'])
+        # Surrogate ids shared with the FBref tables (dimensions.py), then league by team_id
+        dimensions = {entity: load_dimension(entity) for entity in ID_COLUMNS}
+        final_df = add_ids(final_df, dimensions, source='transfermarkt',
+                           columns={'player': 'player_name', 'team': 'team'})
+        final_df['league'] = final_df['team_id'].map(_league_mapping(dimensions['team']))
         
-        # Save consolidated file
-        output_path = Path(output_file)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        final_df.to_csv(output_path, index=False, encoding='utf-8')
+        # Save consolidated file (CSV + Parquet copy), sorted by league, team, season
+        output_path, _ = write_table(final_df, output_file, sort_by=SORT_COLUMNS)
+        for dimension in dimensions.values():
+            dimension.save()
+        if manifest is not None:
+            with manifest.lock:
+                manifest.data['consolidated'] = consolidated
+                manifest.save()
         
         print(f"\n✅ Consolidated database saved: {output_path}")
         print(f"📊 Statistics:")
@@ -194,8 +326,22 @@ def main():
                        help='Directory for individual squad files')
     parser.add_argument('--output', type=str, default='datalake/processed/squads_complete.csv',
                        help='Output file for consolidated database')
+    parser.add_argument('--workers', type=int, default=fetcher.DEFAULT_WORKERS,
+                       help='Concurrent requests in flight (default: 4)')
+    parser.add_argument('--rate', type=float, default=fetcher.DEFAULT_RATE,
+                       help='Max requests per second per host (default: 0.5)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always hit the network (skip the HTTP response cache)')
+    parser.add_argument('--force', action='store_true',
+                       help='Re-scrape units already completed in the run manifest')
+    parser.add_argument('--parser', type=str, choices=fetcher.PARSERS, default=fetcher.PARSER,
+                       help='HTML parser backend (default: lxml when installed)')
     
     args = parser.parse_args()
+    fetcher.PARSER = args.parser
+    fetcher.set_client(RateLimitedSession(rate=args.rate, headers=fetcher.HEADERS,
+                                          pool_size=max(args.workers, 4),
+                                          cache=not args.no_cache))
     
     # Parse seasons
     seasons = [int(s.strip()) for s in args.seasons.split(',')]
@@ -215,17 +361,19 @@ def main():
     print(f"{'='*70}\n")
     
     start_time = time.time()
+    manifest = RunManifest(args.raw_dir)
     
     # Scrape each league
     for league in leagues:
-        scrape_league_top_teams(league, seasons, args.raw_dir)
-        time.sleep(5)  # Pause between leagues
+        scrape_league_top_teams(league, seasons, args.raw_dir, max_workers=args.workers,
+                                manifest=manifest, force=args.force)
     
     # Consolidate all data
-    consolidate_squads(args.raw_dir, args.output)
+    consolidate_squads(args.raw_dir, args.output, manifest=manifest)
     
     elapsed = time.time() - start_time
     print(f"\n⏱️  Total time: {elapsed/60:.1f} minutes")
+    fetcher.get_client().print_cache_stats()
     print(f"✅ Done!\n")
 
 
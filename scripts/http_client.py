@@ -0,0 +1,275 @@
+"""
+HTTP Client - Pooled, Rate-Limited Fetching for the Scrapers
+============================================================
+
+One shared `requests.Session` (connection pooling) with a token bucket per
+host instead of fixed `time.sleep` calls between requests. Requests can run
+concurrently on a bounded thread pool; the bucket decides how fast they
+actually leave. On 429/403 the host's rate is halved and the request retried
+with backoff (honouring Retry-After); successes slowly restore the rate.
+
+Responses are cached on disk (requests-cache, SQLite) with per-URL TTLs:
+squad/league pages of past seasons never expire, the current season and
+player pages expire after a few hours, searches after a day. Cache hits skip
+the token bucket entirely; expired entries are revalidated with
+ETag/Last-Modified, so unchanged pages come back as cheap 304s.
+
+Usage:
+    from http_client import RateLimitedSession
+    client = RateLimitedSession(rate=0.5)          # 1 request / 2s per host
+    response = client.get(url, timeout=15)
+    pages = client.map(lambda u: client.get(u).text, urls, max_workers=4)
+    client.print_cache_stats()
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from season_codes import current_season_year
+
+try:
+    import requests_cache
+except ImportError:  # pragma: no cover - caching is optional, plain requests always works
+    requests_cache = None
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+# Default requests/second and burst per host; override per host if needed
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 2
+HOST_LIMITS = {
+    # 'www.transfermarkt.com': (0.5, 2),
+}
+
+THROTTLE_STATUS = {429, 403}
+RETRY_STATUS = THROTTLE_STATUS | {500, 502, 503, 504}
+
+# On-disk response cache (requests-cache appends .sqlite)
+CACHE_PATH = os.path.join('datalake', 'raw', '.http_cache')
+CURRENT_SEASON_TTL = timedelta(hours=6)
+SEARCH_TTL = timedelta(days=1)
+DEFAULT_TTL = timedelta(days=1)
+NEVER_EXPIRE = -1  # same sentinel as requests_cache.NEVER_EXPIRE
+
+
+def cache_ttls(today: date = None) -> dict:
+    """
+    Per-URL-pattern expiration for the response cache (first match wins).
+
+    Only the running season's pages can still change; every other saison_id
+    is a closed season and is cached forever.
+    """
+    season = current_season_year(today)
+    return {
+        re.compile(rf'/saison_id/{season}(/|$)'): CURRENT_SEASON_TTL,
+        re.compile(r'/saison_id/\d+'): NEVER_EXPIRE,
+        re.compile(r'/schnellsuche/'): SEARCH_TTL,
+        re.compile(r'/leistungsdatendetails/'): CURRENT_SEASON_TTL,
+    }
+
+
+def make_cached_session(cache_path: str = CACHE_PATH):
+    """SQLite-backed CachedSession with the TTLs above (None if requests-cache is missing)."""
+    if requests_cache is None:
+        print('⚠️  requests-cache not installed - responses will not be cached')
+        return None
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    return requests_cache.CachedSession(
+        cache_path,
+        backend='sqlite',
+        expire_after=DEFAULT_TTL,
+        urls_expire_after=cache_ttls(),
+        allowable_codes=(200,),
+        cache_control=False,   # site headers say no-cache; our TTLs decide
+        stale_if_error=True,   # serve the old copy if revalidation fails
+    )
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with adaptive rate (AIMD).
+
+    `acquire` blocks until a token is available. `penalize` halves the rate
+    after a throttling response; `reward` adds back a little after a success,
+    never above the configured rate.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self) -> None:
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def reward(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+
+class RateLimitedSession:
+    """
+    Pooled HTTP session with per-host token buckets and retry/backoff.
+
+    Args:
+        rate: Requests per second per host (default for hosts not in host_limits)
+        burst: Bucket capacity (requests allowed back-to-back)
+        host_limits: {host: (rate, burst)} overrides
+        max_retries: Retries on 429/403/5xx and connection errors
+        pool_size: Connections kept per host (>= concurrent workers)
+        session: Existing requests.Session to wrap
+        cache: Cache responses on disk (ignored when session is given)
+        cache_path: Location of the SQLite cache
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 host_limits: dict = None, max_retries: int = 4, pool_size: int = 16,
+                 headers: dict = None, session: requests.Session = None,
+                 cache: bool = True, cache_path: str = CACHE_PATH):
+        self.rate = rate
+        self.burst = burst
+        self.host_limits = {**HOST_LIMITS, **(host_limits or {})}
+        self.max_retries = max_retries
+        self.buckets = {}
+        self.buckets_lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self.stats_lock = threading.Lock()
+
+        if session is None and cache:
+            session = make_cached_session(cache_path)
+        self.session = session or requests.Session()
+        self.cached = requests_cache is not None and isinstance(self.session, requests_cache.CacheMixin)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self.buckets_lock:
+            if host not in self.buckets:
+                rate, burst = self.host_limits.get(host, (self.rate, self.burst))
+                self.buckets[host] = TokenBucket(rate, burst)
+            return self.buckets[host]
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        value = response.headers.get('Retry-After') if response is not None else None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _count(self, key: str) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET through the cache and the host's bucket.
+
+        Fresh (unexpired) cache hits return without touching the bucket;
+        everything else, expired entries included, waits for a token and
+        retries throttling/server errors with backoff.
+        """
+        kwargs.setdefault('timeout', 15)
+        if self.cached:
+            response = self.session.get(url, only_if_cached=True, **kwargs)
+            # With stale_if_error the probe also returns expired entries; those
+            # go through the bucket below as conditional (ETag/Last-Modified) requests
+            if response.status_code != 504 and not getattr(response, 'is_expired', False):
+                self._count('hits')
+                return response
+        bucket = self.bucket_for(url)
+
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                response = None
+
+            if response is not None and response.status_code not in RETRY_STATUS:
+                bucket.reward()
+                self._count('revalidated' if getattr(response, 'from_cache', False) else 'misses')
+                return response
+            if attempt == self.max_retries:
+                return response
+
+            if response is not None and response.status_code in THROTTLE_STATUS:
+                bucket.penalize()
+            delay = self._retry_after(response)
+            if delay is None:
+                delay = (2 ** attempt) + random.uniform(0, 1)
+            status = response.status_code if response is not None else 'connection error'
+            print(f"   ⏳ {status} from {urlparse(url).netloc} - retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+        return response
+
+    def map(self, func, items, max_workers: int = 4) -> list:
+        """Runs func over items on a bounded thread pool, preserving order."""
+        items = list(items)
+        if max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(func, items))
+
+    def cache_stats(self) -> dict:
+        """Hit/revalidation/miss counts for this session plus cache size on disk."""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        stats['requests'] = total
+        stats['hit_rate'] = (stats['hits'] + stats['revalidated']) / total if total else 0.0
+        if self.cached:
+            stats['cached_responses'] = len(self.session.cache.responses)
+            db_path = getattr(self.session.cache, 'db_path', None)
+            stats['cache_mb'] = os.path.getsize(db_path) / 1e6 if db_path and os.path.exists(db_path) else 0.0
+        return stats
+
+    def print_cache_stats(self) -> None:
+        stats = self.cache_stats()
+        if not self.cached:
+            print(f"🌐 HTTP: {stats['requests']} requests (cache disabled)")
+            return
+        print(f"🗄️  HTTP cache: {stats['hits']} hits, {stats['revalidated']} revalidated (304), "
+              f"{stats['misses']} downloaded | hit rate {stats['hit_rate']:.0%} | "
+              f"{stats['cached_responses']:,} responses, {stats['cache_mb']:.1f} MB")
@@ -0,0 +1,366 @@
+"""
+Match Ingestion - football-data.org match JSON -> match fact table
+=================================================================
+
+Flattens the match files of datalake/raw/matches (one football-data.org
+match per file, or a {"matches": [...]} list response) into one row per
+match:
+
+    match_id, utc_date, status, matchday, stage, group, last_updated,
+    area_*, competition_*, season_*, home_team_*, away_team_*,
+    winner, duration, full_time_home/away, half_time_home/away,
+    referee_id, referee_name, source_file
+
+and writes the processed 'matches' table (datalake/processed/matches.csv +
+.parquet, typed by schema.py).
+
+The job is incremental. A manifest next to the table
+(datalake/processed/matches_manifest.json, so the raw landing directory
+only holds source files) keeps each file's size, mtime and sha1: files
+whose size and mtime are unchanged are skipped without being opened, files
+that were touched but hash the same are skipped after hashing, and only new
+or changed files are parsed - in parallel worker processes.
+
+Parsed records are upserted on match_id: a record is kept only when the
+match is new or its lastUpdated moved forward (a fixture rewritten as it
+goes live and then finishes). Kept records land in a small delta table
+(datalake/processed/matches_delta.csv + .parquet) instead of rewriting the
+season: a matchday refresh writes a few rows. When the delta reaches
+max(COMPACT_MIN_ROWS, COMPACT_FRACTION of the table), or with --compact,
+it is folded into matches.csv/.parquet and removed. load_matches() reads
+the table with the pending delta applied. Matches stay in the table when
+their raw file is removed; --full rebuilds it from the files present.
+
+Usage:
+    python scripts/ingest_matches.py                 # incremental upsert
+    python scripts/ingest_matches.py --compact       # ... then fold the delta in
+    python scripts/ingest_matches.py --full --workers 8
+
+    from ingest_matches import load_matches
+    matches = load_matches(columns=['match_id', 'utc_date', 'home_team_name', 'away_team_name'])
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from datalake_io import TABLES, load_table, table_paths, write_table
+
+RAW_DIR = os.path.join('datalake', 'raw', 'matches')
+MANIFEST_SUFFIX = '_manifest.json'
+MANIFEST_VERSION = 2
+TABLE = 'matches'
+
+SORT_COLUMNS = ['competition_code', 'season_start_date', 'utc_date', 'match_id']
+
+# Accepted updates accumulate in <table>_delta until it reaches
+# max(COMPACT_MIN_ROWS, COMPACT_FRACTION * table rows); then it is folded in
+DELTA_SUFFIX = '_delta'
+COMPACT_MIN_ROWS = 1_000
+COMPACT_FRACTION = 0.1
+
+# Files per task sent to a worker (parsing one small file is cheaper than a round trip)
+TASK_CHUNK = 64
+
+
+def _get(obj, *path):
+    for key in path:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _referee(match: dict) -> dict:
+    referees = match.get('referees') or []
+    main = next((r for r in referees if r.get('type') == 'REFEREE'), referees[0] if referees else {})
+    return main or {}
+
+
+def flatten_match(match: dict, source_file: str = None) -> dict:
+    """One football-data.org match object -> one flat row."""
+    row = {
+        'match_id': match.get('id'),
+        'utc_date': match.get('utcDate'),
+        'status': match.get('status'),
+        'matchday': match.get('matchday'),
+        'stage': match.get('stage'),
+        'group': match.get('group'),
+        'last_updated': match.get('lastUpdated'),
+        'area_id': _get(match, 'area', 'id'),
+        'area_name': _get(match, 'area', 'name'),
+        'area_code': _get(match, 'area', 'code'),
+        'competition_id': _get(match, 'competition', 'id'),
+        'competition_name': _get(match, 'competition', 'name'),
+        'competition_code': _get(match, 'competition', 'code'),
+        'competition_type': _get(match, 'competition', 'type'),
+        'season_id': _get(match, 'season', 'id'),
+        'season_start_date': _get(match, 'season', 'startDate'),
+        'season_end_date': _get(match, 'season', 'endDate'),
+        'season_current_matchday': _get(match, 'season', 'currentMatchday'),
+    }
+    for side in ('home', 'away'):
+        team = match.get(f'{side}Team') or {}
+        row[f'{side}_team_id'] = team.get('id')
+        row[f'{side}_team_name'] = team.get('name')
+        row[f'{side}_team_short_name'] = team.get('shortName')
+        row[f'{side}_team_tla'] = team.get('tla')
+    row['winner'] = _get(match, 'score', 'winner')
+    row['duration'] = _get(match, 'score', 'duration')
+    for period, key in (('full_time', 'fullTime'), ('half_time', 'halfTime')):
+        for side in ('home', 'away'):
+            row[f'{period}_{side}'] = _get(match, 'score', key, side)
+    referee = _referee(match)
+    row['referee_id'] = referee.get('id')
+    row['referee_name'] = referee.get('name')
+    row['source_file'] = source_file
+    return row
+
+
+def parse_file(path: str) -> tuple:
+    """
+    Reads a match file once: returns (sha1, rows).
+
+    A file holds one match object or a list response ({"matches": [...]}).
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    payload = json.loads(raw)
+    matches = payload.get('matches', [payload]) if isinstance(payload, dict) else payload
+    name = os.path.basename(path)
+    return hashlib.sha1(raw).hexdigest(), [flatten_match(m, name) for m in matches]
+
+
+def _parse_files(paths: list) -> list:
+    results = []
+    for path in paths:
+        try:
+            results.append((path, *parse_file(path), None))
+        except (OSError, ValueError) as e:
+            results.append((path, None, [], str(e)))
+    return results
+
+
+def manifest_path(table: str = TABLE) -> str:
+    """Manifest of a match table, next to it (matches -> matches_manifest.json)."""
+    return f'{TABLES.get(table, table)}{MANIFEST_SUFFIX}'
+
+
+class Manifest:
+    """source file -> {size, mtime, sha1, rows} of the last ingestion from raw_dir."""
+
+    def __init__(self, raw_dir: str = RAW_DIR, table: str = TABLE):
+        self.path = manifest_path(table)
+        self.raw_dir = os.path.normpath(raw_dir)
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Entries of another raw directory say nothing about these files
+            if data.get('version') == MANIFEST_VERSION and data.get('raw_dir') == self.raw_dir:
+                self.files = data.get('files', {})
+
+    def unchanged(self, name: str, stat: os.stat_result) -> bool:
+        entry = self.files.get(name)
+        return bool(entry) and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+
+    def record(self, name: str, stat: os.stat_result, sha1: str, rows: int) -> None:
+        self.files[name] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': sha1, 'rows': rows}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'raw_dir': self.raw_dir, 'files': self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def delta_table(table: str = TABLE) -> str:
+    """Base path of the delta table of a match table (matches -> matches_delta)."""
+    return f'{TABLES.get(table, table)}{DELTA_SUFFIX}'
+
+
+def _exists(table: str) -> bool:
+    return any(os.path.exists(path) for path in table_paths(table))
+
+
+def _remove(table: str) -> None:
+    for path in table_paths(table):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _timestamps(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(pd.Series(values).astype('string'), utc=True, errors='coerce')
+
+
+def latest(rows: pd.DataFrame) -> pd.DataFrame:
+    """One row per match_id: the greatest last_updated (ties: the later row)."""
+    ordered = rows.assign(_stamp=_timestamps(rows['last_updated']).to_numpy())
+    ordered = ordered.sort_values('_stamp', kind='stable', na_position='first')
+    return ordered.drop_duplicates('match_id', keep='last').drop(columns='_stamp').reset_index(drop=True)
+
+
+def newer_rows(updates: pd.DataFrame, current: pd.DataFrame) -> pd.Series:
+    """
+    Mask of the updates that move a match forward: unknown match_id, or a
+    last_updated later than the current one (a current row without
+    last_updated is replaced by any dated update).
+    """
+    known = pd.Series(current['last_updated'].to_numpy(), index=current['match_id'].to_numpy())
+    is_known = updates['match_id'].isin(known.index).to_numpy()
+    previous = _timestamps(updates['match_id'].map(known)).to_numpy()
+    incoming = _timestamps(updates['last_updated']).to_numpy()
+    forward = pd.notna(incoming) & (pd.isna(previous) | (incoming > previous))
+    return pd.Series(~is_known | forward, index=updates.index)
+
+
+def upsert(current: pd.DataFrame, updates: pd.DataFrame) -> pd.DataFrame:
+    """current (one row per match_id) with the updates that moved forward applied."""
+    updates = latest(updates)
+    accepted = updates[newer_rows(updates, current)]
+    kept = current[~current['match_id'].isin(accepted['match_id'])]
+    return pd.concat([p for p in (kept, accepted) if len(p)] or [kept], ignore_index=True)
+
+
+def load_matches(table: str = TABLE, columns=None) -> pd.DataFrame:
+    """The match table as of the last ingestion: compacted rows with the delta applied."""
+    read_cols = None if columns is None else list(dict.fromkeys(['match_id', 'last_updated'] + list(columns)))
+    matches = load_table(table, columns=read_cols)
+    if _exists(delta_table(table)):
+        delta = load_table(delta_table(table), columns=read_cols)
+        matches = matches[~matches['match_id'].isin(delta['match_id'])]
+        matches = pd.concat([matches, delta], ignore_index=True)
+    return matches[list(columns)] if columns is not None else matches
+
+
+def compact(table: str = TABLE) -> int:
+    """Folds the delta into the compacted table (one full rewrite) and removes it; returns rows."""
+    matches = load_matches(table)
+    write_table(matches, table, sort_by=SORT_COLUMNS)
+    _remove(delta_table(table))
+    return len(matches)
+
+
+def ingest_matches(raw_dir: str = RAW_DIR, table: str = TABLE, workers: int = None,
+                   full: bool = False, compact_rows: int = None) -> dict:
+    """
+    Brings the match table up to date with raw_dir.
+
+    Matches are upserted on match_id: a parsed record is kept only when the
+    match is new or its last_updated is later than the stored one. Accepted
+    records go to the delta table; the compacted table is only rewritten
+    when the delta reaches compact_rows (default: COMPACT_MIN_ROWS or
+    COMPACT_FRACTION of the table, whichever is larger; 0 = compact now).
+
+    Args:
+        raw_dir: Directory of match JSON files
+        table: Output table (logical name or base path)
+        workers: Parser processes (default: CPU count; 1 = in process)
+        full: Ignore the manifest and the existing tables, rebuild from every file
+
+    Returns:
+        Counts: files, skipped, parsed, unchanged (touched, same hash),
+        failed, updated (records accepted), stale (records not newer),
+        delta_rows, compacted, rows (matches in the table)
+    """
+    start = time.perf_counter()
+    manifest = Manifest(raw_dir, table)
+    rebuild = full or not _exists(table) or not manifest.files
+    if rebuild:
+        manifest.files = {}
+
+    # '_'-prefixed files are bookkeeping (e.g. the manifest older versions kept here)
+    names = sorted(n for n in os.listdir(raw_dir) if n.endswith('.json') and not n.startswith('_'))
+    stats = {name: os.stat(os.path.join(raw_dir, name)) for name in names}
+    todo = [name for name in names if not manifest.unchanged(name, stats[name])]
+    summary = {'files': len(names), 'skipped': len(names) - len(todo), 'parsed': 0,
+               'unchanged': 0, 'failed': 0, 'updated': 0, 'stale': 0, 'compacted': False}
+
+    paths = [os.path.join(raw_dir, name) for name in todo]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(paths) > TASK_CHUNK:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [r for part in pool.map(_parse_files, _chunks(paths, TASK_CHUNK)) for r in part]
+    else:
+        results = _parse_files(paths)
+
+    new_rows = []
+    for path, sha1, rows, error in results:
+        name = os.path.basename(path)
+        if error:
+            summary['failed'] += 1
+            print(f'⚠️  {name}: {error}')
+            continue
+        if manifest.files.get(name, {}).get('sha1') == sha1:
+            summary['unchanged'] += 1
+        else:
+            summary['parsed'] += 1
+            new_rows.extend(rows)
+        manifest.record(name, stats[name], sha1, len(rows))
+    # Raw files may be rotated away; their matches stay in the table
+    manifest.files = {name: entry for name, entry in manifest.files.items() if name in stats}
+    updates = pd.DataFrame(new_rows, columns=list(flatten_match({})))
+
+    if rebuild:
+        matches = latest(updates)
+        write_table(matches, table, sort_by=SORT_COLUMNS)
+        _remove(delta_table(table))
+        summary.update(updated=len(matches), stale=len(updates) - len(matches), delta_rows=0,
+                       compacted=True, rows=len(matches))
+    else:
+        # Only the keys of the compacted table are read; the delta is small
+        current = load_matches(table, columns=['match_id', 'last_updated'])
+        delta = load_table(delta_table(table)) if _exists(delta_table(table)) else updates.iloc[0:0]
+        updates = latest(updates)
+        accepted = updates[newer_rows(updates, current)]
+        summary['updated'], summary['stale'] = len(accepted), len(new_rows) - len(accepted)
+        if len(accepted):
+            delta = upsert(delta, accepted)
+            write_table(delta, delta_table(table), sort_by=SORT_COLUMNS)
+        rows = len(current) + int((~accepted['match_id'].isin(current['match_id'])).sum())
+        if compact_rows is None:
+            compact_rows = max(COMPACT_MIN_ROWS, int(COMPACT_FRACTION * rows))
+        if len(delta) and len(delta) >= compact_rows:
+            rows = compact(table)
+            summary['compacted'] = True
+        summary['delta_rows'] = 0 if summary['compacted'] else len(delta)
+        summary['rows'] = rows
+    manifest.save()
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest football-data.org match JSON into the matches table')
+    parser.add_argument('--raw-dir', default=RAW_DIR, help=f'Match JSON directory (default: {RAW_DIR})')
+    parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+    parser.add_argument('--full', action='store_true', help='Reparse every file and rebuild the table')
+    parser.add_argument('--compact', action='store_true', help='Fold the delta into the table after ingesting')
+    args = parser.parse_args()
+
+    summary = ingest_matches(args.raw_dir, workers=args.workers, full=args.full,
+                             compact_rows=0 if args.compact else None)
+    print(f"⚽ {summary['files']:,} match files: {summary['parsed']:,} parsed, "
+          f"{summary['skipped']:,} skipped (unchanged), {summary['unchanged']:,} touched but identical, "
+          f"{summary['failed']:,} failed")
+    print(f"🔁 {summary['updated']:,} match(es) updated, {summary['stale']:,} not newer than the table")
+    if summary['compacted']:
+        print(f"✅ {table_paths(TABLE)[0]}: {summary['rows']:,} matches, compacted ({summary['seconds']:.2f}s)")
+    else:
+        print(f"✅ {table_paths(TABLE)[0]}: {summary['rows']:,} matches, "
+              f"{summary['delta_rows']:,} pending in {table_paths(delta_table())[0]} ({summary['seconds']:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
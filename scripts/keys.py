@@ -0,0 +1,94 @@
+"""
+Keys - Stable player-season ids and cardinality-checked joins
+=============================================================
+
+The processed players table has one row per (player, team, league, season),
+the key merge_normalize_players_teams deduplicates on. player_season_id is a
+64-bit hash of that key, written by the merge stage and carried through
+players_clustered.csv, so downstream stages join player-season rows on one
+integer column instead of on the player name (which repeats once per season
+and multiplies rows on both sides of a join).
+
+The hash depends only on the key values (stripped strings), so the same row
+gets the same id on every run and in every table derived from it.
+
+keyed_merge is DataFrame.merge with the cardinality checked first: a join
+that would fan out raises with the duplicated keys instead of silently
+multiplying rows.
+
+Usage:
+    from keys import PLAYER_SEASON_ID, add_player_season_id, keyed_merge
+    players = add_player_season_id(players)
+    viz = keyed_merge(viz, clustered[[PLAYER_SEASON_ID, 'player_cluster']], on=PLAYER_SEASON_ID)
+"""
+
+import numpy as np
+import pandas as pd
+
+PLAYER_SEASON_ID = 'player_season_id'
+PLAYER_SEASON_KEY = ['player', 'team', 'league', 'season']
+
+# Sides of a join that must be unique for each pandas validate option
+_UNIQUE_SIDES = {
+    'one_to_one': ('left', 'right'), '1:1': ('left', 'right'),
+    'one_to_many': ('left',), '1:m': ('left',),
+    'many_to_one': ('right',), 'm:1': ('right',),
+    'many_to_many': (), 'm:m': (),
+}
+
+
+def _key_strings(series: pd.Series) -> pd.Series:
+    # Category/str/number columns all hash through the same text ('' for missing)
+    return series.astype('string').str.strip().fillna('').astype(object)
+
+
+def key_hash(df: pd.DataFrame, columns: list) -> np.ndarray:
+    """int64 hash per row of the given key columns (their stripped text; '' for missing)."""
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f'Key needs columns {missing}')
+    values = pd.DataFrame({col: _key_strings(df[col]) for col in columns})
+    return pd.util.hash_pandas_object(values, index=False).to_numpy().view(np.int64)
+
+
+def player_season_id(df: pd.DataFrame, key=PLAYER_SEASON_KEY) -> pd.Series:
+    """int64 hash of the player-season key columns of df (aligned with df.index)."""
+    return pd.Series(key_hash(df, key), index=df.index, name=PLAYER_SEASON_ID)
+
+
+def add_player_season_id(df: pd.DataFrame, overwrite: bool = False) -> pd.DataFrame:
+    """df with a player_season_id column (kept as is when present, unless overwrite)."""
+    if PLAYER_SEASON_ID in df.columns and not overwrite:
+        return df
+    df = df.copy(deep=False)
+    df[PLAYER_SEASON_ID] = player_season_id(df)
+    return df
+
+
+def _check_unique(df: pd.DataFrame, on: list, side: str) -> None:
+    duplicated = df.duplicated(subset=on, keep=False)
+    if not duplicated.any():
+        return
+    examples = df.loc[duplicated, on].drop_duplicates().head(3)
+    raise ValueError(f'{side} side has {int(duplicated.sum()):,} rows with a repeated {on} '
+                     f'(e.g. {examples.to_dict("records")}); the join would fan out')
+
+
+def keyed_merge(left: pd.DataFrame, right: pd.DataFrame, on=PLAYER_SEASON_ID, how: str = 'left',
+                validate: str = 'many_to_one') -> pd.DataFrame:
+    """
+    left.merge(right, on=on, how=how) after checking the key cardinality.
+
+    Raises ValueError naming the duplicated keys when a side that validate
+    requires to be unique is not, and when a left join changes the number of
+    left rows.
+    """
+    on = [on] if isinstance(on, str) else list(on)
+    if validate not in _UNIQUE_SIDES:
+        raise ValueError(f'Unknown validate {validate!r} (expected one of {", ".join(_UNIQUE_SIDES)})')
+    for side in _UNIQUE_SIDES[validate]:
+        _check_unique(left if side == 'left' else right, on, side)
+    merged = left.merge(right, on=on, how=how)
+    if how == 'left' and len(merged) != len(left):
+        raise ValueError(f'Join on {on} produced {len(merged):,} rows from {len(left):,} left rows')
+    return merged
@@ -15,6 +15,8 @@ import sys
 import pandas as pd
 import os
 
+from season_codes import season_start_years
+
 def merge_missing_seasons(player_name, missing_csv):
     """
     Merge missing seasons into enriched player data.
@@ -65,8 +67,8 @@ def merge_missing_seasons(player_name, missing_csv):
     # Combine datasets
     df_combined = pd.concat([df_enriched, df_missing], ignore_index=True)
     
-    # Sort by season code
-    df_combined = df_combined.sort_values('season')
+    # Sort chronologically ('9900' before '0001', unlike a string sort)
+    df_combined = df_combined.sort_values('season', key=season_start_years)
     
     # Remove duplicates (if any)
     before_dedup = len(df_combined)
@@ -86,7 +88,7 @@ def merge_missing_seasons(player_name, missing_csv):
     # Show timeline
     print(f'\n📅 Complete timeline:')
     timeline = df_combined[['season', 'season_period', 'team', 'league', 'Performance_Gls', 'Performance_Ast']].copy()
-    timeline = timeline.sort_values('season')
+    timeline = timeline.sort_values('season', key=season_start_years)
     print(timeline.to_string(index=False))
     
     print(f'\n✅ Merge complete! Updated file: {output_path}\n')
@@ -1,24 +1,63 @@
+"""
+Merge historical (1995-2024) and current FBref tables into the processed
+players/teams tables, deduplicating on (league, season, team[, player]).
+
+By default both sources are loaded and merged in memory. With
+--memory-budget-mb the merge streams instead: sources are read in chunks,
+spilled to one file per (league, season) - part of both dedup keys - and each
+group is deduplicated and appended to the output on its own, so peak memory
+is set by the budget (and the largest league-season), not by the dataset.
+
+Player rows get a player_season_id (keys.py), a stable int64 hash of the
+(player, team, league, season) dedup key that downstream stages join on, and
+both tables get the surrogate player_id/team_id of the persisted dimensions
+(dimensions.py: dim_players.csv / dim_teams.csv, updated here). Ids are
+assigned in output order, so both paths produce the same ids.
+
+Both paths write the compact numeric dtypes declared in schema.py (nullable
+Int16/Int32 counts, float32 rates) and the Hive-partitioned copy of each table
+(players_complete_1995_2025/league=<league>/season=<code>/), which filtered
+load_table() calls read partition by partition.
+
+Usage:
+    python scripts/merge_normalize_players_teams.py
+    python scripts/merge_normalize_players_teams.py --memory-budget-mb 256
+"""
+
+import argparse
 import os
+import pickle
+import tempfile
+import numpy as np
 import pandas as pd
+from pandas.api import types as ptypes
+
+from datalake_io import PARTITION_COLUMNS, SORT_COLUMNS, TableWriter, write_table
+from dimensions import ID_COLUMNS, add_ids, load_dimension
+from keys import PLAYER_SEASON_ID, add_player_season_id
+from schema import int_storage_dtype, storage_dtypes
+from season_codes import add_season_columns, season_start_year
 
 OUT_DIR = os.path.join('datalake', 'processed')
 os.makedirs(OUT_DIR, exist_ok=True)
 
-def season_to_period(code):
-    s = str(code)
-    if len(s) == 4 and s.isdigit():
-        start = int(s[:2])
-        end = int(s[2:])
-        if start >= 90:
-            start_year = 1900 + start
-        else:
-            start_year = 2000 + start if start <= 50 else 1900 + start
-        if end < start:
-            end_year = start_year + 1
-        else:
-            end_year = (start_year // 100) * 100 + end
-        return f"{start_year}-{end_year}"
-    return s
+def load_dimensions():
+    return {entity: load_dimension(entity) for entity in ID_COLUMNS}
+
+def save_dimensions(dimensions):
+    for dimension in dimensions.values():
+        print(f'Saved {dimension.save()} ({len(dimension):,} {dimension.entity}s)')
+
+def add_keys(df, dimensions, season_ids=False):
+    """player_id/team_id (new names get new ids) and, for player rows, player_season_id."""
+    df = add_ids(df, dimensions, source='fbref')
+    if season_ids:
+        df = add_player_season_id(df, overwrite=True)
+    return df
+
+def key_columns(dimensions, subset):
+    columns = [d.id_column for entity, d in dimensions.items() if entity in subset]
+    return columns + ([PLAYER_SEASON_ID] if 'player' in subset else [])
 
 def flatten_columns(df):
     new_cols = {c: c.strip().replace(' ', '_').replace('/', '_') for c in df.columns}
@@ -32,8 +71,7 @@ def normalize_players(path):
         df = pd.read_csv(path, low_memory=False, dtype={'season': str})
     except Exception:
         df = pd.read_csv(path, low_memory=False)
-    if 'season' in df.columns:
-        df['season_period'] = df['season'].astype(str).apply(season_to_period)
+    df = add_season_columns(df)
     df = flatten_columns(df)
     return df
 
@@ -43,12 +81,194 @@ def normalize_teams(path):
         df = pd.read_csv(path, low_memory=False, dtype={'season': str})
     except Exception:
         df = pd.read_csv(path, low_memory=False)
-    if 'season' in df.columns:
-        df['season_period'] = df['season'].astype(str).apply(season_to_period)
+    df = add_season_columns(df)
     df = flatten_columns(df)
     return df
 
+# ---------------------------------------------------------------------------
+# Streaming merge
+# ---------------------------------------------------------------------------
+
+GROUP_COLUMNS = ['league', 'season']
+
+# Rows in flight are roughly this many times their raw size (parse, normalize, split)
+CHUNK_OVERHEAD = 4
+
+def _normalize_chunk(df):
+    return flatten_columns(add_season_columns(df))
+
+def _dtype_kind(series):
+    if ptypes.is_extension_array_dtype(series) and ptypes.is_integer_dtype(series):
+        return str(series.dtype)  # nullable ints (season_start_year) keep their type
+    if ptypes.is_bool_dtype(series):
+        return 'bool'
+    if ptypes.is_integer_dtype(series):
+        return 'int'
+    if ptypes.is_float_dtype(series):
+        return 'float'
+    return 'object'
+
+def _unify_kind(a, b):
+    # Same promotion pandas applies when a whole file / pd.concat is parsed at once
+    if a is None or a == b:
+        return b
+    if {a, b} <= {'int', 'float'}:
+        return 'float'
+    return 'object'
+
+KIND_DTYPES = {'bool': 'bool', 'int': 'int64', 'float': 'float64', 'object': str}
+
+def chunk_rows_for_budget(path, memory_budget_mb, sample_rows=2000):
+    sample = pd.read_csv(path, nrows=sample_rows, low_memory=False, dtype={'season': str})
+    bytes_per_row = max(1, sample.memory_usage(deep=True).sum() / max(1, len(sample)))
+    return max(1000, int(memory_budget_mb * 1e6 / (bytes_per_row * CHUNK_OVERHEAD)))
+
+def infer_schema(paths, chunk_rows):
+    """First pass: union of columns (concat order) and one dtype per column across all chunks."""
+    kinds, per_source = {}, []
+    for path in paths:
+        seen = set()
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, low_memory=False, dtype={'season': str}):
+            chunk = _normalize_chunk(chunk)
+            for col in chunk.columns:
+                kinds[col] = _unify_kind(kinds.get(col), _dtype_kind(chunk[col]))
+                seen.add(col)
+        per_source.append(seen)
+    # Columns missing from a source are NaN there, as in pd.concat
+    for col, kind in kinds.items():
+        if not all(col in seen for seen in per_source):
+            kinds[col] = {'int': 'float', 'bool': 'object'}.get(kind, kind)
+    return kinds
+
+def _read_typed_chunks(path, chunk_rows, schema):
+    # Read back with the unified types (raw names: dtype keys are pre-flatten)
+    header = pd.read_csv(path, nrows=0).columns
+    flat = flatten_columns(pd.DataFrame(columns=header)).columns
+    dtypes = {raw: KIND_DTYPES.get(schema[col], schema[col]) for raw, col in zip(header, flat)
+              if col in schema and schema[col] != 'object'}
+    dtypes.update({raw: str for raw, col in zip(header, flat) if schema.get(col) == 'object'})
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, low_memory=False, dtype=dtypes):
+        yield _normalize_chunk(chunk)
+
+def _group_sort_key(key):
+    # Same order as write_table's sort (league, season_start_year, season): NaN last at each level
+    league, season = key
+    values = (league, season_start_year(season), season)
+    return tuple(item for value in values for item in (value is None, value if value is not None else ''))
+
+def _load_spilled(path):
+    parts = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                parts.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(parts, ignore_index=True)
+
+def _wider(a, b, declared):
+    # Per-group storage types combined as apply_schema resolves the whole table
+    order = [declared, 'Int32', 'Int64', None, 'float32']
+    return max(a, b, key=order.index)
+
+def stream_merge(paths, out, subset, memory_budget_mb, dimensions=None):
+    """
+    Bounded-memory equivalent of concat + drop_duplicates(keep='last') + write_table.
+
+    Rows are spilled per (league, season) group in input order, then each group
+    is deduplicated alone and appended to the output in sorted group order.
+    With dimensions each group gets its key columns (add_keys) before it is written.
+    Deduplicated groups are spilled back before writing, so count columns are
+    widened (or kept as float32) over the whole table, as apply_schema does.
+    """
+    chunk_rows = min(chunk_rows_for_budget(p, memory_budget_mb) for p in paths)
+    print(f'Streaming merge -> {out} (budget {memory_budget_mb} MB, {chunk_rows:,} rows per chunk)')
+    schema = infer_schema(paths, chunk_rows)
+    missing = [c for c in GROUP_COLUMNS + list(subset) if c not in schema]
+    if missing:
+        raise ValueError(f'Streaming merge needs columns {missing}')
+    dtypes = {col: KIND_DTYPES.get(kind, kind) for col, kind in schema.items()}
+    # Compact numeric types of the declared schema (same as write_table applies)
+    declared = storage_dtypes(out, [col for col, kind in schema.items() if kind not in ('object', 'bool')])
+    int_columns = {col: dtype for col, dtype in declared.items() if dtype.startswith('Int')}
+    dtypes.update({col: dtype for col, dtype in declared.items() if col not in int_columns})
+    if dimensions:
+        dtypes.update({col: 'int64' for col in key_columns(dimensions, subset)})
+
+    before = after = 0
+    largest = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(out) or '.', prefix='.merge_') as spill_dir:
+        groups = {}
+        for path in paths:
+            print('Loading', path, '(chunked)')
+            for chunk in _read_typed_chunks(path, chunk_rows, schema):
+                chunk = chunk.reindex(columns=list(schema))
+                before += len(chunk)
+                for key, part in chunk.groupby(GROUP_COLUMNS, dropna=False, sort=False):
+                    key = tuple(None if pd.isna(v) else v for v in key)
+                    if key not in groups:
+                        groups[key] = [os.path.join(spill_dir, f'{len(groups):05d}.pkl'), 0]
+                    groups[key][1] += len(part)
+                    with open(groups[key][0], 'ab') as f:
+                        pickle.dump(part, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        order = sorted(groups, key=_group_sort_key)
+        widths = dict(int_columns)
+        for key in order:
+            spill_path, rows = groups[key]
+            largest = max(largest, rows)
+            group = _load_spilled(spill_path).drop_duplicates(subset=subset, keep='last')
+            if dimensions:
+                group = add_keys(group, dimensions, season_ids='player' in subset)
+            after += len(group)
+            for col, dtype in int_columns.items():
+                found = int_storage_dtype(group[col].to_numpy(dtype='float64', na_value=np.nan), dtype)
+                widths[col] = _wider(widths[col], found, dtype)
+            with open(spill_path, 'wb') as f:
+                pickle.dump(group, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        for col, dtype in widths.items():
+            if dtype == 'float32':
+                print(f'⚠️  {col}: non-integer values - kept as float32')
+            if dtype is not None:
+                dtypes[col] = dtype
+        with TableWriter(out, dtypes, partition_by=PARTITION_COLUMNS) as writer:
+            for key in order:
+                writer.write(_load_spilled(groups[key][0]))
+                os.remove(groups[key][0])
+
+    print(f'{len(groups):,} league-season groups, largest {largest:,} rows')
+    return before, after
+
+def main_streaming(memory_budget_mb):
+    players_hist = os.path.join(OUT_DIR, 'players_historical_1995_2024.csv')
+    teams_hist = os.path.join(OUT_DIR, 'teams_historical_1995_2024.csv')
+    players_curr = os.path.join(OUT_DIR, 'players.csv')
+    teams_curr = os.path.join(OUT_DIR, 'teams.csv')
+
+    dimensions = load_dimensions()
+    players_out = os.path.join(OUT_DIR, 'players_complete_1995_2025.csv')
+    before, after = stream_merge([players_hist, players_curr], players_out,
+                                 ['league','season','team','player'], memory_budget_mb, dimensions)
+    print(f'Players combined: {before} -> deduplicated {after}')
+    print('Saved', players_out, '(+ .parquet, league=/season= partitions)')
+
+    teams_out = os.path.join(OUT_DIR, 'teams_complete_1995_2025.csv')
+    before_t, after_t = stream_merge([teams_hist, teams_curr], teams_out,
+                                     ['league','season','team'], memory_budget_mb, dimensions)
+    print(f'Teams combined: {before_t} -> deduplicated {after_t}')
+    print('Saved', teams_out, '(+ .parquet, league=/season= partitions)')
+    save_dimensions(dimensions)
+
 def main():
+    parser = argparse.ArgumentParser(description='Merge and normalize FBref players/teams tables')
+    parser.add_argument('--memory-budget-mb', type=int, default=None,
+                        help='Stream the merge in chunks within roughly this much memory')
+    args = parser.parse_args()
+    if args.memory_budget_mb:
+        main_streaming(args.memory_budget_mb)
+        return
+
     players_hist = os.path.join(OUT_DIR, 'players_historical_1995_2024.csv')
     teams_hist = os.path.join(OUT_DIR, 'teams_historical_1995_2024.csv')
     players_curr = os.path.join(OUT_DIR, 'players.csv')
@@ -63,10 +283,14 @@ def main():
     combined_players.drop_duplicates(subset=['league','season','team','player'], keep='last', inplace=True)
     after = len(combined_players)
     print(f'Players combined: {before} -> deduplicated {after}')
+    # Ids in output order (write_table's sort), as the streaming path assigns them
+    dimensions = load_dimensions()
+    combined_players = combined_players.sort_values(SORT_COLUMNS, kind='stable')
+    combined_players = add_keys(combined_players, dimensions, season_ids=True)
 
     players_out = os.path.join(OUT_DIR, 'players_complete_1995_2025.csv')
-    combined_players.to_csv(players_out, index=False)
-    print('Saved', players_out)
+    write_table(combined_players, players_out, partition_by=PARTITION_COLUMNS)
+    print('Saved', players_out, '(+ .parquet, league=/season= partitions)')
 
     # Teams
     t_hist = normalize_teams(teams_hist)
@@ -76,9 +300,12 @@ def main():
     combined_teams.drop_duplicates(subset=['league','season','team'], keep='last', inplace=True)
     after_t = len(combined_teams)
     print(f'Teams combined: {before_t} -> deduplicated {after_t}')
+    combined_teams = combined_teams.sort_values(SORT_COLUMNS, kind='stable')
+    combined_teams = add_keys(combined_teams, dimensions)
     teams_out = os.path.join(OUT_DIR, 'teams_complete_1995_2025.csv')
-    combined_teams.to_csv(teams_out, index=False)
-    print('Saved', teams_out)
+    write_table(combined_teams, teams_out, partition_by=PARTITION_COLUMNS)
+    print('Saved', teams_out, '(+ .parquet, league=/season= partitions)')
+    save_dimensions(dimensions)
 
 if __name__ == '__main__':
     main()
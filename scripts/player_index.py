@@ -0,0 +1,175 @@
+"""
+Player Name Index - Persistent lookup for player rows
+=====================================================
+
+Maps accent-folded player names to row offsets in the players table, plus a
+sorted token list for prefix matching. The index lives next to the processed
+data and is refreshed automatically when the source file changes: if rows were
+only appended, just the new rows are indexed; otherwise it is rebuilt from the
+`player` column alone (the rest of the table is never loaded).
+
+Usage:
+    python scripts/player_index.py                 # build/refresh the index
+    python scripts/player_index.py "Kaka"          # show matching offsets
+
+    from player_index import load_name_index, find_offsets
+    index = load_name_index()
+    offsets = find_offsets(index, 'Kaká')
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+
+from datalake_io import load_table, source_path, table_paths
+
+INDEX_VERSION = 1
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold_name(name) -> str:
+    """Lowercases, strips accents and collapses whitespace ('Kaká ' -> 'kaka')."""
+    if name is None or name != name:  # None / NaN
+        return ''
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def index_path(table: str = 'players') -> str:
+    base = os.path.splitext(table_paths(table)[0])[0]
+    return f'{base}.name_index.json'
+
+
+def _source_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _add_rows(index: dict, names, start: int, digest) -> None:
+    """Indexes names[i] as row start+i and feeds them into the running digest."""
+    exact = index['exact']
+    for offset, name in enumerate(names, start):
+        digest.update(f'{name}\n'.encode('utf-8'))
+        key = fold_name(name)
+        if not key:
+            continue
+        exact.setdefault(key, []).append(offset)
+
+
+def _rebuild_tokens(index: dict) -> None:
+    tokens = {}
+    for key in index['exact']:
+        for token in TOKEN_RE.findall(key):
+            tokens.setdefault(token, []).append(key)
+    index['tokens'] = dict(sorted(tokens.items()))
+    index['_token_list'] = list(index['tokens'])
+
+
+def build_index(table: str = 'players', previous: dict = None) -> dict:
+    """
+    Builds (or incrementally extends) the name index from the `player` column.
+
+    Args:
+        table: Logical table name or base path of the players table
+        previous: Existing index; reused when the old rows are an unchanged prefix
+    """
+    src = source_path(table)
+    names = load_table(table, columns=['player'])['player'].tolist()
+
+    if previous and previous.get('version') == INDEX_VERSION:
+        old_rows = previous['source']['rows']
+        prefix = hashlib.sha1()
+        for name in names[:old_rows]:
+            prefix.update(f'{name}\n'.encode('utf-8'))
+        if len(names) >= old_rows and prefix.hexdigest() == previous['source']['digest']:
+            index = previous
+            _add_rows(index, names[old_rows:], old_rows, prefix)
+            index['source'] = {**_source_signature(src), 'rows': len(names), 'digest': prefix.hexdigest()}
+            _rebuild_tokens(index)
+            print(f"🔁 Name index updated: +{len(names) - old_rows} rows")
+            return index
+
+    digest = hashlib.sha1()
+    index = {'version': INDEX_VERSION, 'exact': {}}
+    _add_rows(index, names, 0, digest)
+    index['source'] = {**_source_signature(src), 'rows': len(names), 'digest': digest.hexdigest()}
+    _rebuild_tokens(index)
+    print(f"🗂️  Name index built: {len(index['exact']):,} names, {len(names):,} rows")
+    return index
+
+
+def save_index(index: dict, table: str = 'players') -> str:
+    path = index_path(table)
+    payload = {k: v for k, v in index.items() if not k.startswith('_')}
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_name_index(table: str = 'players') -> dict:
+    """Loads the persisted index, refreshing it first if the source changed."""
+    path = index_path(table)
+    index = None
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        index['_token_list'] = list(index['tokens'])
+
+        src = source_path(table)
+        current = _source_signature(src)
+        stored = index.get('source', {})
+        if all(stored.get(k) == current[k] for k in ('path', 'size', 'mtime')):
+            return index
+
+    index = build_index(table, previous=index)
+    save_index(index, table)
+    return index
+
+
+def find_offsets(index: dict, player_name: str) -> list:
+    """
+    Resolves a name to row offsets.
+
+    Exact (accent-folded) match first; otherwise every query token must be a
+    prefix of a token in the name ('ronal' -> 'Cristiano Ronaldo'). As a last
+    resort the distinct names (not the rows) are scanned for a substring.
+    """
+    key = fold_name(player_name)
+    if key in index['exact']:
+        return sorted(index['exact'][key])
+
+    query_tokens = TOKEN_RE.findall(key)
+    candidates = None
+    token_list = index['_token_list']
+    for token in query_tokens:
+        keys = set()
+        pos = bisect.bisect_left(token_list, token)
+        while pos < len(token_list) and token_list[pos].startswith(token):
+            keys.update(index['tokens'][token_list[pos]])
+            pos += 1
+        candidates = keys if candidates is None else candidates & keys
+        if not candidates:
+            break
+
+    if not candidates and key:
+        candidates = {name for name in index['exact'] if key in name}
+
+    offsets = []
+    for name in candidates or ():
+        offsets.extend(index['exact'][name])
+    return sorted(offsets)
+
+
+if __name__ == '__main__':
+    idx = load_name_index()
+    print(f"📇 {len(idx['exact']):,} names indexed ({idx['source']['rows']:,} rows) -> {index_path()}")
+    if len(sys.argv) > 1:
+        found = find_offsets(idx, sys.argv[1])
+        print(f"🔍 '{sys.argv[1]}': {len(found)} rows -> {found[:20]}")
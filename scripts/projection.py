@@ -0,0 +1,220 @@
+"""
+Projection - Persisted 2D PCA coordinates for the Power BI scatter plots
+========================================================================
+
+A Projection is a fitted StandardScaler + 2-component PCA + the bounds that
+map the two components to the dashboards' 0-100 axes. It is saved as JSON,
+so later runs project new rows (a new season, a daily ingest) with the same
+scaler, components and bounds instead of refitting over the whole history:
+a player keeps their coordinates and new points land on the same axes.
+
+Fit methods:
+- 'exact': PCA with the full SVD (the previous behaviour)
+- 'randomized': PCA(svd_solver='randomized'), faster on many rows
+- 'incremental': scaler and IncrementalPCA fitted chunk by chunk
+  (Projection.fit_chunks), so the feature matrix is never held in memory
+
+Usage:
+    from projection import Projection
+    proj = Projection.fit(player_data, features, method='randomized')
+    proj.save('datalake/processed/enriched/pca_players_model.json')
+
+    proj = Projection.load('datalake/processed/enriched/pca_players_model.json')
+    xy = proj.coordinates(new_rows)        # 0-100, same axes as before
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+MODEL_VERSION = 1
+METHODS = ('exact', 'randomized', 'incremental')
+N_COMPONENTS = 2
+RANDOM_STATE = 42
+
+# Reprojecting the fitted rows can miss the fitted extremes by float rounding
+# (~1e-14); only points beyond this fraction of the span count as outside
+# (1e-6 of the span is 0.0001 on the 0-100 axes)
+BOUNDS_RTOL = 1e-6
+
+
+class Projection:
+    """Scaler + PCA components + 0-100 bounds, all plain arrays."""
+
+    def __init__(self, features: list, mean, scale, pca_mean, components,
+                 explained_variance_ratio, bounds=None, method: str = 'exact', rows: int = 0,
+                 fitted_at: str = None):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.pca_mean = np.asarray(pca_mean, dtype=np.float64)
+        self.components = np.asarray(components, dtype=np.float64)
+        self.explained_variance_ratio = np.asarray(explained_variance_ratio, dtype=np.float64)
+        self.bounds = None if bounds is None else np.asarray(bounds, dtype=np.float64)
+        self.method = method
+        self.rows = int(rows)
+        self.fitted_at = fitted_at or time.strftime('%Y-%m-%d %H:%M:%S')
+
+    # ------------------------------------------------------------------
+    # Fit
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _from_models(cls, features, scaler, pca, method, rows):
+        return cls(features, scaler.mean_, scaler.scale_, pca.mean_, pca.components_,
+                   pca.explained_variance_ratio_, method=method, rows=rows)
+
+    @classmethod
+    def fit(cls, data, features: list, method: str = 'exact',
+            random_state: int = RANDOM_STATE) -> 'Projection':
+        """Fits scaler, PCA and 0-100 bounds on the rows of data (a DataFrame)."""
+        if method == 'incremental':
+            return cls.fit_chunks(lambda: iter([data]), features)
+        if method not in METHODS:
+            raise ValueError(f'Unknown method {method!r} (expected one of {", ".join(METHODS)})')
+        scaler = StandardScaler()
+        scaled = scaler.fit_transform(_matrix(data, features))
+        pca = PCA(n_components=N_COMPONENTS, svd_solver='randomized' if method == 'randomized' else 'auto',
+                  random_state=random_state)
+        pca.fit(scaled)
+        projection = cls._from_models(features, scaler, pca, method, len(scaled))
+        # Bounds from the same arithmetic later runs use, so refitted and reused runs agree exactly
+        projection.fit_bounds(projection.transform(data))
+        return projection
+
+    @classmethod
+    def fit_chunks(cls, chunks, features: list, batch_size: int = None) -> 'Projection':
+        """
+        Incremental fit. chunks is a callable returning a fresh iterator of
+        DataFrames; it is read twice (scaler, then PCA) and a third time for
+        the bounds. Rows with missing features are skipped, as in fit().
+        """
+        scaler = StandardScaler()
+        rows = 0
+        for chunk in chunks():
+            matrix = _matrix(chunk, features)
+            if len(matrix):
+                scaler.partial_fit(matrix)
+                rows += len(matrix)
+
+        pca = IncrementalPCA(n_components=N_COMPONENTS, batch_size=batch_size)
+        carry = None
+        for chunk in chunks():
+            scaled = _matrix(chunk, features)
+            if not len(scaled):
+                continue
+            scaled = scaler.transform(scaled)
+            if carry is not None:
+                scaled, carry = np.vstack([carry, scaled]), None
+            # partial_fit needs at least n_components rows per call
+            if len(scaled) < N_COMPONENTS:
+                carry = scaled
+                continue
+            pca.partial_fit(scaled)
+        # A single trailing row cannot be fitted alone; it only shifts the mean negligibly
+
+        projection = cls._from_models(features, scaler, pca, 'incremental', rows)
+        low = np.full(N_COMPONENTS, np.inf)
+        high = np.full(N_COMPONENTS, -np.inf)
+        for chunk in chunks():
+            coords = projection.transform(chunk)
+            if len(coords):
+                low, high = np.minimum(low, coords.min(axis=0)), np.maximum(high, coords.max(axis=0))
+        projection.bounds = np.vstack([low, high])
+        return projection
+
+    def fit_bounds(self, coords: np.ndarray) -> None:
+        """Stores the per-component min/max that map to 0 and 100."""
+        self.bounds = np.vstack([coords.min(axis=0), coords.max(axis=0)])
+
+    # ------------------------------------------------------------------
+    # Transform
+    # ------------------------------------------------------------------
+
+    def scale(self, data) -> np.ndarray:
+        """Standardized features (the fitted scaler), rows with missing features dropped."""
+        return (_matrix(data, self.features) - self.mean) / self.scale_
+
+    def transform(self, data) -> np.ndarray:
+        """Raw PCA components (rows x 2)."""
+        return (self.scale(data) - self.pca_mean) @ self.components.T
+
+    def normalize(self, coords: np.ndarray, clip: bool = True) -> np.ndarray:
+        """Components mapped to 0-100 with the persisted bounds (clipped: new extremes sit on the edge)."""
+        low, high = self.bounds
+        span = np.where(high > low, high - low, 1.0)
+        scaled = 100 * (coords - low) / span
+        return np.clip(scaled, 0, 100) if clip else scaled
+
+    def coordinates(self, data, clip: bool = True) -> np.ndarray:
+        return self.normalize(self.transform(data), clip=clip)
+
+    def out_of_bounds(self, coords: np.ndarray) -> int:
+        """Rows outside the persisted bounds (a refit widens the axes for them)."""
+        low, high = self.bounds
+        tolerance = BOUNDS_RTOL * np.maximum(high - low, np.maximum(np.abs(low), np.abs(high)))
+        return int(((coords < low - tolerance) | (coords > high + tolerance)).any(axis=1).sum())
+
+    # ------------------------------------------------------------------
+    # Persist
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> dict:
+        return {
+            'version': MODEL_VERSION,
+            'method': self.method,
+            'rows': self.rows,
+            'fitted_at': self.fitted_at,
+            'features': self.features,
+            'mean': self.mean.tolist(),
+            'scale': self.scale_.tolist(),
+            'pca_mean': self.pca_mean.tolist(),
+            'components': self.components.tolist(),
+            'explained_variance_ratio': self.explained_variance_ratio.tolist(),
+            'bounds': None if self.bounds is None else self.bounds.tolist(),
+        }
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'Projection':
+        with open(path, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+        if model.get('version') != MODEL_VERSION:
+            raise ValueError(f'{path}: model version {model.get("version")} (expected {MODEL_VERSION})')
+        return cls(model['features'], model['mean'], model['scale'], model['pca_mean'],
+                   model['components'], model['explained_variance_ratio'], bounds=model['bounds'],
+                   method=model['method'], rows=model['rows'], fitted_at=model['fitted_at'])
+
+
+def _matrix(data, features: list) -> np.ndarray:
+    """Feature matrix of the rows without missing features (float64)."""
+    values = data[features].astype('float64').to_numpy(na_value=np.nan)
+    return values[~np.isnan(values).any(axis=1)]
+
+
+def load_or_fit(path: str, fit, features: list, refit: bool = False) -> tuple:
+    """
+    Saved projection at path when its features match; otherwise fit() and save.
+
+    Returns (projection, reused).
+    """
+    if path and os.path.exists(path) and not refit:
+        projection = Projection.load(path)
+        if projection.features == list(features):
+            return projection, True
+        print(f"⚠️  {path} was fitted on other features - refitting")
+    projection = fit()
+    if path:
+        projection.save(path)
+    return projection, False
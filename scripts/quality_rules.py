@@ -0,0 +1,452 @@
+"""
+Quality Rules - Declarative data-quality checks over the processed layer
+=======================================================================
+
+Column constraints are declared once per table in RULES and evaluated
+vectorized, chunk by chunk: players and teams one Hive partition at a time
+(datalake_io.iter_partitions), the match table with its pending delta, and
+every enriched player file matching a glob. Rule kinds:
+
+- required:    columns that must exist
+- not_null:    columns without missing values
+- numeric:     columns whose values all parse as numbers
+- ranges:      column -> (min, max, severity); None leaves a side open
+- unique:      key columns identifying a row (checked over the whole table
+               through 64-bit key hashes, so duplicates in different chunks
+               are found too)
+- references:  key columns that must exist in another table (e.g. each
+               player's league/season/team in the teams table)
+
+Results are cached per source (datalake/processed/_quality_cache.json),
+keyed by the size + mtime + sha1 of every file the source reads - the
+table's CSV, Parquet copy and partitions, plus those of referenced tables -
+and by the rules: unchanged sources are not read again.
+
+Each violated rule becomes one line of a compact report
+(datalake/processed/quality_report.csv): table, source, rule, column,
+severity, rows checked, violating rows and one example. Severity 'error'
+fails the run, 'warn' is reported only.
+
+Usage:
+    python scripts/quality_rules.py                  # all tables + enriched files
+    python scripts/quality_rules.py players teams
+
+    from quality_rules import run_rules
+    results = run_rules(['players'])
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from datalake_io import ROW_GROUP_SIZE, dataset_path, iter_partitions, load_table, table_columns, table_paths
+from keys import key_hash
+
+REPORT_PATH = os.path.join('datalake', 'processed', 'quality_report.csv')
+ENRICHED_GLOB = os.path.join('datalake', 'processed', 'enriched', '*_enriched.csv')
+CACHE_PATH = os.path.join('datalake', 'processed', '_quality_cache.json')
+CACHE_VERSION = 1
+
+PLAYER_KEY = ['league', 'season', 'team', 'player']
+TEAM_KEY = ['league', 'season', 'team']
+
+
+def _read_matches():
+    from ingest_matches import load_matches
+    yield None, load_matches()
+
+
+def _match_tables():
+    from ingest_matches import delta_table
+    return ['matches', delta_table()]
+
+
+RULES = {
+    # One row per player-season (FBref league stats)
+    'players': {
+        'required': PLAYER_KEY,
+        'not_null': PLAYER_KEY,
+        'unique': [{'columns': PLAYER_KEY, 'severity': 'error'}],
+        'ranges': {
+            'age': (14, 50, 'warn'),
+            'Playing_Time_MP': (0, 70, 'error'),
+            'Playing_Time_Min': (0, 6_000, 'error'),
+            'Performance_Gls': (0, 100, 'error'),
+            'Performance_Ast': (0, 100, 'error'),
+            'Expected_xG': (0, None, 'error'),
+            # Rates of low-minute seasons run high: warn only
+            'Per_90_Minutes_Gls': (0, 3, 'warn'),
+        },
+        'references': [{'columns': TEAM_KEY, 'table': 'teams', 'severity': 'error'}],
+    },
+    # Squad sums per team-season
+    'teams': {
+        'required': TEAM_KEY,
+        'not_null': TEAM_KEY,
+        'unique': [{'columns': TEAM_KEY, 'severity': 'error'}],
+        'ranges': {
+            'Playing_Time_MP': (0, None, 'error'),
+            'Performance_Gls': (0, None, 'error'),
+            'Expected_xG': (0, None, 'error'),
+        },
+    },
+    # football-data.org matches (ingest_matches.py), delta applied
+    'matches': {
+        'reader': _read_matches,
+        'inputs': _match_tables,
+        'optional': True,
+        'required': ['match_id', 'utc_date', 'status', 'home_team_id', 'away_team_id'],
+        'not_null': ['match_id', 'utc_date', 'status'],
+        'unique': [{'columns': ['match_id'], 'severity': 'error'}],
+        'ranges': {col: (0, 30, 'error') for col in
+                   ('full_time_home', 'full_time_away', 'half_time_home', 'half_time_away')},
+    },
+    # Enriched player careers (enrich_player.py), one report source per file
+    'enriched': {
+        'files': ENRICHED_GLOB,
+        'required': ['season_period', 'team', 'league', 'Performance_Gls',
+                     'Per_90_Minutes_Gls', 'is_domestic_league'],
+        'numeric': ['Performance_Gls', 'Per_90_Minutes_Gls'],
+        'unique': [{'columns': ['season_period', 'league', 'team'], 'severity': 'warn'}],
+        'ranges': {
+            'Performance_Gls': (0, 100, 'warn'),
+            'Per_90_Minutes_Gls': (0, 3, 'error'),
+        },
+    },
+}
+
+
+class _Check:
+    """Running totals of one rule over the chunks of a source."""
+
+    def __init__(self, rule: str, column: str, severity: str):
+        self.rule, self.column, self.severity = rule, column, severity
+        self.rows = 0
+        self.violations = 0
+        self.example = ''
+
+    def add(self, rows: int, mask, example=None) -> None:
+        self.rows += rows
+        count = int(np.count_nonzero(mask))
+        if count:
+            self.violations += count
+            if not self.example:
+                self.example = example() if callable(example) else str(example or '')
+
+
+def _describe(df: pd.DataFrame, mask, columns: list, partition=None) -> str:
+    """First violating row of mask as 'col=value, ...' (plus its partition)."""
+    row = df.loc[np.asarray(mask), columns].iloc[0]
+    text = ', '.join(f'{col}={row[col]}' for col in columns) or f'row {row.name}'
+    return text if not partition else f"{text} ({'/'.join(str(v) for v in partition.values())})"
+
+
+def _numbers(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def rule_columns(spec: dict) -> list:
+    """Every column a table's rules read, in declaration order."""
+    columns = list(spec.get('required', [])) + list(spec.get('not_null', []))
+    columns += list(spec.get('numeric', [])) + list(spec.get('ranges', {}))
+    for rule in spec.get('unique', []) + spec.get('references', []):
+        columns += rule['columns']
+    return list(dict.fromkeys(columns))
+
+
+def _partitions(table: str, spec: dict):
+    # Only the columns the rules read (and that exist) are decoded
+    available = set(table_columns(table))
+    return iter_partitions(table, [col for col in rule_columns(spec) if col in available])
+
+
+def _read_csv(path: str):
+    with pd.read_csv(path, low_memory=False, chunksize=ROW_GROUP_SIZE) as reader:
+        for chunk in reader:
+            yield None, chunk
+
+
+def _reference_keys(reference: dict) -> np.ndarray:
+    columns = reference['columns']
+    return np.unique(key_hash(load_table(reference['table'], columns=columns), columns))
+
+
+def evaluate(table: str, spec: dict, chunks, source: str = None) -> list:
+    """
+    Evaluates one table's rules over an iterable of (partition, chunk).
+
+    Returns one result dict per rule and column (violations may be 0).
+    """
+    checks = {}
+
+    def check(rule, column, severity):
+        key = (rule, column)
+        if key not in checks:
+            checks[key] = _Check(rule, column, severity)
+        return checks[key]
+
+    references = [(ref, _reference_keys(ref)) for ref in spec.get('references', [])]
+    unique_hashes = {tuple(u['columns']): [] for u in spec.get('unique', [])}
+    first = True
+    for partition, df in chunks:
+        rows = len(df)
+        if first:
+            for col in spec.get('required', []):
+                check('required', col, 'error').add(1, col not in df.columns, 'missing column')
+            first = False
+
+        for col in spec.get('not_null', []):
+            if col in df.columns:
+                mask = df[col].isna().to_numpy()
+                check('not_null', col, 'error').add(rows, mask, lambda: _describe(df, mask, [], partition))
+
+        for col in spec.get('numeric', []):
+            if col in df.columns:
+                mask = np.isnan(_numbers(df[col])) & df[col].notna().to_numpy()
+                check('numeric', col, 'error').add(rows, mask, lambda: repr(df.loc[mask, col].iloc[0]))
+
+        for col, (low, high, severity) in spec.get('ranges', {}).items():
+            if col in df.columns:
+                values = _numbers(df[col])
+                mask = np.zeros(rows, dtype=bool)
+                if low is not None:
+                    mask |= values < low
+                if high is not None:
+                    mask |= values > high
+                check('range', col, severity).add(
+                    rows, mask, lambda: _describe(df, mask, [col], partition))
+
+        for unique in spec.get('unique', []):
+            columns = unique['columns']
+            if all(col in df.columns for col in columns):
+                hashes = key_hash(df, columns)
+                unique_hashes[tuple(columns)].append(hashes)
+                result = check('unique', '+'.join(columns), unique['severity'])
+                result.rows += rows
+                # Example only; the count comes from the whole-table hashes below
+                mask = pd.Series(hashes).duplicated().to_numpy()
+                if mask.any() and not result.example:
+                    result.example = _describe(df, mask, columns, partition)
+
+        for ref, keys in references:
+            columns = ref['columns']
+            if all(col in df.columns for col in columns):
+                mask = ~np.isin(key_hash(df, columns), keys)
+                check('reference', '+'.join(columns), ref['severity']).add(
+                    rows, mask, lambda: f"not in {ref['table']}: {_describe(df, mask, columns)}")
+
+    for columns, parts in unique_hashes.items():
+        if parts:
+            _, counts = np.unique(np.concatenate(parts), return_counts=True)
+            result = checks[('unique', '+'.join(columns))]
+            result.violations = int((counts - 1).sum())
+            if result.violations and not result.example:
+                result.example = 'duplicates span chunks'
+
+    return [{
+        'table': table,
+        'source': source or table,
+        'rule': c.rule,
+        'column': c.column,
+        'severity': c.severity,
+        'rows_checked': c.rows,
+        'violations': c.violations,
+        'example': c.example if c.violations else '',
+    } for c in checks.values()]
+
+
+def _table_exists(table: str) -> bool:
+    return any(os.path.exists(path) for path in table_paths(table))
+
+
+def _file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _spec_key(spec: dict) -> str:
+    return json.dumps({k: v for k, v in spec.items() if not callable(v)}, sort_keys=True, default=list)
+
+
+def _table_files(table: str, spec: dict) -> list:
+    """Every file a table's rules read: its own and those of the referenced tables."""
+    tables = spec['inputs']() if 'inputs' in spec else [table]
+    tables += [ref['table'] for ref in spec.get('references', [])]
+    files = []
+    for name in tables:
+        files += [path for path in table_paths(name) if os.path.exists(path)]
+        for root, dirs, names in os.walk(dataset_path(name)):
+            dirs.sort()
+            files += [os.path.join(root, n) for n in sorted(names)]
+    return files
+
+
+def _cached_results(entry, spec_key: str, files: list):
+    """Cached results of a source if its rules and files are unchanged, else None."""
+    if not entry or entry['spec'] != spec_key or sorted(entry['files']) != sorted(files):
+        return None
+    for path in files:
+        stat = os.stat(path)
+        size, mtime, sha1 = entry['files'][path]
+        if size != stat.st_size:
+            return None
+        # Touched but with the same content: only the hash is read again
+        if mtime != stat.st_mtime:
+            if _file_sha1(path) != sha1:
+                return None
+            entry['files'][path] = [size, stat.st_mtime, sha1]
+    return entry['results']
+
+
+def _cache_entry(spec_key: str, files: list, results: list) -> dict:
+    stats = {path: os.stat(path) for path in files}
+    return {'spec': spec_key, 'results': results,
+            'files': {path: [st.st_size, st.st_mtime, _file_sha1(path)] for path, st in stats.items()}}
+
+
+def _load_cache(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('sources', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def _save_cache(path: str, sources: dict) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'sources': sources}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def run_rules(tables=None, rules: dict = RULES, report_path: str = REPORT_PATH, verbose: bool = True,
+              cache_path: str = CACHE_PATH) -> pd.DataFrame:
+    """
+    Evaluates the rules of the given tables (default: all) and writes the report.
+
+    Returns every rule result (violations may be 0); the report file keeps
+    only the violated ones. A missing table (or no file matching the glob)
+    is a 'required' error, unless the table is marked optional. Sources whose
+    files and rules are unchanged reuse the results cached in cache_path
+    (None disables the cache).
+    """
+    cache = _load_cache(cache_path)
+    results = []
+    for table in tables or list(rules):
+        spec = rules[table]
+        start = time.perf_counter()
+        if 'files' in spec:
+            paths = sorted(glob.glob(spec['files']))
+            sources = [(os.path.basename(p), lambda p=p: _read_csv(p), [p]) for p in paths]
+        elif not _table_exists(table):
+            sources = []
+        elif 'reader' in spec:
+            sources = [(table, spec['reader'], _table_files(table, spec))]
+        else:
+            sources = [(table, lambda: _partitions(table, spec), _table_files(table, spec))]
+
+        if not sources and spec.get('optional'):
+            if verbose:
+                print(f"  - {table}: no data, skipped")
+            continue
+        if not sources:
+            missing = [{'table': table, 'source': table, 'rule': 'required', 'column': '',
+                        'severity': 'error', 'rows_checked': 0, 'violations': 1,
+                        'example': f"no data found ({spec.get('files') or table_paths(table)[0]})"}]
+            results.extend(missing)
+            if verbose:
+                _print_table(table, 0, missing, time.perf_counter() - start)
+            continue
+        spec_key = _spec_key(spec)
+        table_results = []
+        hits = 0
+        for source, chunks, files in sources:
+            key = f'{table}:{source}'
+            entry = cache.pop(key, None)
+            cached = _cached_results(entry, spec_key, files)
+            if cached is not None:
+                cache[key] = entry
+                table_results.extend(cached)
+                hits += 1
+                continue
+            try:
+                source_results = evaluate(table, spec, chunks(), source)
+                if cache_path:
+                    cache[key] = _cache_entry(spec_key, files, source_results)
+            except Exception as e:
+                source_results = [{'table': table, 'source': source, 'rule': 'read', 'column': '',
+                                   'severity': 'error', 'rows_checked': 0, 'violations': 1,
+                                   'example': str(e)}]
+            table_results.extend(source_results)
+        # Sources that no longer exist (e.g. a removed enriched file) leave the cache
+        names = {f'{table}:{source}' for source, _, _ in sources}
+        for key in [key for key in cache if key.startswith(f'{table}:') and key not in names]:
+            del cache[key]
+        results.extend(table_results)
+        if verbose:
+            _print_table(table, len(sources), table_results, time.perf_counter() - start, hits)
+
+    report = pd.DataFrame(results, columns=['table', 'source', 'rule', 'column', 'severity',
+                                            'rows_checked', 'violations', 'example'])
+    if cache_path:
+        _save_cache(cache_path, cache)
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+        tmp_path = f'{report_path}.tmp'
+        report[report['violations'] > 0].to_csv(tmp_path, index=False)
+        os.replace(tmp_path, report_path)
+    return report
+
+
+def _print_table(table: str, sources: int, results: list, seconds: float, hits: int = 0) -> None:
+    failed = [r for r in results if r['violations']]
+    errors = sum(1 for r in failed if r['severity'] == 'error')
+    rows = max((r['rows_checked'] for r in results if r['rule'] != 'required'), default=0)
+    label = f'{sources} files' if table == 'enriched' else f'{rows:,} rows'
+    mark = '✗' if errors else ('⚠' if failed else '✓')
+    print(f"  {mark} {table}: {len(results)} checks over {label}, "
+          f"{errors} error(s), {len(failed) - errors} warning(s) ({seconds:.2f}s"
+          f"{f', {hits}/{sources} from cache' if hits else ''})")
+    for r in failed:
+        print(f"      {r['severity']:5s} {r['source']} {r['rule']} {r['column']}: "
+              f"{r['violations']:,} - {r['example']}")
+
+
+def has_errors(report: pd.DataFrame) -> bool:
+    return bool(((report['violations'] > 0) & (report['severity'] == 'error')).any())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate the data-quality rules of the processed layer')
+    parser.add_argument('tables', nargs='*',
+                        help=f'Tables to check (default: all of {", ".join(RULES)})')
+    parser.add_argument('--report', default=REPORT_PATH, help=f'Report CSV (default: {REPORT_PATH})')
+    parser.add_argument('--no-cache', action='store_true', help='Evaluate every source again')
+    args = parser.parse_args()
+    unknown = [t for t in args.tables if t not in RULES]
+    if unknown:
+        parser.error(f'unknown table(s) {unknown} (expected {", ".join(RULES)})')
+
+    print("🔬 Data-quality rules")
+    report = run_rules(args.tables or None, report_path=args.report,
+                       cache_path=None if args.no_cache else CACHE_PATH)
+    print(f"📝 {int((report['violations'] > 0).sum())} violated rule(s) -> {args.report}")
+    return 1 if has_errors(report) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+Table Schema - Compact dtypes for the Processed Players/Teams Tables
+===================================================================
+
+Declared column types for the FBref players and teams tables:
+
+- strings with few distinct values (league, season, team, player, nation,
+  pos, Club, season_period) -> category; season and season_period are
+  ordered chronologically, so sorting and min/max keep working
+- counts (matches, minutes, goals, cards, progressive actions) -> nullable
+  Int16/Int32 (missing stays missing instead of turning the column float64)
+- rates and expected values (per 90, xG, 90s) -> float32
+
+The match fact table (ingest_matches.py) is declared the same way: ids and
+goals as nullable integers, names and statuses as categories.
+
+Numeric types are applied when a table is written (merge/historical scripts)
+and are what the CSV and Parquet files hold; categories are applied when a
+table is loaded (datalake_io.load_table), since category sets differ between
+batches of a streamed write. A loaded players frame is several times smaller.
+
+Usage:
+    from schema import apply_schema, memory_report, print_memory_report
+    compact = apply_schema(df, 'players')
+    print_memory_report(memory_report(df, compact), 'players')
+
+    python scripts/schema.py players      # memory per column, raw vs compact
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+
+from season_codes import season_start_years
+
+CATEGORY = 'category'
+
+# Columns shared by both tables
+_KEY_COLUMNS = {
+    'league': CATEGORY,
+    'season': CATEGORY,
+    'team': CATEGORY,
+    'season_period': CATEGORY,
+    'season_start_year': 'Int16',
+}
+
+_RATE_COLUMNS = [
+    'Playing_Time_90s',
+    'Expected_xG', 'Expected_npxG', 'Expected_xAG', 'Expected_npxG+xAG',
+    'Per_90_Minutes_Gls', 'Per_90_Minutes_Ast', 'Per_90_Minutes_G+A', 'Per_90_Minutes_G-PK',
+    'Per_90_Minutes_G+A-PK', 'Per_90_Minutes_xG', 'Per_90_Minutes_xAG', 'Per_90_Minutes_xG+xAG',
+    'Per_90_Minutes_npxG', 'Per_90_Minutes_npxG+xAG',
+]
+
+_COUNT_COLUMNS = [
+    'Playing_Time_MP', 'Playing_Time_Starts',
+    'Performance_Gls', 'Performance_Ast', 'Performance_G+A', 'Performance_G-PK',
+    'Performance_PK', 'Performance_PKatt', 'Performance_CrdY', 'Performance_CrdR',
+    'Progression_PrgC', 'Progression_PrgP', 'Progression_PrgR',
+]
+
+SCHEMAS = {
+    # One row per player-season: counts fit Int16 (minutes per season < 32,767)
+    'players': {
+        **_KEY_COLUMNS,
+        'player': CATEGORY,
+        'nation': CATEGORY,
+        'pos': CATEGORY,
+        'Club': CATEGORY,
+        'age': 'Int16',
+        'Playing_Time_born': 'Int16',
+        **{col: 'Int16' for col in _COUNT_COLUMNS},
+        'Playing_Time_Min': 'Int32',
+        **{col: 'float32' for col in _RATE_COLUMNS},
+    },
+    # One row per match (football-data.org feed, ingest_matches.py): ids fit Int32, goals Int16
+    'matches': {
+        'match_id': 'Int32',
+        'status': CATEGORY,
+        'matchday': 'Int16',
+        'stage': CATEGORY,
+        'group': CATEGORY,
+        'area_id': 'Int32',
+        'area_name': CATEGORY,
+        'area_code': CATEGORY,
+        'competition_id': 'Int32',
+        'competition_name': CATEGORY,
+        'competition_code': CATEGORY,
+        'competition_type': CATEGORY,
+        'season_id': 'Int32',
+        'season_current_matchday': 'Int16',
+        **{f'{side}_team_{col}': dtype for side in ('home', 'away')
+           for col, dtype in (('id', 'Int32'), ('name', CATEGORY), ('short_name', CATEGORY),
+                              ('tla', CATEGORY))},
+        'winner': CATEGORY,
+        'duration': CATEGORY,
+        **{f'{period}_{side}': 'Int16' for period in ('full_time', 'half_time') for side in ('home', 'away')},
+        'referee_id': 'Int32',
+    },
+    # Squad sums per team-season: counts need Int32, summed ages stay float
+    'teams': {
+        **_KEY_COLUMNS,
+        'age': 'float32',
+        'Playing_Time_born': 'Int32',
+        **{col: 'Int32' for col in _COUNT_COLUMNS},
+        'Playing_Time_Min': 'Int32',
+        **{col: 'float32' for col in _RATE_COLUMNS},
+    },
+}
+
+ORDERED_CATEGORIES = ('season', 'season_period')
+
+
+def schema_name(table: str) -> str:
+    """Schema of a table name or path ('players', 'datalake/.../teams_complete_1995_2025.csv')."""
+    if table in SCHEMAS:
+        return table
+    stem = os.path.splitext(os.path.basename(str(table)))[0]
+    for name in SCHEMAS:
+        if stem == name or stem.startswith(f'{name}_'):
+            return name
+    return None
+
+
+def storage_dtypes(table: str, columns=None) -> dict:
+    """Numeric dtypes written to disk for the given columns (categories excluded)."""
+    schema = SCHEMAS.get(schema_name(table), {})
+    return {col: dtype for col, dtype in schema.items()
+            if dtype != CATEGORY and (columns is None or col in columns)}
+
+
+def int_storage_dtype(values: np.ndarray, dtype: str):
+    """
+    Type a declared int column is stored as, given its float64 values.
+
+    The declared dtype, widened to Int32/Int64 when values do not fit,
+    'float32' when any value is fractional, None when nothing fits.
+    """
+    finite = values[~np.isnan(values)]
+    if len(finite) and not np.array_equal(finite, np.round(finite)):
+        return 'float32'
+    for candidate in (dtype, 'Int32', 'Int64'):
+        info = np.iinfo(candidate.lower())
+        if not len(finite) or (finite.min() >= info.min and finite.max() <= info.max):
+            return candidate
+    return None
+
+
+def _to_int(series: pd.Series, dtype: str, column: str) -> pd.Series:
+    target = int_storage_dtype(series.to_numpy(dtype='float64', na_value=np.nan), dtype)
+    if target == 'float32':
+        print(f'⚠️  {column}: non-integer values - kept as float32')
+    return series if target is None else series.astype(target)
+
+
+def _to_category(series: pd.Series, column: str) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if column not in ORDERED_CATEGORIES:
+        return series.astype(CATEGORY)
+    uniques = pd.Series(series.dropna().unique())
+    if column == 'season':
+        uniques = uniques.iloc[np.argsort(season_start_years(uniques.astype(str)).to_numpy(
+            dtype='float64', na_value=np.inf), kind='stable')]
+    else:
+        uniques = uniques.sort_values()
+    return series.astype(pd.CategoricalDtype(uniques.tolist(), ordered=True))
+
+
+def apply_schema(df: pd.DataFrame, table: str, categories: bool = True) -> pd.DataFrame:
+    """
+    Casts the declared columns of a table (others are left untouched).
+
+    Columns that are not numeric are never coerced to numbers, and a count
+    column that turns out to hold fractions or larger values is widened
+    instead of losing data.
+    """
+    schema = SCHEMAS.get(schema_name(table))
+    if not schema:
+        return df
+    df = df.copy(deep=False)  # casts replace columns; the caller's frame is untouched
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if dtype == CATEGORY:
+            if categories:
+                df[col] = _to_category(series, col)
+        elif not ptypes.is_numeric_dtype(series) or ptypes.is_bool_dtype(series):
+            continue
+        elif dtype.startswith('Int'):
+            if str(series.dtype) != dtype:
+                df[col] = _to_int(series, dtype, col)
+        elif series.dtype != dtype:
+            df[col] = series.astype(dtype)
+    return df
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Memory per column (MB) and dtypes before/after a schema was applied."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'mb_before': before.memory_usage(deep=True, index=False) / 1e6,
+        'mb_after': after.memory_usage(deep=True, index=False) / 1e6,
+    })
+    return report.sort_values('mb_before', ascending=False)
+
+
+def print_memory_report(report: pd.DataFrame, label: str = '', top: int = 10) -> None:
+    before, after = report['mb_before'].sum(), report['mb_after'].sum()
+    ratio = before / after if after else float('nan')
+    print(f"💾 {label}: {before:,.1f} MB -> {after:,.1f} MB ({ratio:.1f}x smaller)")
+    if top:
+        print(report.head(top).round(2).to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory of a processed table, raw vs compact dtypes')
+    parser.add_argument('table', nargs='?', default='players', help="Table name or path (default: players)")
+    parser.add_argument('--top', type=int, default=10, help='Columns to list (largest first)')
+    args = parser.parse_args()
+
+    from datalake_io import table_paths
+    csv_path = table_paths(args.table)[0]
+    raw = pd.read_csv(csv_path, low_memory=False, dtype={'season': str})
+    print(f"📊 {csv_path}: {len(raw):,} rows")
+    print_memory_report(memory_report(raw, apply_schema(raw, args.table)), args.table, top=args.top)
+
+
+if __name__ == '__main__':
+    main()
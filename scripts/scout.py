@@ -0,0 +1,342 @@
+"""
+Scout - Vectorized Transfer Recommendations
+===========================================
+
+Matrix version of the notebook's recommend_transfers / contextual_ranking.
+Instead of iterating over every player row per team (with a squad scan per
+row for the current club and a cosine_similarity call per pair):
+
+- player embeddings are L2-normalized once, so cosine similarity is a dot
+  product and every team block is scored with one matrix product
+- squad members and goalkeepers are removed with boolean masks
+- the top k per team come from np.argpartition (only k rows are sorted)
+- current clubs are looked up once for all players
+
+Scores match the loop version (same cosine, same 40/60 contextual formula),
+computed in float32.
+
+Usage:
+    from scout import FEATURE_COLUMNS, ScoutEngine, recommend_transfers
+    engine = ScoutEngine(players_df, X_scaled, squads_df)
+    recs = recommend_transfers(engine, teams_vectors_dict, top_k=7)   # {team: DataFrame}
+"""
+
+import numpy as np
+import pandas as pd
+
+# Features dos embeddings de jogadores (colunas de players_complete_1995_2025)
+FEATURE_COLUMNS = {
+    'performance': [
+        'Performance_Gls',      # Gols marcados
+        'Performance_Ast',      # Assistências
+        'Performance_G+A',      # Gols + Assistências
+        'Performance_G-PK',     # Gols sem pênaltis
+        'Performance_PK',       # Pênaltis
+        'Performance_CrdY',     # Cartões amarelos (disciplina)
+        'Performance_CrdR',     # Cartões vermelhos
+    ],
+    'expected': [
+        'Expected_xG',          # xG - qualidade de chutes
+        'Expected_xAG',         # xA - qualidade de passes de gol
+        'Expected_npxG+xAG',    # xG + xA sem pênaltis
+    ],
+    'per_90': [
+        'Per_90_Minutes_Gls',   # Gols por 90 min
+        'Per_90_Minutes_Ast',   # Assist por 90 min
+        'Per_90_Minutes_G+A',   # G+A por 90 min
+        'Per_90_Minutes_xG',    # xG por 90 min
+        'Per_90_Minutes_xAG',   # xA por 90 min
+        'Per_90_Minutes_xG+xAG',# xG+xA por 90 min
+    ],
+    'playing_time': [
+        'Playing_Time_MP',      # Matches Played
+        'Playing_Time_Starts',  # Partidas como titular
+        'Playing_Time_Min',     # Minutos totais
+        'Playing_Time_90s',     # Partidas equivalentes (90min)
+    ],
+    'progression': [
+        'Progression_PrgC',     # Carregadas progressivas
+        'Progression_PrgP',     # Passes progressivos
+        'Progression_PrgR',     # Corridas progressivas
+    ],
+    'basic': [
+        'age',                  # Idade
+    ]
+}
+
+# Teams scored per matrix product (bounds the teams x players score block)
+BLOCK_SIZE = 128
+
+# Contextual ranking: players from the squad's two main clusters get full tactical fit
+PRIMARY_CLUSTERS = 2
+TACTICAL_FIT_PRIMARY = 1.0
+TACTICAL_FIT_OTHER = 0.6
+
+
+def available_features(df: pd.DataFrame, verbose: bool = True) -> list:
+    """Feature columns of FEATURE_COLUMNS present in df, in declaration order."""
+    features = []
+    for category, columns in FEATURE_COLUMNS.items():
+        available = [col for col in columns if col in df.columns]
+        features.extend(available)
+        if verbose:
+            print(f"  {category.upper()}: {len(available)}/{len(columns)} features")
+    return features
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Rows scaled to unit L2 norm (float32); all-zero rows stay zero, like cosine_similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _lower(series: pd.Series) -> pd.Series:
+    return series.astype(str).str.lower()
+
+
+def squad_player_names(squads_df: pd.DataFrame) -> pd.Series:
+    """Lowercased squad player names ('player_name', falling back to 'Player')."""
+    names = squads_df['player_name'] if 'player_name' in squads_df.columns else pd.Series(index=squads_df.index, dtype=object)
+    if 'Player' in squads_df.columns:
+        names = names.fillna(squads_df['Player'])
+    return _lower(names.fillna(''))
+
+
+def player_keys(players_df: pd.DataFrame, squads_df: pd.DataFrame) -> tuple:
+    """
+    Join keys of player rows and squad rows: the integer player_id when both
+    carry it (dimensions.py; accents and alias spellings already resolved),
+    lowercased names otherwise.
+    """
+    if 'player_id' in players_df.columns and 'player_id' in squads_df.columns:
+        squad_ids = squads_df['player_id'].to_numpy(dtype='int64')
+        # Unnamed rows (id -1) on either side must not match each other
+        return players_df['player_id'].to_numpy(dtype='int64'), np.where(squad_ids < 0, -2, squad_ids)
+    return _lower(players_df['player']).to_numpy(), squad_player_names(squads_df).to_numpy()
+
+
+class ScoutEngine:
+    """
+    Scores every (team, player) pair with one matrix product per team block.
+
+    Players are the rows of players_df (one per player-season, as in the
+    notebook); vectors are their embeddings (e.g. X_scaled). Squad membership,
+    goalkeepers and current clubs are resolved once here, by player_id (or
+    lowercased name when the tables carry no ids, see player_keys).
+    """
+
+    def __init__(self, players_df: pd.DataFrame, vectors, squads_df: pd.DataFrame,
+                 block_size: int = BLOCK_SIZE):
+        self.players = players_df.reset_index(drop=True)
+        self.unit = normalize_rows(vectors)
+        if len(self.unit) != len(self.players):
+            raise ValueError(f'{len(self.unit)} vectors for {len(self.players)} players')
+        self.block_size = block_size
+
+        names, squad_names = player_keys(self.players, squads_df)
+        name_codes, uniques = pd.factorize(np.concatenate([names, squad_names]))
+        self.n_names = len(uniques)
+        self.player_codes = name_codes[:len(names)]
+        squad_codes = name_codes[len(names):]
+
+        # Squad rows grouped by lowercased team name, in squad order
+        team_codes, self.teams = pd.factorize(_lower(squads_df['team']))
+        order = np.argsort(team_codes, kind='stable')
+        bounds = np.searchsorted(team_codes[order], np.arange(len(self.teams) + 1))
+        self._squads = [squad_codes[order[bounds[t]:bounds[t + 1]]] for t in range(len(self.teams))]
+        self._team_position = {team: t for t, team in enumerate(self.teams)}
+
+        pos = self.players['pos'] if 'pos' in self.players.columns else pd.Series('', index=self.players.index)
+        self.is_goalkeeper = _lower(pos.fillna('')).str.upper().to_numpy() == 'GK'
+
+        # First squad listing of each name = current club ('Unknown' if not in any squad)
+        first_team = (pd.DataFrame({'code': squad_codes, 'team': squads_df['team'].to_numpy()})
+                      .drop_duplicates('code').set_index('code')['team'])
+        club = pd.Series(self.player_codes).map(first_team)
+        self.in_squad = club.notna().to_numpy()
+        self.current_club = club.fillna('Unknown').astype(str).to_numpy()
+
+        # First player row per name (the row the loop version's .iloc[0] picked)
+        first_row = np.full(self.n_names, -1)
+        seen = pd.Series(self.player_codes).drop_duplicates()
+        first_row[seen.to_numpy()] = seen.index.to_numpy()
+        self._first_row = first_row
+
+        # Player rows per name code (CSR layout): rows of code c = _rows[_row_bounds[c]:_row_bounds[c + 1]]
+        self._rows = np.argsort(self.player_codes, kind='stable')
+        self._row_bounds = np.searchsorted(self.player_codes[self._rows], np.arange(self.n_names + 1))
+
+    def squad_codes(self, team_name: str) -> np.ndarray:
+        position = self._team_position.get(str(team_name).lower())
+        return self._squads[position] if position is not None else np.empty(0, dtype=np.intp)
+
+    def member_rows(self, team_name: str) -> np.ndarray:
+        """Player rows whose name is listed in the team's squad."""
+        codes = np.unique(self.squad_codes(team_name))
+        parts = [self._rows[self._row_bounds[c]:self._row_bounds[c + 1]] for c in codes]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def primary_clusters(self, team_name: str, clusters: np.ndarray, n: int = PRIMARY_CLUSTERS) -> np.ndarray:
+        """The n most common clusters of the squad's players (ties: first seen in the squad)."""
+        rows = self._first_row[self.squad_codes(team_name)]
+        labels = clusters[rows[rows >= 0]]
+        if not len(labels):
+            return np.empty(0, dtype=clusters.dtype)
+        uniques, first, counts = np.unique(labels, return_index=True, return_counts=True)
+        order = np.lexsort((first, -counts))
+        return uniques[order[:n]]
+
+    def rank(self, team_names, team_vectors, top_k: int = 7, exclude_squad: bool = True,
+             exclude_goalkeepers: bool = True, valid=None, clusters=None,
+             weight_tactical: float = None) -> list:
+        """
+        Top players per team.
+
+        Only eligible rows (valid, minus goalkeepers) enter the matrix product;
+        each team's squad members are then masked out before np.argpartition.
+
+        Args:
+            team_names: Team names (squad lookup is case-insensitive)
+            team_vectors: (teams x dims) team embeddings
+            top_k: Players returned per team
+            exclude_squad / exclude_goalkeepers: Exclusions applied before top-k
+            valid: Optional boolean mask of eligible player rows
+            clusters: Player cluster labels (required with weight_tactical)
+            weight_tactical: Contextual ranking - final = vector * (1 - w) + tactical_fit * w
+
+        Returns:
+            One (row indices, vector scores, final scores) tuple per team, best first
+        """
+        team_names = list(team_names)
+        team_unit = normalize_rows(team_vectors)
+        eligible = np.ones(len(self.players), dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+        if exclude_goalkeepers:
+            eligible = eligible & ~self.is_goalkeeper
+        columns = np.flatnonzero(eligible)
+        unit_t = np.ascontiguousarray(self.unit[columns].T)
+        position = np.full(len(self.players), -1)
+        position[columns] = np.arange(len(columns))
+        if weight_tactical is not None:
+            clusters = np.asarray(clusters)
+            cluster_codes, cluster_ids = pd.factorize(clusters[columns])
+            cluster_ids = pd.Index(cluster_ids)
+
+        k = min(top_k, len(columns))
+        results = []
+        for start in range(0, len(team_names), self.block_size):
+            names = team_names[start:start + self.block_size]
+            vector_scores = team_unit[start:start + self.block_size] @ unit_t
+            if weight_tactical is not None:
+                primary = np.zeros((len(names), len(cluster_ids)), dtype=bool)
+                for i, team in enumerate(names):
+                    ids = cluster_ids.get_indexer(self.primary_clusters(team, clusters))
+                    primary[i, ids[ids >= 0]] = True
+                fit = np.where(primary[:, cluster_codes], TACTICAL_FIT_PRIMARY, TACTICAL_FIT_OTHER)
+                masked = vector_scores * (1 - weight_tactical) + fit.astype(np.float32) * weight_tactical
+            else:
+                masked = vector_scores.copy()
+            if exclude_squad:
+                for i, team in enumerate(names):
+                    members = position[self.member_rows(team)]
+                    masked[i, members[members >= 0]] = -np.inf
+
+            if not k:
+                results.extend((np.empty(0, dtype=np.intp),) + (np.empty(0, dtype=np.float32),) * 2 for _ in names)
+                continue
+            top = np.argpartition(-masked, k - 1, axis=1)[:, :k]
+            for i in range(len(names)):
+                local = top[i][np.isfinite(masked[i, top[i]])]
+                local = local[np.lexsort((local, -masked[i, local]))]
+                results.append((columns[local], vector_scores[i, local], masked[i, local]))
+        return results
+
+
+def _team_block(teams_vectors_dict: dict, teams=None):
+    teams = list(teams_vectors_dict) if teams is None else [t for t in teams if t in teams_vectors_dict]
+    vectors = np.vstack([teams_vectors_dict[t] for t in teams]) if teams else np.empty((0, 0))
+    return teams, vectors
+
+
+def _eligible(engine: ScoutEngine, only_active: bool) -> np.ndarray:
+    # Rows without age cannot be shown; only_active keeps players listed in a current squad
+    valid = engine.players['age'].notna().to_numpy()
+    return valid & engine.in_squad if only_active else valid
+
+
+def _frames(engine: ScoutEngine, teams: list, results: list, extra) -> dict:
+    """Formats all teams' rows in one frame, then splits it per team."""
+    kept = [(team, result) for team, result in zip(teams, results) if len(result[0])]
+    if not kept:
+        return {}
+    idx = np.concatenate([result[0] for _, result in kept])
+    players = engine.players.iloc[idx]
+    columns = {
+        'Jogador': _lower(players['player']).str.title().to_numpy(),
+        'Posição': players['pos'].astype(object).fillna('Unknown').to_numpy() if 'pos' in players else 'Unknown',
+        'Cluster': players['player_cluster'].to_numpy() if 'player_cluster' in players else -1,
+        'Idade': players['age'].astype(int).to_numpy(),
+    }
+    columns.update(extra(idx, kept))
+    columns = {name: np.broadcast_to(np.asarray(values), len(idx)) for name, values in columns.items()}
+    bounds = np.cumsum([0] + [len(result[0]) for _, result in kept])
+    return {team: pd.DataFrame({name: values[bounds[i]:bounds[i + 1]] for name, values in columns.items()})
+            for i, (team, _) in enumerate(kept)}
+
+
+def _clubs(engine: ScoutEngine, idx: np.ndarray) -> np.ndarray:
+    return pd.Series(engine.current_club[idx]).str.title().to_numpy()
+
+
+def recommend_transfers(engine: ScoutEngine, teams_vectors_dict: dict, top_k: int = 7, teams=None,
+                        only_active: bool = True) -> dict:
+    """
+    Best available players per team by cosine similarity to the team vector.
+
+    Squad members of the team and goalkeepers are excluded. With only_active
+    (default, as in the loop version) only players found in a current squad
+    are recommended. Returns {team: DataFrame} with the notebook's columns,
+    best first.
+    """
+    teams, vectors = _team_block(teams_vectors_dict, teams)
+    if not teams:
+        return {}
+    results = engine.rank(teams, vectors, top_k=top_k, valid=_eligible(engine, only_active))
+    gls = engine.players['Performance_Gls'] if 'Performance_Gls' in engine.players else None
+
+    def extra(idx, kept):
+        return {
+            'Time_Atual': _clubs(engine, idx),
+            'Gols_Carreira': gls.iloc[idx].astype(float).to_numpy() if gls is not None else 0.0,
+            'Match_Score': np.round(np.concatenate([r[1] for _, r in kept]).astype(float), 4),
+        }
+    return _frames(engine, teams, results, extra)
+
+
+def contextual_ranking(engine: ScoutEngine, teams_vectors_dict: dict, weight_tactical: float = 0.6,
+                       top_k: int = 7, teams=None, only_active: bool = True) -> dict:
+    """
+    Ranking that mixes vector match and cluster fit:
+    Final_Score = Vector_Score * (1 - w) + Tactical_Fit * w, with Tactical_Fit
+    1.0 for the squad's two main clusters and 0.6 otherwise.
+    """
+    teams, vectors = _team_block(teams_vectors_dict, teams)
+    if not teams:
+        return {}
+    clusters = engine.players['player_cluster'].to_numpy()
+    # Teams without any clustered squad player have no context to rank with
+    primary = {t: engine.primary_clusters(t, clusters) for t in teams}
+    teams = [t for t in teams if len(primary[t])]
+    vectors = np.vstack([teams_vectors_dict[t] for t in teams]) if teams else vectors[:0]
+    results = engine.rank(teams, vectors, top_k=top_k, valid=_eligible(engine, only_active),
+                          clusters=clusters, weight_tactical=weight_tactical)
+
+    def extra(idx, kept):
+        fit = np.concatenate([np.isin(clusters[r[0]], primary[team]) for team, r in kept])
+        return {
+            'Time': _clubs(engine, idx),
+            'Vector_Score': np.round(np.concatenate([r[1] for _, r in kept]).astype(float), 4),
+            'Tactical_Fit': np.where(fit, TACTICAL_FIT_PRIMARY, TACTICAL_FIT_OTHER),
+            'Final_Score': np.round(np.concatenate([r[2] for _, r in kept]).astype(float), 4),
+        }
+    return _frames(engine, teams, results, extra)
@@ -0,0 +1,136 @@
+"""
+Season Codes - One Conversion for Every Season Format
+=====================================================
+
+FBref/soccerdata identify seasons by four-digit codes ('9596', '0001',
+'2324'); Transfermarkt labels them '23/24' (or a calendar year such as
+'2023' for MLS/Brasileirão). Everything downstream uses the period string
+'1995-1996' and the integer start year 1995.
+
+All two-digit years follow one century rule (<= 50 -> 2000s, else 1900s).
+Conversions go through a table precomputed for every code the data can
+contain, so converting a column is a factorize + array lookup over the
+handful of distinct codes instead of a Python call per row.
+
+Usage:
+    from season_codes import add_season_columns, season_periods, season_start_years
+    df = add_season_columns(df)                      # season_period + season_start_year
+    df.sort_values('season', key=season_start_years) # chronological, not lexicographic
+"""
+
+import re
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+CENTURY_PIVOT = 50          # two-digit years <= 50 are 2000s
+FIRST_START_YEAR = 1951     # first/last start years two-digit codes can express
+LAST_START_YEAR = 2050
+
+START_YEAR_DTYPE = 'Int16'
+
+LABEL_RE = re.compile(r'(\d{2})/(\d{2})')
+YEAR_RE = re.compile(r'(\d{4})')
+
+
+def two_digit_year(yy: int) -> int:
+    return 2000 + yy if yy <= CENTURY_PIVOT else 1900 + yy
+
+
+def season_code(start_year: int) -> str:
+    """1995 -> '9596', 1999 -> '9900', 2023 -> '2324'."""
+    return f'{start_year % 100:02d}{(start_year + 1) % 100:02d}'
+
+
+def current_season_year(today: date = None) -> int:
+    """Start year of the running season (European seasons start in July)."""
+    today = today or date.today()
+    return today.year if today.month >= 7 else today.year - 1
+
+
+def _period(start_year: int, end_year: int) -> str:
+    return f'{start_year}-{end_year}'
+
+
+# Every FBref code in the century window, computed once
+CODE_TABLE = {
+    season_code(year): (_period(year, year + 1), year)
+    for year in range(FIRST_START_YEAR, LAST_START_YEAR + 1)
+}
+
+
+@lru_cache(maxsize=None)
+def _parse_code(code: str) -> tuple:
+    """(period, start_year) for an FBref code; codes outside the table keep their text."""
+    if code in CODE_TABLE:
+        return CODE_TABLE[code]
+    if len(code) == 4 and code.isdigit():
+        start, end = int(code[:2]), int(code[2:])
+        start_year = two_digit_year(start)
+        end_year = start_year + 1 if end < start else (start_year // 100) * 100 + end
+        return _period(start_year, end_year), start_year
+    return code, None
+
+
+@lru_cache(maxsize=None)
+def _parse_label(label: str) -> tuple:
+    """(period, start_year) for a Transfermarkt label ('23/24' or '2023')."""
+    match = LABEL_RE.search(label)
+    if match:
+        y1, y2 = int(match.group(1)), int(match.group(2))
+        start_year = two_digit_year(y1)
+        return _period(start_year, two_digit_year(y2)), start_year
+    match = YEAR_RE.search(label)
+    if match:
+        year = int(match.group(1))
+        return _period(year, year + 1), year
+    return label, None
+
+
+def season_to_period(code) -> str:
+    """'9596' -> '1995-1996'. Non-codes are returned unchanged (as text)."""
+    return _parse_code(str(code))[0]
+
+
+def season_start_year(code):
+    """'9596' -> 1995 (None when the code cannot be parsed)."""
+    if code is None or code != code:  # None / NaN
+        return None
+    return _parse_code(str(code))[1]
+
+
+def label_to_period(label) -> str:
+    """Transfermarkt label -> period ('23/24' -> '2023-2024', '2023' -> '2023-2024')."""
+    return _parse_label(str(label))[0]
+
+
+def _lookup(values: pd.Series, parse, field: int) -> np.ndarray:
+    codes, uniques = pd.factorize(values)
+    table = np.array([parse(str(u))[field] for u in uniques] + [None], dtype=object)
+    return table[codes]  # code -1 (missing) picks the trailing None
+
+
+def season_periods(codes: pd.Series) -> pd.Series:
+    """Vectorized season_to_period (missing codes stay missing)."""
+    return pd.Series(_lookup(codes, _parse_code, 0), index=codes.index, name='season_period')
+
+
+def season_start_years(codes: pd.Series) -> pd.Series:
+    """Vectorized season_start_year as a nullable Int16 column."""
+    return pd.Series(_lookup(codes, _parse_code, 1), index=codes.index, name='season_start_year',
+                     dtype=START_YEAR_DTYPE)
+
+
+def label_periods(labels: pd.Series) -> pd.Series:
+    """Vectorized label_to_period for Transfermarkt season labels."""
+    return pd.Series(_lookup(labels, _parse_label, 0), index=labels.index, name='season_period')
+
+
+def add_season_columns(df: pd.DataFrame, column: str = 'season') -> pd.DataFrame:
+    """Adds season_period and season_start_year derived from an FBref code column."""
+    if column in df.columns:
+        df['season_period'] = season_periods(df[column])
+        df['season_start_year'] = season_start_years(df[column])
+    return df
@@ -0,0 +1,175 @@
+"""
+Team Vectors - Squad embeddings in one grouped pass
+===================================================
+
+A team vector is the mean of its squad players' embeddings (rows of
+X_scaled). The notebook built it per team: for every squad player it scanned
+all of players_df with str.lower() == and averaged a Python list of vectors.
+
+Here squad players are resolved to player rows once, through a join on
+player_id (or lowercased names for tables without ids - the same keys as
+scout.ScoutEngine, see scout.player_keys; the first players_df row of a
+player is used, as the loop's .iloc[0] did). All team vectors then come
+from one grouped reduction over the matched rows, optionally weighted by a
+column such as Playing_Time_Min.
+
+Results can be cached in an .npz keyed on hashes of the squads, the player
+names, the feature version (or the embeddings themselves) and the weights;
+a cache hit skips the join and the reduction.
+
+Usage:
+    from team_vectors import compute_team_vectors
+    teams_vectors_dict, teams_vectors_df = compute_team_vectors(players_df, X_scaled, squads_df)
+    compute_team_vectors(players_df, X_scaled, squads_df, weight_column='Playing_Time_Min',
+                         cache_path='datalake/processed/team_vectors.npz')
+"""
+
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from scout import _lower, player_keys
+
+CACHE_VERSION = 1
+
+
+def _hash(*parts) -> str:
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, (pd.Series, pd.DataFrame)):
+            part = pd.util.hash_pandas_object(part, index=False).to_numpy()
+        if isinstance(part, np.ndarray):
+            digest.update(str((part.dtype, part.shape)).encode())
+            part = np.ascontiguousarray(part).tobytes()
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_key(players_df: pd.DataFrame, vectors: np.ndarray, squads_df: pd.DataFrame,
+              weight_column: str = None, feature_version=None) -> dict:
+    """
+    Hashes of everything a team vector depends on.
+
+    feature_version identifies the embeddings (e.g. the feature list plus the
+    scaler's mean_/scale_); without it the embeddings themselves are hashed.
+    """
+    player_ids, squad_ids = player_keys(players_df, squads_df)
+    weights = players_df[weight_column] if weight_column else None
+    return {
+        'version': CACHE_VERSION,
+        'squads': _hash(_lower(squads_df['team']), pd.Series(squad_ids)),
+        'players': _hash(pd.Series(player_ids)),
+        'features': _hash(*feature_version) if feature_version is not None else _hash(np.asarray(vectors)),
+        'weights': _hash(weight_column, weights) if weight_column else None,
+    }
+
+
+def squad_player_rows(players_df: pd.DataFrame, squads_df: pd.DataFrame) -> np.ndarray:
+    """players_df row of each squad row (first row of the same player; -1 if none)."""
+    player_ids, squad_ids = player_keys(players_df, squads_df)
+    first = pd.Series(player_ids).drop_duplicates()
+    rows = pd.Index(first.to_numpy()).get_indexer(squad_ids)
+    return np.where(rows >= 0, first.index.to_numpy()[rows], -1)
+
+
+def _reduce(vectors: np.ndarray, team_codes: np.ndarray, rows: np.ndarray, weights) -> tuple:
+    """(team codes, matched counts, vectors) for teams with at least one matched player."""
+    matched = rows >= 0
+    team_codes, rows = team_codes[matched], rows[matched]
+    order = np.argsort(team_codes, kind='stable')
+    team_codes, rows = team_codes[order], rows[order]
+    if not len(rows):
+        return team_codes, np.empty(0, dtype=np.int64), np.empty((0, vectors.shape[1]))
+
+    starts = np.flatnonzero(np.r_[True, team_codes[1:] != team_codes[:-1]])
+    counts = np.diff(np.r_[starts, len(rows)])
+    member_vectors = vectors[rows]
+    means = np.add.reduceat(member_vectors, starts, axis=0) / counts[:, None]
+    if weights is not None:
+        w = weights[rows]
+        totals = np.add.reduceat(w, starts)
+        weighted = np.add.reduceat(member_vectors * w[:, None], starts, axis=0)
+        # Teams whose players have no weight (e.g. no minutes) keep the plain mean
+        means = np.where(totals[:, None] > 0, weighted / np.where(totals > 0, totals, 1)[:, None], means)
+    return team_codes[starts], counts, means
+
+
+def _load_cache(path: str, key: dict):
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        if json.loads(str(data['_key'])) != key:
+            return None
+        return data['teams'].tolist(), data['matched'], data['vectors']
+
+
+def _save_cache(path: str, key: dict, teams: list, matched: np.ndarray, vectors: np.ndarray) -> None:
+    buffer = io.BytesIO()
+    np.savez(buffer, _key=np.array(json.dumps(key)), teams=np.array(teams, dtype=str),
+             matched=matched, vectors=vectors)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+
+
+def compute_team_vectors(players_df: pd.DataFrame, vectors, squads_df: pd.DataFrame,
+                         weight_column: str = None, cache_path: str = None,
+                         feature_version=None) -> tuple:
+    """
+    Team vectors for every team in squads_df.
+
+    Args:
+        players_df: Player rows (one per player-season), aligned with vectors
+        vectors: (players x dims) embeddings, e.g. X_scaled
+        squads_df: Squads with 'team' and 'player_name' (or 'Player')
+        weight_column: Optional players_df column to weight the mean by
+            (e.g. 'Playing_Time_Min'); missing values weigh 0
+        cache_path: Optional .npz reused while squads, names, embeddings and
+            weights are unchanged
+        feature_version: Optional tuple identifying the embeddings in the
+            cache key (see cache_key); cheaper than hashing them
+
+    Returns:
+        (teams_vectors_dict, teams_vectors_df): {team: vector} and a frame with
+        team, matched_players and team_vector, in squads_df team order. Team
+        names are matched case-insensitively; teams without any matched
+        player are left out.
+    """
+    vectors = np.asarray(vectors)
+    if len(vectors) != len(players_df):
+        raise ValueError(f'{len(vectors)} vectors for {len(players_df)} players')
+
+    key = cache_key(players_df, vectors, squads_df, weight_column, feature_version) if cache_path else None
+    cached = _load_cache(cache_path, key)
+    if cached is not None:
+        teams, matched, team_vectors = cached
+    else:
+        team_codes, team_keys = pd.factorize(_lower(squads_df['team']))
+        weights = None
+        if weight_column:
+            weights = pd.to_numeric(players_df[weight_column], errors='coerce').fillna(0).to_numpy(dtype='float64')
+        codes, matched, team_vectors = _reduce(vectors, team_codes, squad_player_rows(players_df, squads_df), weights)
+
+        # One entry per distinct team name (names differing only in case share a vector)
+        names = squads_df['team'].dropna().drop_duplicates()
+        position = pd.Series(np.arange(len(codes)), index=team_keys[codes])
+        slots = position.reindex(_lower(names).to_numpy()).to_numpy()
+        found = ~np.isnan(slots)
+        teams = names[found].tolist()
+        slots = slots[found].astype(int)
+        matched, team_vectors = matched[slots], team_vectors[slots]
+        if cache_path:
+            _save_cache(cache_path, key, teams, matched, team_vectors)
+
+    teams_vectors_dict = dict(zip(teams, team_vectors))
+    teams_vectors_df = pd.DataFrame({
+        'team': teams,
+        'matched_players': np.asarray(matched, dtype=int),
+        'team_vector': list(team_vectors),
+    })
+    return teams_vectors_dict, teams_vectors_df
@@ -0,0 +1,372 @@
+"""
+Transfermarkt Parsers - BeautifulSoup and lxml Backends
+=======================================================
+
+Extraction of the Transfermarkt pages the scrapers read (squad/kader tables,
+league team lists, club search results, player performance tables), with two
+interchangeable backends:
+
+- 'lxml': libxml2 parser plus precompiled XPath expressions that only walk
+  the table being extracted. Several times faster on full pages, which is
+  what matters when thousands of cached pages are re-parsed in a backfill.
+- 'bs4': the original BeautifulSoup('html.parser') code path.
+
+Both return the same plain records (lists of dicts), so callers do not care
+which one ran; scripts/benchmark_parsers.py checks that they agree.
+
+Usage:
+    from transfermarkt_parsers import squad_rows, DEFAULT_PARSER
+    rows = squad_rows(response.content)                 # lxml when installed
+    rows = squad_rows(response.content, parser='bs4')
+"""
+
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - falls back to BeautifulSoup
+    etree = None
+    lxml_html = None
+
+
+PARSERS = ('lxml', 'bs4')
+DEFAULT_PARSER = 'lxml' if etree is not None else 'bs4'
+
+AGE_RE = re.compile(r'\((\d+)\)')
+PLAYER_HREF_RE = re.compile(r'/profil/spieler/')
+CLUB_HREF_RE = re.compile(r'/verein/')
+
+
+def _check_parser(parser: str) -> str:
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser '{parser}' (choose from {', '.join(PARSERS)})")
+    if parser == 'lxml' and etree is None:
+        return 'bs4'
+    return parser
+
+
+def _to_int(text: str) -> int:
+    return int(text) if text and text != '-' else 0
+
+
+# =============================================================================
+# LXML BACKEND
+# =============================================================================
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one whitespace-separated class token."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if etree is not None:
+    _X_ITEMS_TABLES = etree.XPath(f"//table[{_has_class('items')}]")
+    _X_YW1 = etree.XPath("//div[@id='yw1']")
+    _X_FIRST_TABLE = etree.XPath("(.//table)[1]")
+    _X_FIRST_TBODY = etree.XPath("(.//tbody)[1]")
+    _X_ROWS = etree.XPath(".//tr")
+    _X_ODD_EVEN_LIKE_ROWS = etree.XPath(".//tr[contains(@class, 'odd') or contains(@class, 'even')]")
+    _X_ODD_EVEN_ROWS = etree.XPath(f".//tr[{_has_class('odd')} or {_has_class('even')}]")
+    _X_HAS_TH = etree.XPath("boolean(.//th)")
+    _X_CELLS = etree.XPath(".//td")
+    _X_IMGS = etree.XPath(".//img")
+    _X_PLAYER_LINK = etree.XPath("(.//a[contains(@href, '/profil/spieler/')])[1]")
+    _X_CLUB_LINK = etree.XPath("(.//a[contains(@href, '/verein/')])[1]")
+    _X_TEAM_LINK = etree.XPath(f"(.//a[{_has_class('vereinprofil_tooltip')}])[1]")
+
+
+def _lxml_document(content):
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    return lxml_html.document_fromstring(content)
+
+
+def _text(element) -> str:
+    """Equivalent of BeautifulSoup's `.text.strip()`."""
+    return element.text_content().strip()
+
+
+def _stripped_text(element) -> str:
+    """Equivalent of BeautifulSoup's `.get_text(strip=True)`."""
+    return ''.join(s.strip() for s in element.itertext() if isinstance(s, str))
+
+
+def _squad_rows_lxml(content) -> list:
+    doc = _lxml_document(content)
+
+    tables = _X_ITEMS_TABLES(doc)
+    squad_table = tables[0] if tables else None
+    if squad_table is None:
+        box = _X_YW1(doc)
+        found = _X_FIRST_TABLE(box[0]) if box else []
+        squad_table = found[0] if found else None
+    if squad_table is None:
+        return None
+
+    tbody = _X_FIRST_TBODY(squad_table)
+    if not tbody:
+        return None
+
+    rows = _X_ODD_EVEN_LIKE_ROWS(tbody[0]) or _X_ROWS(tbody[0])
+
+    records = []
+    for idx, row in enumerate(rows):
+        try:
+            if _X_HAS_TH(row):
+                continue
+
+            cells = _X_CELLS(row)
+            if len(cells) < 5:
+                continue
+
+            link = _X_PLAYER_LINK(cells[1])
+            player_name = _text(link[0]) if link else ''
+            if not player_name:
+                continue
+
+            age_match = AGE_RE.search(_text(cells[3]))
+            nationalities = [img.get('title', '') for img in _X_IMGS(cells[4])]
+
+            market_value = ''
+            for cell in reversed(cells):
+                text = cell.text_content()
+                if '€' in text or 'k' in text or 'm' in text:
+                    market_value = text.strip()
+                    break
+
+            records.append({
+                'player_name': player_name,
+                'player_href': link[0].get('href'),
+                'position': _text(cells[2]),
+                'shirt_number': _text(cells[0]),
+                'age': age_match.group(1) if age_match else '',
+                'nationality': ', '.join(nationalities),
+                'market_value': market_value,
+            })
+        except Exception as e:
+            print(f"  ⚠️  Error parsing row {idx}: {e}")
+    return records
+
+
+def _league_teams_lxml(content) -> list:
+    doc = _lxml_document(content)
+    tables = _X_ITEMS_TABLES(doc)
+    if not tables:
+        return []
+
+    teams = []
+    for row in _X_ROWS(tables[0]):
+        link = _X_TEAM_LINK(row)
+        if link:
+            teams.append({'name': _text(link[0]), 'id': link[0].get('href').split('/')[-1]})
+    return teams
+
+
+def _search_club_lxml(content) -> dict:
+    doc = _lxml_document(content)
+    box = _X_YW1(doc)
+    link = _X_CLUB_LINK(box[0]) if box else []
+    if not link:
+        return None
+    imgs = _X_IMGS(link[0])
+    return {'id': link[0].get('href').split('/')[-1],
+            'name': imgs[0].get('alt') if imgs else None}
+
+
+def _performance_rows_lxml(content) -> list:
+    doc = _lxml_document(content)
+    tables = _X_ITEMS_TABLES(doc)
+    if not tables:
+        return None
+
+    records = []
+    for row in _X_ODD_EVEN_ROWS(tables[0]):
+        cells = _X_CELLS(row)
+        if len(cells) < 5:
+            continue
+        try:
+            imgs = _X_IMGS(cells[1])
+            record = _performance_record(
+                season_text=_stripped_text(cells[0]),
+                league=imgs[0].get('title', '') if imgs else _stripped_text(cells[1]),
+                team=_stripped_text(cells[2]),
+                stats=[_stripped_text(cells[i]) if len(cells) > i else '0' for i in (4, 5, 6)],
+            )
+        except Exception:
+            continue
+        if record:
+            records.append(record)
+    return records
+
+
+# =============================================================================
+# BEAUTIFULSOUP BACKEND
+# =============================================================================
+
+def _squad_rows_bs4(content) -> list:
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Find squad table - try multiple selectors
+    squad_table = soup.find('table', {'class': 'items'})
+    if not squad_table:
+        squad_table = soup.find('div', {'id': 'yw1'})
+        if squad_table:
+            squad_table = squad_table.find('table')
+    if not squad_table:
+        return None
+
+    tbody = squad_table.find('tbody')
+    if not tbody:
+        return None
+
+    rows = tbody.find_all('tr', class_=lambda x: x and ('odd' in x or 'even' in x))
+    if not rows:
+        rows = tbody.find_all('tr')
+
+    records = []
+    for idx, row in enumerate(rows):
+        try:
+            if row.find('th'):
+                continue
+
+            cells = row.find_all('td')
+            if len(cells) < 5:
+                continue
+
+            player_link = cells[1].find('a', href=PLAYER_HREF_RE)
+            player_name = player_link.text.strip() if player_link else ''
+            if not player_name:
+                continue
+
+            age_match = AGE_RE.search(cells[3].text.strip())
+            nationalities = [img.get('title', '') for img in cells[4].find_all('img')]
+
+            # Market value - usually last or second-to-last cell
+            market_value = ''
+            for cell in reversed(cells):
+                if '€' in cell.text or 'k' in cell.text or 'm' in cell.text:
+                    market_value = cell.text.strip()
+                    break
+
+            records.append({
+                'player_name': player_name,
+                'player_href': player_link['href'],
+                'position': cells[2].text.strip(),
+                'shirt_number': cells[0].text.strip(),
+                'age': age_match.group(1) if age_match else '',
+                'nationality': ', '.join(nationalities),
+                'market_value': market_value,
+            })
+        except Exception as e:
+            print(f"  ⚠️  Error parsing row {idx}: {e}")
+    return records
+
+
+def _league_teams_bs4(content) -> list:
+    soup = BeautifulSoup(content, 'html.parser')
+    team_table = soup.find('table', {'class': 'items'})
+    if not team_table:
+        return []
+
+    teams = []
+    for row in team_table.find_all('tr'):
+        team_link = row.find('a', {'class': 'vereinprofil_tooltip'})
+        if team_link:
+            teams.append({'name': team_link.text.strip(), 'id': team_link['href'].split('/')[-1]})
+    return teams
+
+
+def _search_club_bs4(content) -> dict:
+    soup = BeautifulSoup(content, 'html.parser')
+    club_box = soup.find('div', {'id': 'yw1'})
+    team_link = club_box.find('a', href=CLUB_HREF_RE) if club_box else None
+    if not team_link:
+        return None
+    img = team_link.find('img')
+    return {'id': team_link['href'].split('/')[-1],
+            'name': img.get('alt') if img else None}
+
+
+def _performance_rows_bs4(content) -> list:
+    soup = BeautifulSoup(content, 'html.parser')
+    tables = soup.find_all('table', {'class': 'items'})
+    if not tables:
+        return None
+
+    records = []
+    for row in tables[0].find_all('tr', {'class': ['odd', 'even']}):
+        cells = row.find_all('td')
+        if len(cells) < 5:
+            continue
+        try:
+            comp_img = cells[1].find('img')
+            record = _performance_record(
+                season_text=cells[0].get_text(strip=True),
+                league=comp_img.get('title', '') if comp_img else cells[1].get_text(strip=True),
+                team=cells[2].get_text(strip=True),
+                stats=[cells[i].get_text(strip=True) if len(cells) > i else '0' for i in (4, 5, 6)],
+            )
+        except Exception:
+            continue
+        if record:
+            records.append(record)
+    return records
+
+
+def _performance_record(season_text, league, team, stats) -> dict:
+    """Shared row logic for the performance table (None = skip the row)."""
+    if not team or team.lower() in ['club', 'total', '']:
+        return None
+    apps, goals, assists = (_to_int(value) for value in stats)
+    if 'total' in season_text.lower():
+        return None
+    return {
+        'season_raw': season_text,
+        'team': team,
+        'league_raw': league,
+        'appearances': apps,
+        'goals': goals,
+        'assists': assists,
+    }
+
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+_BACKENDS = {
+    'lxml': (_squad_rows_lxml, _league_teams_lxml, _search_club_lxml, _performance_rows_lxml),
+    'bs4': (_squad_rows_bs4, _league_teams_bs4, _search_club_bs4, _performance_rows_bs4),
+}
+
+
+def squad_rows(content, parser: str = DEFAULT_PARSER) -> list:
+    """
+    Player rows of a squad (kader) page.
+
+    Returns a list of {player_name, player_href, position, shirt_number, age,
+    nationality, market_value}, or None if the page has no squad table.
+    """
+    return _BACKENDS[_check_parser(parser)][0](content)
+
+
+def league_teams(content, parser: str = DEFAULT_PARSER) -> list:
+    """Teams ({name, id}) listed on a league (wettbewerb) page."""
+    return _BACKENDS[_check_parser(parser)][1](content)
+
+
+def search_club(content, parser: str = DEFAULT_PARSER) -> dict:
+    """First club ({id, name}) in a quick-search result page, or None."""
+    return _BACKENDS[_check_parser(parser)][2](content)
+
+
+def performance_rows(content, parser: str = DEFAULT_PARSER) -> list:
+    """
+    Season rows of a player's performance (leistungsdatendetails) page.
+
+    Returns a list of {season_raw, team, league_raw, appearances, goals,
+    assists}, or None if the page has no performance table.
+    """
+    return _BACKENDS[_check_parser(parser)][3](content)
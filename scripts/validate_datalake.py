@@ -2,12 +2,58 @@
 """
 Validação da estrutura do datalake.
 Verifica se todos os arquivos necessários estão presentes e válidos.
+
+Cada dataset é lido uma única vez, em chunks: a mesma passada conta as
+linhas, registra o schema (colunas e tipos), a fração de nulos por coluna e
+min/max das colunas numéricas - e calcula o sha1 do arquivo. Os arquivos são perfilados em
+paralelo e o resultado fica em cache (_validation_cache.json), indexado por
+tamanho + mtime + sha1 do arquivo e pela especificação das checagens:
+arquivos inalterados não são relidos, então a validação pode rodar a cada
+etapa do pipeline.
+
+As regras de qualidade (obrigatórias, não nulos, faixas, unicidade e
+referências entre tabelas) ficam em quality_rules.RULES e são avaliadas na
+seção de validação de dados, com cache próprio (_quality_cache.json) pela
+mesma chave de tamanho + mtime + sha1; violações de nível 'error' reprovam a
+validação.
+
+Uso:
+    python scripts/validate_datalake.py
+    python scripts/validate_datalake.py --workers 4 --no-cache
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
+from pandas.api import types as ptypes
+
+from quality_rules import CACHE_PATH as RULES_CACHE_PATH, REPORT_PATH, has_errors, run_rules
+
+CHUNK_SIZE = 50_000
+CACHE_PATH = os.path.join('datalake', 'processed', '_validation_cache.json')
+CACHE_VERSION = 2
+
+# Datasets perfilados: caminho e mínimo de linhas (as regras de conteúdo ficam em quality_rules)
+DATASETS = {
+    'players_complete_1995_2025.csv': {
+        'path': 'datalake/processed/players_complete_1995_2025.csv',
+        'min_rows': 10000,
+    },
+    'teams_complete_1995_2025.csv': {
+        'path': 'datalake/processed/teams_complete_1995_2025.csv',
+        'min_rows': 100,
+    },
+    'cristiano_ronaldo_enriched.csv': {
+        'path': 'datalake/processed/enriched/cristiano_ronaldo_enriched.csv',
+        'min_rows': 30,
+    },
+}
 
 class Colors:
     GREEN = '\033[92m'
@@ -27,28 +73,184 @@ def check_file(path, name):
         print(f"  {Colors.RED}✗{Colors.END} {name} - FALTANDO")
         return False
 
-def check_csv(path, name, min_rows=0):
-    """Verifica CSV e conta linhas."""
+class _HashingReader:
+    """Arquivo binário que atualiza o sha1 com o que o parser lê (hash na mesma passada)."""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha1 = hashlib.sha1()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.sha1.update(data)
+        return data
+
+
+def _spec_key(spec):
+    return json.dumps({k: v for k, v in spec.items() if k != 'path'}, sort_keys=True, default=list)
+
+
+def _kind(dtype):
+    if ptypes.is_bool_dtype(dtype):
+        return 'bool'
+    if ptypes.is_integer_dtype(dtype):
+        return 'int'
+    if ptypes.is_float_dtype(dtype):
+        return 'float'
+    return 'object'
+
+
+def _merge_kind(previous, current):
+    # Um chunk só com nulos vira float; int + float = float; qualquer texto = object
+    if previous is None or previous == current:
+        return current
+    if {previous, current} <= {'int', 'float', 'bool'}:
+        return 'float'
+    return 'object'
+
+
+def profile_csv(path, spec=None, chunk_size=CHUNK_SIZE):
+    """
+    Perfil de um CSV em uma única passada por chunks.
+
+    Retorna linhas, colunas, tipo de cada coluna (int/float/bool/object),
+    nulos por coluna, min/max das numéricas e o sha1 do arquivo.
+    """
+    spec = spec or {}
+    start = time.perf_counter()
+    stat = os.stat(path)
+    rows = 0
+    columns, kinds, nulls, mins, maxs = None, {}, {}, {}, {}
+    with open(path, 'rb') as f:
+        reader = _HashingReader(f)
+        for chunk in pd.read_csv(reader, chunksize=chunk_size, encoding='utf-8', low_memory=False):
+            if columns is None:
+                columns = list(chunk.columns)
+            rows += len(chunk)
+            for col, count in chunk.isna().sum().items():
+                nulls[col] = nulls.get(col, 0) + int(count)
+            for col in chunk.columns:
+                kinds[col] = _merge_kind(kinds.get(col), _kind(chunk[col].dtype))
+            numeric = chunk.select_dtypes('number')
+            if len(numeric.columns):
+                for col, value in numeric.min().items():
+                    if pd.notna(value):
+                        mins[col] = min(mins.get(col, value), float(value))
+                for col, value in numeric.max().items():
+                    if pd.notna(value):
+                        maxs[col] = max(maxs.get(col, value), float(value))
+        while reader.read(1 << 20):  # o parser pode parar antes do fim (linhas vazias)
+            pass
+    if columns is None:  # arquivo vazio
+        columns = []
+    return {
+        'path': path,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha1': reader.sha1.hexdigest(),
+        'spec': _spec_key(spec),
+        'rows': rows,
+        'columns': columns,
+        'kinds': {col: kinds.get(col, 'object') for col in columns},
+        'null_ratio': {col: (nulls.get(col, 0) / rows if rows else 0.0) for col in columns},
+        'min': {col: mins[col] for col in columns if col in mins},
+        'max': {col: maxs[col] for col in columns if col in maxs},
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _profile_task(args):
+    name, spec, cached, chunk_size = args
+    path = spec['path']
     if not os.path.exists(path):
-        print(f"  {Colors.RED}✗{Colors.END} {name} - FALTANDO")
-        return False
-    
+        return name, None, False
     try:
-        df = pd.read_csv(path, nrows=10, encoding='utf-8', low_memory=False)  # Ler apenas primeiras linhas
-        total_rows = sum(1 for _ in open(path, encoding='utf-8', errors='ignore')) - 1  # Contar linhas
-        cols = len(df.columns)
-        
-        if total_rows >= min_rows:
-            print(f"  {Colors.GREEN}✓{Colors.END} {name} ({total_rows:,} linhas, {cols} colunas)")
-            return True
-        else:
-            print(f"  {Colors.YELLOW}⚠{Colors.END} {name} ({total_rows} linhas - esperado >={min_rows})")
-            return True
+        if cached and cached.get('spec') == _spec_key(spec):
+            stat = os.stat(path)
+            if cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+                return name, cached, True
+            # Tocado mas com o mesmo conteúdo: só o hash é relido
+            if cached['size'] == stat.st_size and _file_sha1(path) == cached['sha1']:
+                return name, {**cached, 'mtime': stat.st_mtime}, True
+        return name, profile_csv(path, spec, chunk_size), False
     except Exception as e:
-        print(f"  {Colors.RED}✗{Colors.END} {name} - ERRO: {e}")
+        return name, {'path': path, 'error': str(e)}, False
+
+
+def _load_cache(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('profiles', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def _save_cache(path, profiles):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'profiles': profiles}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def profile_datasets(datasets=DATASETS, workers=None, cache_path=CACHE_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Perfis de todos os datasets (em paralelo, reaproveitando o cache).
+
+    Retorna {nome: perfil} (None se o arquivo não existe; {'error': ...} se
+    não pôde ser lido) e o número de perfis vindos do cache.
+    """
+    cache = _load_cache(cache_path)
+    tasks = [(name, spec, cache.get(spec['path']), chunk_size) for name, spec in datasets.items()]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_profile_task, tasks))
+    else:
+        results = [_profile_task(task) for task in tasks]
+
+    profiles = {name: profile for name, profile, _ in results}
+    hits = sum(1 for _, _, hit in results if hit)
+    if cache_path:
+        for profile in profiles.values():
+            if profile and 'error' not in profile:
+                cache[profile['path']] = profile
+        _save_cache(cache_path, cache)
+    return profiles, hits
+
+
+def check_csv(profile, name, min_rows=0):
+    """Linhas e colunas de um CSV, a partir do perfil."""
+    if profile is None:
+        print(f"  {Colors.RED}✗{Colors.END} {name} - FALTANDO")
+        return False
+    if 'error' in profile:
+        print(f"  {Colors.RED}✗{Colors.END} {name} - ERRO: {profile['error']}")
         return False
 
-def main():
+    total_rows = profile['rows']
+    cols = len(profile['columns'])
+    ratios = profile['null_ratio']
+    nulls = f", {sum(ratios.values()) / cols:.1%} nulos" if cols else ''
+    if total_rows >= min_rows:
+        print(f"  {Colors.GREEN}✓{Colors.END} {name} ({total_rows:,} linhas, {cols} colunas{nulls})")
+    else:
+        print(f"  {Colors.YELLOW}⚠{Colors.END} {name} ({total_rows} linhas - esperado >={min_rows})")
+    return True
+
+
+def main(workers=None, use_cache=True, chunk_size=CHUNK_SIZE):
     print("\n" + "="*60)
     print(f"{Colors.BLUE}🔍 VALIDAÇÃO DO DATALAKE{Colors.END}")
     print("="*60 + "\n")
@@ -104,17 +306,16 @@ def main():
         if not check_file(path, name):
             all_ok = False
     
-    # 4. Datasets principais
+    # 4. Datasets principais (uma passada por arquivo, em paralelo, com cache)
     print(f"\n{Colors.BLUE}📊 Datasets Principais{Colors.END}")
-    datasets = {
-        'players_complete_1995_2025.csv': ('datalake/processed/players_complete_1995_2025.csv', 10000),
-        'teams_complete_1995_2025.csv': ('datalake/processed/teams_complete_1995_2025.csv', 100),
-        'cristiano_ronaldo_enriched.csv': ('datalake/processed/enriched/cristiano_ronaldo_enriched.csv', 30),
-    }
+    start = time.perf_counter()
+    profiles, hits = profile_datasets(DATASETS, workers=workers,
+                                      cache_path=CACHE_PATH if use_cache else None, chunk_size=chunk_size)
     
-    for name, (path, min_rows) in datasets.items():
-        if not check_csv(path, name, min_rows):
+    for name, spec in DATASETS.items():
+        if not check_csv(profiles[name], name, spec['min_rows']):
             all_ok = False
+    print(f"  ({time.perf_counter() - start:.2f}s, {hits}/{len(DATASETS)} do cache)")
     
     # 5. Documentação
     print(f"\n{Colors.BLUE}📚 Documentação{Colors.END}")
@@ -129,49 +330,12 @@ def main():
         if not check_file(path, name):
             all_ok = False
     
-    # 6. Validação de dados (sample)
+    # 6. Validação de dados (regras de quality_rules.RULES, tabelas inalteradas vêm do cache)
     print(f"\n{Colors.BLUE}🔬 Validação de Dados{Colors.END}")
-    
-    try:
-        df = pd.read_csv('datalake/processed/enriched/cristiano_ronaldo_enriched.csv')
-        
-        # Verificar colunas obrigatórias
-        required_cols = ['season_period', 'team', 'league', 'Performance_Gls', 
-                        'Per_90_Minutes_Gls', 'is_domestic_league']
-        
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        
-        if missing_cols:
-            print(f"  {Colors.RED}✗{Colors.END} Colunas faltando: {missing_cols}")
-            all_ok = False
-        else:
-            print(f"  {Colors.GREEN}✓{Colors.END} Todas as colunas obrigatórias presentes")
-        
-        # Verificar tipos de dados
-        if df['Performance_Gls'].dtype in ['int64', 'float64']:
-            print(f"  {Colors.GREEN}✓{Colors.END} Performance_Gls tem tipo numérico")
-        else:
-            print(f"  {Colors.RED}✗{Colors.END} Performance_Gls deveria ser numérico")
-            all_ok = False
-        
-        # Verificar valores razoáveis
-        max_goals = df['Performance_Gls'].max()
-        if 0 <= max_goals <= 100:
-            print(f"  {Colors.GREEN}✓{Colors.END} Gols máximos razoáveis ({max_goals})")
-        else:
-            print(f"  {Colors.YELLOW}⚠{Colors.END} Gols máximos suspeitos ({max_goals})")
-        
-        # Verificar Per_90_Minutes
-        max_per90 = df['Per_90_Minutes_Gls'].max()
-        if 0 <= max_per90 <= 3:
-            print(f"  {Colors.GREEN}✓{Colors.END} Gols/90 razoáveis (max: {max_per90:.2f})")
-        else:
-            print(f"  {Colors.RED}✗{Colors.END} Gols/90 suspeitos (max: {max_per90:.2f})")
-            all_ok = False
-            
-    except Exception as e:
-        print(f"  {Colors.RED}✗{Colors.END} Erro ao validar dados: {e}")
+    report = run_rules(report_path=REPORT_PATH, cache_path=RULES_CACHE_PATH if use_cache else None)
+    if has_errors(report):
         all_ok = False
+    print(f"  (relatório: {REPORT_PATH})")
     
     # Resumo final
     print("\n" + "="*60)
@@ -186,4 +350,10 @@ def main():
         return 1
 
 if __name__ == '__main__':
-    sys.exit(main())
+    parser = argparse.ArgumentParser(description='Valida a estrutura e os datasets do datalake')
+    parser.add_argument('--workers', type=int, default=None, help='Processos em paralelo (padrão: CPUs)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Reperfila todos os arquivos e reavalia as regras')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Linhas por chunk')
+    args = parser.parse_args()
+    sys.exit(main(workers=args.workers, use_cache=not args.no_cache, chunk_size=args.chunk_size))
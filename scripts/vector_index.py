@@ -0,0 +1,462 @@
+"""
+Player Vector Index - Fast similarity lookups over the player history
+=====================================================================
+
+Approximate nearest-neighbour (IVF) index over the standardized player
+vectors used by the clustering (scout.FEATURE_COLUMNS, missing values as 0,
+standardized like StandardScaler). Answers "players similar to X" and "best
+fit for team Y" without comparing every player-season:
+
+- vectors are L2-normalized, so cosine similarity is a dot product
+- a spherical k-means splits the rows into ~sqrt(N) lists; a query scores
+  the centroids and only scans the rows of the n_probe closest lists
+- position, age, season and cluster filters are boolean masks over the
+  scanned rows; a filter that keeps a share p of the scanned rows widens the
+  probe to n_probe / p lists, so filtered queries keep their recall
+- exact=True scans every row (brute force) to check the approximate answers
+
+The index lives next to the processed players table as a NumPy .npz (no
+pickle) and is rebuilt automatically when the players table or the
+clustering output (players_clustered.csv) changes. Row ids are row offsets
+of the players table, the same rows as the notebook's players_df / X_scaled.
+
+Usage:
+    python scripts/vector_index.py                                  # build/refresh
+    python scripts/vector_index.py similar "Kaká" --pos MF --age 20 25 --seasons 2005 2015
+    python scripts/vector_index.py similar "Kaká" --exact           # brute force
+    python scripts/vector_index.py check --queries 200              # recall + latency
+
+    from vector_index import load_vector_index
+    index = load_vector_index()
+    index.similar_players('Kaká', k=10, positions=['MF', 'FW'], age=(None, 25))
+    index.best_fit(teams_vectors_dict['Arsenal'], k=10, seasons=(2020, 2024))
+"""
+
+import argparse
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from datalake_io import PLAYERS_CLUSTERED_PATH, load_table, source_path, table_paths
+from player_index import fold_name
+from scout import available_features, normalize_rows
+
+INDEX_VERSION = 1
+
+# Output of scripts/clusterization (one row per players table row)
+CLUSTERS_PATH = PLAYERS_CLUSTERED_PATH
+CLUSTER_COLUMN = 'player_cluster'
+
+# FBref position tokens ('FW,MF') -> bits of the position mask
+POSITIONS = ('GK', 'DF', 'MF', 'FW')
+
+METADATA_COLUMNS = ['player', 'team', 'league', 'season', 'pos', 'age', 'season_start_year']
+
+# IVF parameters: lists ~ sqrt(rows), centroids trained on a sample
+MAX_LISTS = 1024
+TRAIN_SAMPLE = 50_000
+TRAIN_ITERATIONS = 10
+N_PROBE = 16
+
+
+def index_path(table: str = 'players') -> str:
+    base = os.path.splitext(table_paths(table)[0])[0]
+    return f'{base}.vector_index.npz'
+
+
+def _file_signature(path: str) -> dict:
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _signature(table: str, features: list) -> dict:
+    return {
+        'version': INDEX_VERSION,
+        'source': _file_signature(source_path(table)),
+        'clusters': _file_signature(CLUSTERS_PATH),
+        'features': list(features),
+    }
+
+
+def position_bits(pos: pd.Series) -> np.ndarray:
+    """Bit mask of the POSITIONS tokens in each FBref position string."""
+    text = pos.astype(str).str.upper()
+    bits = np.zeros(len(text), dtype=np.uint8)
+    for bit, token in enumerate(POSITIONS):
+        bits |= text.str.contains(token, regex=False).to_numpy(dtype=bool).astype(np.uint8) << bit
+    return bits
+
+
+def _position_mask(positions) -> int:
+    if isinstance(positions, str):
+        positions = positions.replace(',', ' ').split()
+    mask = 0
+    for token in positions:
+        token = token.upper()
+        if token not in POSITIONS:
+            raise ValueError(f'Unknown position {token!r} (expected one of {", ".join(POSITIONS)})')
+        mask |= 1 << POSITIONS.index(token)
+    return mask
+
+
+def _text(series: pd.Series) -> np.ndarray:
+    return series.astype(object).where(series.notna(), '').astype(str).to_numpy(dtype=str)
+
+
+def _spherical_kmeans(unit: np.ndarray, n_lists: int, rng) -> np.ndarray:
+    """Unit-norm centroids of a k-means on cosine similarity, trained on a sample."""
+    sample = unit[rng.choice(len(unit), size=min(len(unit), TRAIN_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(TRAIN_ITERATIONS):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def _assign(unit: np.ndarray, centroids: np.ndarray, chunk: int = 65_536) -> np.ndarray:
+    labels = np.empty(len(unit), dtype=np.int32)
+    for start in range(0, len(unit), chunk):
+        labels[start:start + chunk] = np.argmax(unit[start:start + chunk] @ centroids.T, axis=1)
+    return labels
+
+
+class VectorIndex:
+    """
+    IVF index over unit-normalized player vectors plus per-row filter metadata.
+
+    Arrays (all indexed by players table row): unit (float32 vectors),
+    name_code (position in the sorted accent-folded `names`), pos_bits,
+    age_values, start_year, cluster (-1 when the clustering output is
+    missing) and the display columns of METADATA_COLUMNS. The inverted lists
+    are `order` (rows grouped by list) and `offsets` (list i is
+    order[offsets[i]:offsets[i+1]]).
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.arrays = arrays
+        self.meta = meta
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        self.n_lists = len(self.centroids)
+
+    def __len__(self):
+        return len(self.unit)
+
+    # ------------------------------------------------------------------
+    # Build / persist
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, players_df: pd.DataFrame, features: list, clusters=None,
+              n_lists: int = None, seed: int = 0, meta: dict = None) -> 'VectorIndex':
+        """
+        Standardizes players_df[features] (NaN -> 0, population std, like the
+        clustering's StandardScaler) and builds the inverted lists.
+        """
+        x = players_df[features].astype('float64').fillna(0).to_numpy()
+        mean = x.mean(axis=0)
+        std = x.std(axis=0)
+        std[std == 0] = 1.0
+        unit = normalize_rows((x - mean) / std)
+
+        rng = np.random.default_rng(seed)
+        n_lists = n_lists or int(np.clip(np.sqrt(len(unit)), 1, MAX_LISTS))
+        n_lists = max(1, min(n_lists, len(unit)))
+        centroids = _spherical_kmeans(unit, n_lists, rng)
+        labels = _assign(unit, centroids)
+        order = np.argsort(labels, kind='stable').astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))]).astype(np.int64)
+
+        # Accent-folded names, sorted and deduplicated; rows point at them by code
+        names, name_code = np.unique(np.array([fold_name(name) for name in players_df['player']], dtype=str),
+                                     return_inverse=True)
+
+        cluster = np.full(len(unit), -1, dtype=np.int16)
+        if clusters is not None:
+            cluster = pd.to_numeric(pd.Series(clusters), errors='coerce').fillna(-1).to_numpy(dtype=np.int16)
+
+        arrays = {
+            'unit': unit,
+            'mean': mean.astype(np.float32),
+            'std': std.astype(np.float32),
+            'centroids': centroids,
+            'order': order,
+            'offsets': offsets,
+            'names': names,
+            'name_code': name_code.astype(np.int32),
+            'pos_bits': position_bits(players_df['pos']) if 'pos' in players_df.columns
+                        else np.zeros(len(unit), dtype=np.uint8),
+            'age_values': pd.to_numeric(players_df.get('age'), errors='coerce').to_numpy(
+                dtype=np.float32, na_value=np.nan) if 'age' in players_df.columns
+                else np.full(len(unit), np.nan, dtype=np.float32),
+            'start_year': pd.to_numeric(players_df.get('season_start_year'), errors='coerce').to_numpy(
+                dtype=np.float32, na_value=np.nan) if 'season_start_year' in players_df.columns
+                else np.full(len(unit), np.nan, dtype=np.float32),
+            'cluster': cluster,
+        }
+        for col in METADATA_COLUMNS:
+            if col in players_df.columns and col not in ('age', 'season_start_year'):
+                arrays[f'col_{col}'] = _text(players_df[col])
+
+        meta = dict(meta or {}, features=list(features), rows=len(unit), n_lists=n_lists)
+        return cls(arrays, meta)
+
+    def save(self, path: str) -> str:
+        buffer = io.BytesIO()
+        np.savez(buffer, _meta=np.array(json.dumps(self.meta)), **self.arrays)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'VectorIndex':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['_meta']))
+            arrays = {name: data[name] for name in data.files if name != '_meta'}
+        return cls(arrays, meta)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def standardize(self, raw) -> np.ndarray:
+        """Raw feature values (in meta['features'] order) -> standardized vector(s)."""
+        raw = np.nan_to_num(np.asarray(raw, dtype=np.float32))
+        return (raw - self.mean) / self.std
+
+    def _filter(self, rows: np.ndarray, positions=None, age=None, seasons=None,
+                clusters=None, exclude=None) -> np.ndarray:
+        keep = np.ones(len(rows), dtype=bool)
+        if positions:
+            keep &= (self.pos_bits[rows] & _position_mask(positions)) != 0
+        for values, bounds in ((self.age_values, age), (self.start_year, seasons)):
+            if bounds is None:
+                continue
+            low, high = bounds
+            if low is not None:
+                keep &= values[rows] >= low
+            if high is not None:
+                keep &= values[rows] <= high
+        if clusters is not None:
+            keep &= np.isin(self.cluster[rows], np.atleast_1d(clusters))
+        if exclude is not None:
+            keep &= ~exclude[rows]
+        return rows[keep]
+
+    def _candidates(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        if n_probe >= self.n_lists:
+            return np.arange(len(self), dtype=np.int32)
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+    def search(self, query, k: int = 10, n_probe: int = N_PROBE, exact: bool = False,
+               positions=None, age=None, seasons=None, clusters=None, exclude=None) -> tuple:
+        """
+        Top-k rows by cosine similarity to a standardized query vector.
+
+        Args:
+            query: Vector in the standardized feature space (e.g. a row of
+                X_scaled or a team vector averaged from them)
+            k: Number of rows returned
+            n_probe: Inverted lists scanned without filters; filters scale it by
+                the share of rows they keep (and it doubles while < k rows remain)
+            exact: Scan every row (brute force) instead of the probed lists
+            positions: Position tokens, any of which must appear ('FW', ['DF', 'MF'])
+            age, seasons: Inclusive (low, high) bounds on age / season start
+                year; either side may be None
+            clusters: Allowed player_cluster labels
+            exclude: Boolean mask over all rows of rows to leave out
+
+        Returns:
+            (rows, scores) sorted by descending score (ties by row)
+        """
+        query = normalize_rows(np.atleast_2d(query))[0]
+        n_probe = self.n_lists if exact else max(1, n_probe)
+        filters = (positions, age, seasons, clusters, exclude)
+        candidates = self._candidates(query, n_probe)
+        rows = self._filter(candidates, *filters)
+        # Filters thin out the probed lists: probe proportionally more of them
+        if len(rows) < len(candidates) and n_probe < self.n_lists:
+            selectivity = max(len(rows), 1) / len(candidates)
+            n_probe = min(self.n_lists, int(np.ceil(n_probe / selectivity)))
+            rows = self._filter(self._candidates(query, n_probe), *filters)
+        while len(rows) < k and n_probe < self.n_lists:
+            n_probe = min(self.n_lists, n_probe * 2)
+            rows = self._filter(self._candidates(query, n_probe), *filters)
+
+        scores = self.unit[rows] @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
+
+    def rows_for(self, name: str) -> np.ndarray:
+        """Rows of a player by accent-folded name (substring match as a fallback)."""
+        key = fold_name(name)
+        code = int(np.searchsorted(self.names, key))
+        if code == len(self.names) or self.names[code] != key:
+            matches = np.flatnonzero(np.char.find(self.names, key) >= 0) if key else []
+            if len(matches) > 1:
+                raise ValueError(f'{name!r} is ambiguous: {", ".join(self.names[matches[:10]])}')
+            if not len(matches):
+                return np.array([], dtype=np.int64)
+            code = int(matches[0])
+        return np.flatnonzero(self.name_code == code)
+
+    def frame(self, rows: np.ndarray, scores: np.ndarray) -> pd.DataFrame:
+        """Display columns of the given rows plus their similarity."""
+        data = {'row': rows}
+        for col in METADATA_COLUMNS:
+            if col == 'age':
+                data[col] = pd.array(self.age_values[rows]).astype('Int16')
+            elif col == 'season_start_year':
+                data[col] = pd.array(self.start_year[rows]).astype('Int16')
+            elif f'col_{col}' in self.arrays:
+                data[col] = self.arrays[f'col_{col}'][rows]
+        if (self.cluster >= 0).any():
+            data['cluster'] = self.cluster[rows]
+        data['similarity'] = np.round(scores.astype(float), 4)
+        return pd.DataFrame(data)
+
+    def similar_players(self, name: str, k: int = 10, season: int = None, **filters) -> pd.DataFrame:
+        """
+        Players closest to a player's season (the latest one by default).
+
+        Every row of the player is excluded, so the answer lists other players.
+        Filters are the keyword arguments of search().
+        """
+        rows = self.rows_for(name)
+        if not len(rows):
+            raise KeyError(f'Player not found: {name!r}')
+        if season is not None:
+            rows = rows[self.start_year[rows] == season]
+            if not len(rows):
+                raise KeyError(f'{name!r} has no season starting in {season}')
+        source = rows[np.nanargmax(self.start_year[rows])] if not np.isnan(self.start_year[rows]).all() else rows[-1]
+        exclude = self.name_code == self.name_code[source]
+        found, scores = self.search(self.unit[source], k=k, exclude=exclude, **filters)
+        return self.frame(found, scores)
+
+    def best_fit(self, team_vector, k: int = 10, **filters) -> pd.DataFrame:
+        """Players closest to a team vector (mean of its players' standardized vectors)."""
+        found, scores = self.search(np.asarray(team_vector, dtype=np.float32), k=k, **filters)
+        return self.frame(found, scores)
+
+    def check(self, queries: int = 200, k: int = 10, n_probe: int = N_PROBE,
+              seed: int = 0, **filters) -> dict:
+        """Recall@k of the IVF search against brute force, plus latencies (ms)."""
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(self), size=min(queries, len(self)), replace=False)
+        hits, total, fast, slow = 0, 0, [], []
+        for row in sample:
+            start = time.perf_counter()
+            approx, _ = self.search(self.unit[row], k=k, n_probe=n_probe, **filters)
+            fast.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            exact, exact_scores = self.search(self.unit[row], k=k, exact=True, **filters)
+            slow.append(time.perf_counter() - start)
+            # Rows tied with the k-th exact score count as hits
+            if len(exact):
+                hits += int(np.isin(approx, exact).sum() +
+                            (~np.isin(approx, exact) & (self.unit[approx] @ self.unit[row] >= exact_scores[-1])).sum())
+            total += len(exact)
+        fast, slow = np.array(fast) * 1e3, np.array(slow) * 1e3
+        return {
+            'queries': len(sample), 'k': k, 'n_probe': n_probe,
+            'recall': hits / total if total else float('nan'),
+            'ivf_ms_mean': fast.mean(), 'ivf_ms_p95': np.percentile(fast, 95),
+            'exact_ms_mean': slow.mean(), 'exact_ms_p95': np.percentile(slow, 95),
+        }
+
+
+def _load_clusters(rows: int) -> np.ndarray:
+    if not os.path.exists(CLUSTERS_PATH):
+        return None
+    clusters = pd.read_csv(CLUSTERS_PATH, usecols=lambda col: col == CLUSTER_COLUMN)
+    if CLUSTER_COLUMN not in clusters.columns or len(clusters) != rows:
+        print(f"⚠️  {CLUSTERS_PATH} does not match the players table ({len(clusters)} vs {rows} rows) - clusters ignored")
+        return None
+    return clusters[CLUSTER_COLUMN].to_numpy()
+
+
+def build_vector_index(table: str = 'players', n_lists: int = None) -> VectorIndex:
+    """Builds the index from the players table and the clustering output."""
+    start = time.perf_counter()
+    players = load_table(table)
+    features = available_features(players, verbose=False)
+    columns = [col for col in METADATA_COLUMNS if col in players.columns]
+    players = players[list(dict.fromkeys(features + columns))]
+    index = VectorIndex.build(players, features, clusters=_load_clusters(len(players)),
+                              n_lists=n_lists, meta=_signature(table, features))
+    print(f"🧭 Vector index built: {len(index):,} rows, {len(features)} features, "
+          f"{index.n_lists} lists ({time.perf_counter() - start:.1f}s)")
+    return index
+
+
+def load_vector_index(table: str = 'players', rebuild: bool = False) -> VectorIndex:
+    """Loads the persisted index, rebuilding it if the players table or clustering output changed."""
+    path = index_path(table)
+    if os.path.exists(path) and not rebuild:
+        index = VectorIndex.load(path)
+        stored = index.meta
+        current = _signature(table, stored.get('features', []))
+        if all(stored.get(key) == current[key] for key in ('version', 'source', 'clusters')):
+            return index
+    index = build_vector_index(table)
+    index.save(path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Player vector index (similar players / best fit)')
+    parser.add_argument('command', nargs='?', default='build', choices=['build', 'similar', 'check'])
+    parser.add_argument('player', nargs='?', help='Player name (similar)')
+    parser.add_argument('--k', type=int, default=10, help='Number of players returned')
+    parser.add_argument('--n-probe', type=int, default=N_PROBE, help='Inverted lists scanned per query')
+    parser.add_argument('--pos', type=str, default=None, help="Position tokens, e.g. 'FW' or 'DF,MF'")
+    parser.add_argument('--age', type=float, nargs=2, metavar=('MIN', 'MAX'), help='Age range (inclusive)')
+    parser.add_argument('--seasons', type=int, nargs=2, metavar=('FIRST', 'LAST'),
+                        help='Season start years (inclusive)')
+    parser.add_argument('--season', type=int, default=None, help="Season start year of the query player's row")
+    parser.add_argument('--exact', action='store_true', help='Brute-force search (no approximation)')
+    parser.add_argument('--queries', type=int, default=200, help='Random queries (check)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild even if the index is up to date')
+    args = parser.parse_args()
+
+    index = load_vector_index(rebuild=args.rebuild)
+    print(f"📇 {len(index):,} rows, {index.n_lists} lists -> {index_path()}")
+    filters = {'positions': args.pos, 'age': args.age, 'seasons': args.seasons}
+
+    if args.command == 'similar':
+        if not args.player:
+            parser.error('similar needs a player name')
+        start = time.perf_counter()
+        result = index.similar_players(args.player, k=args.k, season=args.season,
+                                       n_probe=args.n_probe, exact=args.exact, **filters)
+        elapsed = (time.perf_counter() - start) * 1e3
+        print(f"🔍 Similar to '{args.player}' ({'exact' if args.exact else 'ivf'}, {elapsed:.1f} ms)")
+        print(result.to_string(index=False))
+    elif args.command == 'check':
+        report = index.check(queries=args.queries, k=args.k, n_probe=args.n_probe, **filters)
+        print(f"🎯 recall@{report['k']}: {report['recall']:.3f} (n_probe={report['n_probe']}, "
+              f"{report['queries']} queries)")
+        print(f"⏱️  ivf: {report['ivf_ms_mean']:.2f} ms mean / {report['ivf_ms_p95']:.2f} ms p95 | "
+              f"exact: {report['exact_ms_mean']:.2f} ms mean / {report['exact_ms_p95']:.2f} ms p95")
+
+
+if __name__ == '__main__':
+    main()
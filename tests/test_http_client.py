@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('requests_cache')
+
+from http_client import RateLimitedSession, make_cached_session
+
+
+class _Page(BaseHTTPRequestHandler):
+    """Serves the server's body with its ETag; answers 304 when the ETag matches."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.send_header('ETag', server.etag)
+            self.end_headers()
+            return
+        body = server.body.encode()
+        self.send_response(200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), _Page)
+    httpd.requests, httpd.body, httpd.etag = [], 'v1', '"v1"'
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    session = make_cached_session(str(tmp_path / 'cache'))
+    session.settings.expire_after = timedelta(seconds=1)
+    session.settings.urls_expire_after = {}
+    return RateLimitedSession(rate=100, burst=10, session=session)
+
+
+def test_fresh_entry_is_a_hit(server, client):
+    url = f'http://127.0.0.1:{server.server_port}/page'
+    assert client.get(url).text == 'v1'
+    assert client.get(url).text == 'v1'
+    assert server.requests == [None]
+    assert client.stats == {'hits': 1, 'revalidated': 0, 'misses': 1}
+
+
+def test_expired_entry_is_revalidated(server, client):
+    url = f'http://127.0.0.1:{server.server_port}/page'
+    client.get(url)
+    time.sleep(1.2)
+
+    # Unchanged page: conditional request answered with 304, cached body reused
+    assert client.get(url).text == 'v1'
+    assert server.requests == [None, '"v1"']
+    assert client.stats['revalidated'] == 1
+    assert client.stats['hits'] == 0
+
+    # Changed page: the new body replaces the expired one
+    server.body, server.etag = 'v2', '"v2"'
+    time.sleep(1.2)
+    assert client.get(url).text == 'v2'
+    assert server.requests == [None, '"v1"', '"v1"']
+    assert client.stats['hits'] == 0
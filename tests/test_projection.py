@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from projection import Projection
+
+FEATURES = ['a', 'b', 'c', 'd']
+
+
+def _data(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(size=(rows, len(FEATURES))) * [1, 5, 0.1, 20], columns=FEATURES)
+
+
+def test_reprojecting_fitted_rows_stays_inside_bounds(tmp_path):
+    data = _data()
+    path = str(tmp_path / 'model.json')
+    Projection.fit(data, FEATURES).save(path)
+
+    projection = Projection.load(path)
+    coords = projection.transform(data)
+    assert projection.out_of_bounds(coords) == 0
+
+    # Rounding noise on the extremes (as seen on reuse runs) is not an outlier
+    low, high = projection.bounds
+    coords[0] = high + 1e-14 * np.abs(high)
+    coords[1] = low - 1e-14 * np.abs(low)
+    assert projection.out_of_bounds(coords) == 0
+
+
+def test_rows_beyond_the_bounds_are_counted():
+    data = _data()
+    projection = Projection.fit(data, FEATURES)
+    coords = projection.transform(data)
+    low, high = projection.bounds
+    coords[0] = high + 0.01 * (high - low)
+    coords[1] = low - 0.01 * (high - low)
+    assert projection.out_of_bounds(coords) == 2
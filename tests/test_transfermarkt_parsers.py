@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+import transfermarkt_parsers as tp
+from benchmark_parsers import FIXTURES_DIR, PAGE_TYPES, page_type, pages_from_fixtures, run
+
+FIXTURES = sorted(Path(FIXTURES_DIR).glob('*.html'))
+
+needs_lxml = pytest.mark.skipif(tp.etree is None, reason='lxml not installed')
+
+
+def test_fixtures_cover_every_page_type():
+    kinds = {page_type(path.name)[0] for path in FIXTURES}
+    assert kinds == {kind for _, kind, _ in PAGE_TYPES}
+
+
+@needs_lxml
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda path: path.name)
+def test_backends_return_identical_records(path):
+    _, extractor = page_type(path.name)
+    content = path.read_bytes()
+    lxml_records = extractor(content, parser='lxml')
+    assert lxml_records
+    assert lxml_records == extractor(content, parser='bs4')
+
+
+@needs_lxml
+def test_benchmark_reports_no_mismatches():
+    results = run(pages_from_fixtures(FIXTURES_DIR))
+    assert set(results) == {'squad', 'league', 'search', 'performance'}
+    assert all(not stats['mismatches'] for stats in results.values())
+
+
+def test_expected_records():
+    def read(name):
+        return (Path(FIXTURES_DIR) / name).read_bytes()
+
+    assert tp.league_teams(read('wettbewerb_league.html'), parser='bs4') == [
+        {'name': 'Example FC', 'id': '9001'},
+        {'name': 'Sample United', 'id': '9002'},
+        {'name': 'Athlético Müster', 'id': '9003'},
+    ]
+    assert tp.search_club(read('schnellsuche_search.html'), parser='bs4') == {'id': '9002', 'name': 'Sample United'}
+    performance = tp.performance_rows(read('leistungsdaten_performance.html'), parser='bs4')
+    assert [(r['season_raw'], r['league_raw'], r['goals']) for r in performance] == [
+        ('24/25', 'Example League', 12), ('24/25', 'Champions Cup', 0), ('23/24', 'Second Division', 20)]
+    squad = tp.squad_rows(read('kader_squad.html'), parser='bs4')
+    assert [r['player_name'] for r in squad] == ['Player One', 'Player Two', 'Player Três', 'Player Four']